@@ -0,0 +1,57 @@
+'''
+DotaMatchDownloader throughput through the shared client returned by get_client(), with its
+real token bucket (RATE_LIMIT_PER_MINUTE, RATE_LIMIT_BURST), against a simulated OpenDota
+answering after a fixed latency (no network access needed). The same download is then
+repeated without rate limiting, which is only the client side cost
+Usage: python benchmarks/bench_download_matches.py [n_matches] [latency_ms]
+'''
+import json
+import os
+import sys
+import tempfile
+import time
+import requests
+from requests.adapters import HTTPAdapter
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmarks import synthetic
+from dota_lib.dota_client import OPENDOTA_API, get_client
+from dota_lib.dota_downloader import DotaMatchDownloader
+
+class SimulatedOpenDota(HTTPAdapter):
+    '''
+    Transport adapter answering /matches/<match_id> after latency seconds
+    '''
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def send(self, request, **kwargs):
+        time.sleep(self.latency)
+        match_id = request.url.rstrip("/").split("/")[-1]
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response._content = json.dumps(synthetic.get_match_info(match_id)).encode()
+        return response
+
+def measure(label, match_ids, client):
+    with tempfile.TemporaryDirectory() as output_path:
+        report = DotaMatchDownloader(output_path).download(match_ids)
+    print("{:<22} {:>6} {:>9.1f} s {:>9.2f} matches/s".format(
+        label, report["downloaded"], report["elapsed"], report["matches_per_second"]))
+
+def main():
+    n_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    client = get_client()
+    client.session.mount(OPENDOTA_API, SimulatedOpenDota(latency))
+    print("{} matches, {:.0f} ms latency, {}".format(n_matches, latency*1000, client.limiter))
+    print("{:<22} {:>6} {:>11} {:>19}".format("", "saved", "time", "throughput"))
+    measure("rate limited", list(range(7_000_000_000, 7_000_000_000+n_matches)), client)
+    limiter, client.limiter = client.limiter, None
+    measure("no rate limit", list(range(7_100_000_000, 7_100_000_000+n_matches)), client)
+    client.limiter = limiter
+
+if __name__ == "__main__":
+    main()
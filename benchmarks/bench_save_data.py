@@ -0,0 +1,70 @@
+'''
+DotaPlayer.save_data: disk size and write time for a large player
+Usage: python benchmarks/bench_save_data.py [n_matches]
+'''
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmarks import synthetic
+from dota_lib.dota_player import DotaPlayer
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, file))
+               for root, _, files in os.walk(path) for file in files)
+
+def get_player(n_matches):
+    dota_player = DotaPlayer("123456", "bench")
+    dota_player.player_info = synthetic.get_player_info(123456, "bench")
+    dota_player.player_matches = synthetic.get_player_matches(n_matches)
+    dota_player.player_wardmap = synthetic.get_player_wardmap()
+    dota_player.player_wordcloud = synthetic.get_player_wordcloud()
+    dota_player.data_info = {"Last Updated": time.strftime("%Y-%m-%d")}
+    return dota_player
+
+def save_legacy(dota_player, output_path):
+    '''
+    Previous save_data behaviour: every file rewritten with indent=4
+    '''
+    player_dir = os.path.join(output_path, "bench_123456")
+    os.makedirs(player_dir, exist_ok=True)
+    for file_name, payload in (("player_info.json", dota_player.player_info),
+                               ("player_matches.json", dota_player.player_matches),
+                               ("player_wardmap.json", dota_player.player_wardmap),
+                               ("player_wordcloud.json", dota_player.player_wordcloud),
+                               ("data_info.json", dota_player.data_info)):
+        with open(os.path.join(player_dir, file_name), 'w', encoding='utf-8') as file:
+            json.dump(payload, file, ensure_ascii=False, indent=4)
+
+def run(label, save):
+    output_path = tempfile.mkdtemp()
+    try:
+        started = time.perf_counter()
+        save(output_path)
+        first = time.perf_counter() - started
+        started = time.perf_counter()
+        save(output_path)
+        second = time.perf_counter() - started
+        size = dir_size(os.path.join(output_path, "bench_123456"))
+        print("{:<28} {:>10.1f} KB {:>10.3f} s {:>12.3f} s".format(label, size/1024, first, second))
+    finally:
+        shutil.rmtree(output_path)
+
+def main():
+    n_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    dota_player = get_player(n_matches)
+    print("{} matches".format(n_matches))
+    print("{:<28} {:>13} {:>12} {:>14}".format("", "disk size", "1st save", "unchanged save"))
+    run("legacy (indent=4)", lambda path: save_legacy(dota_player, path))
+    run("indent=4, no columns", lambda path: dota_player.save_data(path, save_columns=False))
+    run("compact", lambda path: dota_player.save_data(path, save_columns=False, compact=True))
+    run("compact + gzip", lambda path: dota_player.save_data(path, save_columns=False,
+                                                             compact=True, compress=True))
+    run("compact + gzip + columns", lambda path: dota_player.save_data(path, compact=True,
+                                                                       compress=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+'''
+DotaPlayer.simplified_matches_df/simplified_matches: per-match Python loop (as before)
+vs vectorized construction over the match columns
+Usage: python benchmarks/bench_simplified_matches.py [n_matches ...]
+'''
+import json
+import os
+import sys
+import time
+from datetime import datetime as dtm
+import pandas as pd
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmarks import synthetic
+from dota_lib.dota_heroes import get_heroes
+from dota_lib.dota_player import DotaPlayer
+
+HEROES_DICT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                           "dota_db", "heroes", "heroes_dict.json")
+
+def legacy_df(dota_player, hero_dict):
+    # simplified_matches_df before vectorization
+    match_id, date, kda, hero, side, win = [], [], [], [], [], []
+    columns = dota_player.match_columns
+    for m_id, start_time, hero_id, player_slot, radiant_win, game_mode, \
+            kills, deaths, assists in zip(columns.match_id.tolist(),
+                                          columns.start_time.tolist(),
+                                          columns.hero_id.tolist(),
+                                          columns.player_slot.tolist(),
+                                          columns.radiant_win.tolist(),
+                                          columns.game_mode.tolist(),
+                                          columns.kills.tolist(),
+                                          columns.deaths.tolist(),
+                                          columns.assists.tolist()):
+        if game_mode not in (1, 22):
+            continue
+        match_id.append(m_id)
+        date.append(dtm.fromtimestamp(start_time))
+        kda.append(str(kills)+"/"+str(deaths)+"/"+str(assists))
+        hero.append(hero_dict.get(str(hero_id), str(hero_id)))
+        side.append("dire" if player_slot > 127 else "radiant")
+        win.append(int((side[-1] == "radiant") == bool(radiant_win)))
+    return pd.DataFrame(list(zip(match_id, date, kda, hero, side, win)),
+                        columns=["match_id", "date", "kda", "hero", "side", "win"])
+
+def measure(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    with open(HEROES_DICT) as content:
+        hero_dict = json.load(content)
+    heroes = get_heroes()
+    print("{:>8} {:>12} {:>12} {:>12} {:>9}".format(
+        "matches", "loop df", "vector df", "vector list", "speedup"))
+    for n_matches in sizes:
+        dota_player = DotaPlayer("1", "bench")
+        dota_player.player_matches = synthetic.get_player_matches(n_matches)
+        dota_player.match_columns = dota_player.match_columns
+        loop = measure(lambda: legacy_df(dota_player, hero_dict))
+        vector = measure(lambda: dota_player.simplified_matches_df(heroes))
+        vector_list = measure(lambda: dota_player.simplified_matches(heroes))
+        print("{:>8} {:>10.1f}ms {:>10.1f}ms {:>10.1f}ms {:>8.1f}x".format(
+            n_matches, loop*1000, vector*1000, vector_list*1000, loop/vector))
+
+if __name__ == "__main__":
+    main()
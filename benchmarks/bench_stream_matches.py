@@ -0,0 +1,50 @@
+'''
+Peak memory of DotaPlayer.get_matches: json.loads of the whole response vs streaming
+straight into match columns
+Usage: python benchmarks/bench_stream_matches.py [n_matches]
+'''
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmarks import synthetic
+from dota_lib.dota_columns import columns_from_json_stream
+from dota_lib.dota_player import STREAM_CHUNK_SIZE
+
+def iter_chunks(data):
+    for idx in range(0, len(data), STREAM_CHUNK_SIZE):
+        yield data[idx:idx+STREAM_CHUNK_SIZE]
+
+def legacy(data):
+    # requests' response.text followed by json.loads
+    return json.loads(data.decode("utf-8"))
+
+def streaming(data):
+    return columns_from_json_stream(iter_chunks(data))
+
+def measure(label, func, data):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(data)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("{:<12} {:>10.1f} MB {:>10.1f} MB {:>9.2f} s".format(
+        label, peak/2**20, current/2**20, elapsed))
+    del result
+
+def main():
+    n_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    # Response body as sent by OpenDota (compact JSON), kept outside the measurements
+    data = json.dumps(synthetic.get_player_matches(n_matches), separators=(',', ':')).encode()
+    print("{} matches, response body {:.1f} MB".format(n_matches, len(data)/2**20))
+    print("{:<12} {:>13} {:>13} {:>11}".format("", "peak", "retained", "time"))
+    measure("json.loads", legacy, data)
+    measure("streaming", streaming, data)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+'''
+DotaTeam.get_team_simplified_matches/get_most_played_heroes: set intersection + list
+membership scans (as before) vs sorted match_id arrays and a single grouped hero aggregation
+Usage: python benchmarks/bench_team_matches.py [n_matches ...]
+'''
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from benchmarks import synthetic
+from dota_lib.dota_heroes import get_heroes
+from dota_lib.dota_player import DotaPlayer
+from dota_lib.dota_team import DotaTeam
+
+HEROES_DICT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..",
+                           "dota_db", "heroes", "heroes_dict.json")
+
+# Above this number of matches the legacy version takes minutes, so it is skipped
+LEGACY_MAX_MATCHES = 20000
+
+def legacy_team_matches(dota_team):
+    # get_team_simplified_matches before sorted arrays
+    simplified_matches = dota_team[0].simplified_matches()
+    team_matches = [(entry["match_id"], entry["side"]) for entry in simplified_matches]
+    for dota_player in dota_team[1:]:
+        player_matches = [(entry["match_id"], entry["side"])
+                          for entry in dota_player.simplified_matches()]
+        team_matches = list(set(team_matches).intersection(set(player_matches)))
+    team_matches_id = [match[0] for match in team_matches]
+    return [match for match in simplified_matches if match["match_id"] in team_matches_id]
+
+def legacy_most_played_heroes(dota_team, matches, hero_dict):
+    # get_most_played_heroes before sorted arrays
+    most_played_heroes = []
+    team_matches = [entry["match_id"] for entry in matches]
+    for dota_player in dota_team:
+        heroes = {}
+        for match in dota_player.simplified_matches():
+            if match["match_id"] in team_matches:
+                hero = hero_dict.get(str(match["hero"]), str(match["hero"]))
+                if hero not in heroes: heroes[hero] = [1, 0]
+                else: heroes[hero][0] += 1
+                heroes[hero][1] += match["win"]
+        most_played_heroes.append(sorted(heroes.items(), key=lambda item: item[1][0],
+                                         reverse=True))
+    return most_played_heroes
+
+def measure(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    with open(HEROES_DICT) as content:
+        hero_dict = json.load(content)
+    heroes = get_heroes()
+    print("{:>8} {:>8} {:>14} {:>14} {:>14} {:>14}".format(
+        "matches", "team", "legacy matches", "sorted matches", "legacy heroes", "sorted heroes"))
+    for n_matches in sizes:
+        dota_team = []
+        for idx, matches in enumerate(synthetic.get_team_player_matches(n_matches, 5)):
+            dota_player = DotaPlayer(str(idx), "bench"+str(idx))
+            dota_player.player_matches = matches
+            dota_player.match_columns = dota_player.match_columns
+            dota_team.append(dota_player)
+        team = DotaTeam()
+        team.dota_team = dota_team
+        matches, sorted_matches = measure(team.get_team_simplified_matches)
+        team.matches = matches
+        _, sorted_heroes = measure(lambda: team.get_most_played_heroes(heroes))
+        if n_matches <= LEGACY_MAX_MATCHES:
+            legacy, legacy_matches = measure(lambda: legacy_team_matches(dota_team))
+            assert legacy == matches
+            _, legacy_heroes = measure(
+                lambda: legacy_most_played_heroes(dota_team, matches, hero_dict))
+            legacy_matches = "{:.1f}ms".format(legacy_matches*1000)
+            legacy_heroes = "{:.1f}ms".format(legacy_heroes*1000)
+        else:
+            legacy_matches = legacy_heroes = "skipped"
+        print("{:>8} {:>8} {:>14} {:>12.1f}ms {:>14} {:>12.1f}ms".format(
+            n_matches, len(matches), legacy_matches, sorted_matches*1000,
+            legacy_heroes, sorted_heroes*1000))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+'''
+Synthetic OpenDota-like payloads used by the benchmarks (no network access needed)
+'''
+import random
+
+def get_player_matches(n_matches, seed=0):
+    '''
+    Returns a list like https://api.opendota.com/api/players/<account_id>/matches
+    (newest match first)
+    '''
+    rnd = random.Random(seed)
+    matches = []
+    match_id = 6_500_000_000
+    start_time = 1_650_000_000
+    for _ in range(n_matches):
+        match_id -= rnd.randint(1, 50_000)
+        start_time -= rnd.randint(600, 40_000)
+        matches.append({
+            "match_id": match_id,
+            "player_slot": rnd.choice((0, 1, 2, 3, 4, 128, 129, 130, 131, 132)),
+            "radiant_win": rnd.random() < 0.5,
+            "duration": rnd.randint(900, 4000),
+            "game_mode": rnd.choice((1, 22, 22, 22, 23, 18)),
+            "lobby_type": rnd.choice((0, 7)),
+            "hero_id": rnd.randint(1, 135),
+            "start_time": start_time,
+            "version": rnd.choice((None, 21)),
+            "kills": rnd.randint(0, 20),
+            "deaths": rnd.randint(0, 15),
+            "assists": rnd.randint(0, 30),
+            "skill": None,
+            "average_rank": rnd.randint(10, 80),
+            "leaver_status": 0,
+            "party_size": rnd.randint(1, 5),
+        })
+    return matches
+
+def get_team_player_matches(n_matches, n_players, shared=0.8, seed=0):
+    '''
+    Returns a list of n_players lists of matches taken from the same history: each player
+    played each match with probability shared, on the same side but with its own hero/k/d/a
+    '''
+    base = get_player_matches(n_matches, seed)
+    teams = []
+    for player in range(n_players):
+        rnd = random.Random(seed*100 + player + 1)
+        matches = []
+        for match in base:
+            if rnd.random() >= shared:
+                continue
+            matches.append(dict(match,
+                                player_slot=(match["player_slot"] & 128) + rnd.randint(0, 4),
+                                hero_id=rnd.randint(1, 135),
+                                kills=rnd.randint(0, 20),
+                                deaths=rnd.randint(0, 15),
+                                assists=rnd.randint(0, 30)))
+        teams.append(matches)
+    return teams
+
+def get_player_info(account_id, player_name):
+    return {"profile": {"account_id": int(account_id), "personaname": player_name,
+                        "avatar": "https://example.invalid/avatar.jpg"},
+            "rank_tier": 45, "leaderboard_rank": None}
+
+def get_player_wardmap(seed=0):
+    rnd = random.Random(seed)
+    return {kind: {str(x): {str(y): rnd.randint(1, 30) for y in range(64, 192, 2)}
+                   for x in range(64, 192, 2)} for kind in ("obs", "sen")}
+
+def get_player_wordcloud(seed=0):
+    rnd = random.Random(seed)
+    words = ["gg", "ez", "wp", "mid", "report", "push", "def", "ty", "np", "lol"]
+    return {kind: {word+str(idx): rnd.randint(1, 500) for word in words for idx in range(200)}
+            for kind in ("my_word_counts", "all_word_counts")}
+
+def get_match_info(match_id, seed=0):
+    '''
+    Returns a dict like https://api.opendota.com/api/matches/<match_id> (main fields only)
+    '''
+    rnd = random.Random(seed)
+    return {
+        "match_id": int(match_id),
+        "start_time": 1_650_000_000 + rnd.randint(0, 10**7),
+        "duration": rnd.randint(900, 4000),
+        "radiant_win": rnd.random() < 0.5,
+        "game_mode": 22,
+        "players": [{"player_slot": slot, "hero_id": rnd.randint(1, 135),
+                     "kills": rnd.randint(0, 20), "deaths": rnd.randint(0, 15),
+                     "gold_t": [rnd.randint(0, 30000) for _ in range(60)],
+                     "purchase_log": [{"time": rnd.randint(0, 3600), "key": "item_"+str(idx)}
+                                      for idx in range(40)]}
+                    for slot in (0, 1, 2, 3, 4, 128, 129, 130, 131, 132)],
+    }
@@ -3,8 +3,7 @@
 import dash_bootstrap_components as dbc
 import logging
 from dash import dcc, html
-from dotanalysis_control.dta import (get_available_players, get_dota_player, get_dota_team,
-                                     heroes_dict)
+from dotanalysis_control.dta import get_catalog, get_team_results
 
 ################ Logging information
 logger = logging.getLogger(__name__)
@@ -34,19 +33,19 @@ style_register_box = {
 }
 
 def players_table():
-    t_header = ["Player", "Last Updated"]
+    t_header = ["Player", "Last Updated", "Matches"]
     players_table_header = [
         html.Thead(html.Tr([html.Th(h) for h in t_header]))
     ]
     rows = []
-    dota_players = get_available_players()
-    if dota_players == ["EMPTY"]:
+    catalog = get_catalog()
+    if not catalog:
         return []
-    for player in dota_players:
-        dota_player = get_dota_player(player)
+    for player in sorted(catalog):
         rows.append(html.Tr([
             html.Td(dcc.Link(player, href="/players/"+player)),
-            html.Td(dota_player.data_info["Last Updated"]),
+            html.Td(catalog[player]["last_updated"]),
+            html.Td(catalog[player]["matches"]),
         ]))
     players_table_body = [html.Tbody(rows)]
     players_table = dbc.Table(players_table_header + players_table_body,
@@ -58,14 +57,13 @@ def players_table():
     return players_table
 
 def get_players_data(dota_team):
-    dota_team_obj = get_dota_team(dota_team)
-
-    most_played_heroes_list = dota_team_obj.get_most_played_heroes_df(heroes_dict)
+    most_played_heroes = get_team_results(dota_team)["most_played_heroes"]
     player_data = [[], [], [], [], []]
     for idx, player in enumerate(dota_team):
         player_data[idx].append(dcc.Markdown(f"#### {player}"))
 
-    for idx, mph_df in enumerate(most_played_heroes_list):
+    for idx, player in enumerate(dota_team):
+        mph_df = most_played_heroes[player]
         most_played_heroes_tables = dbc.Table.from_dataframe(mph_df,
                                                              dark=True,
                                                              striped=True,
@@ -76,13 +74,13 @@ def get_players_data(dota_team):
     return player_data
 
 def get_team_info(dota_team):
-    dota_team_obj = get_dota_team(dota_team)
-    wins = sum([result["win"] for result in dota_team_obj.matches])
-    losses = len(dota_team_obj.matches) - wins
+    team_results = get_team_results(dota_team)
+    wins = sum([result["win"] for result in team_results["matches"]])
+    losses = len(team_results["matches"]) - wins
     team_info = ["Wins: "+str(wins), html.Br(), "Losses: "+str(losses), html.Br()]
-    radiant_winrate, radiant_matches = dota_team_obj.get_team_radiant_winrate_matches()
+    radiant_winrate, radiant_matches = team_results["radiant"]
     radiant_winrate = "{:10.2f}".format(radiant_winrate)
-    dire_winrate, dire_matches = dota_team_obj.get_team_dire_winrate_matches()
+    dire_winrate, dire_matches = team_results["dire"]
     dire_winrate = "{:10.2f}".format(dire_winrate)
     team_info.append("Radiant Winrate: "+str(radiant_winrate)+"%, Matches: "+str(radiant_matches))
     team_info.append(html.Br())
@@ -93,7 +91,7 @@ def get_team_info(dota_team):
 def get_monthly_matches_data(dota_team, date):
     monthly_matches_data = []
     if dota_team:
-        dota_team_obj = get_dota_team(dota_team)
+        dota_team_obj = get_team_results(dota_team)["team"]
         team_matches_month_df = dota_team_obj.get_monthly_matches_df(date)
 
         if not team_matches_month_df.empty:
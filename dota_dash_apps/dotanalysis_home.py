@@ -16,6 +16,8 @@ logger = logging.getLogger(__name__)
 
 ##################### QUEUE
 dash_queue = queue.Queue()
+# Players reported by the running "update all", by status ("done"/"failed")
+update_status = {"done": [], "failed": []}
 
 ################ APP LAYOUT
 app_layout = html.Center(html.Div([
@@ -72,7 +74,7 @@ app_layout = html.Center(html.Div([
         ),
         dbc.Col(
             dbc.Fade(
-                dbc.Button("OK", className="btn-outline-success disabled"),
+                dbc.Button("OK", id="update-status", className="btn-outline-success disabled"),
                 id="ok-fade",
                 is_in=False,
                 appear=False,
@@ -87,10 +89,31 @@ app_layout = html.Center(html.Div([
 ],style=style_register_box))
 
 ################ FUNCTIONS
+def get_update_status(last_player=None, finished=False):
+    '''
+    Text and className of the update status button, given the players reported so far
+    '''
+    done, failed = update_status["done"], update_status["failed"]
+    status_class = "btn-outline-danger disabled" if failed else "btn-outline-success disabled"
+    if finished:
+        status_str = f"{len(done)} players updated"
+        if failed:
+            status_str += f", {len(failed)} failed: " + ", ".join(failed)
+        else:
+            status_str = "OK - " + status_str
+        return status_str, status_class
+    status_str = f"{len(done)} updated"
+    if failed:
+        status_str += f", {len(failed)} failed"
+    if last_player:
+        status_str += " - {} {}".format(*last_player)
+    return status_str, status_class
+
 def trigger_queue():
     ok_fade = dash.no_update
     trigger = dash.no_update
     trigger_interval = dash.no_update
+    status_str, status_class = dash.no_update, dash.no_update
     progress = -1
 
     while dash_queue.qsize():
@@ -98,14 +121,23 @@ def trigger_queue():
         if isinstance(queue_info, int) or isinstance(queue_info, float):
             progress = queue_info
         elif isinstance(queue_info, tuple):
-            if queue_info[0] == "status":
+            if queue_info[0] == "player":
+                # Each player as it finishes: "<n> updated, <m> failed - <player> <status>"
+                _, player, player_status = queue_info
+                logger.debug("Player %s update %s", player, player_status)
+                update_status.setdefault(player_status, []).append(player)
+                status_str, status_class = get_update_status((player, player_status))
+                ok_fade = True
+            elif queue_info[0] == "status":
                 # script just finished, so we need to check if tput graph is needed
                 if queue_info[1] == "finished":
                     progress = 0
                     ok_fade = True
+                    status_str, status_class = get_update_status(finished=True)
     if progress == -1: progress, progress_str = dash.no_update, dash.no_update
     else: progress_str = f"{int(progress)} %" if progress >= 5 else ""
-    return ok_fade, dash.no_update, trigger, trigger_interval, progress, progress_str
+    return (ok_fade, dash.no_update, trigger, trigger_interval, progress, progress_str,
+            status_str, status_class)
 
 ################ CALLBACK DEFINITION
 @app.callback(
@@ -142,6 +174,8 @@ def update_output(available_players, players_collapse):
         Output('trigger', 'n_intervals'),
         Output("progress", "value"),
         Output("progress", "label"),
+        Output('update-status', 'children'),
+        Output('update-status', 'className'),
     ],
     [
         Input('update-all', 'n_clicks'),
@@ -152,6 +186,7 @@ def update_all_players(update_all_btn, trigger):
     if trigger:
         return trigger_queue()
     if update_all_btn is not None:
+        update_status["done"], update_status["failed"] = [], []
         update_all(dash_queue)
-        return dash.no_update, None, False, 0, dash.no_update, dash.no_update
-    return (dash.no_update,)*6
+        return False, None, False, 0, dash.no_update, dash.no_update, "", dash.no_update
+    return (dash.no_update,)*8
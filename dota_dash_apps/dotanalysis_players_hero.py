@@ -7,7 +7,7 @@ from dash import html, dcc
 from dash.dependencies import Input, Output, State
 from dash_app import app
 from dota_dash_apps.dotanalysis_dash_components import style_center, style_update
-from dotanalysis_control.dta import get_dota_player, register_player, heroes_dict, get_available_dota_players
+from dotanalysis_control.dta import get_dota_player, register_player, heroes, get_match_index
 
 ################ Logging information
 logger = logging.getLogger(__name__)
@@ -21,7 +21,7 @@ DOTA_DB_PLAYERS = os.path.join(DOTA_DB, "players")
 ################ APP LAYOUT
 def app_layout(player, hero):
     dota_player = get_dota_player(player)
-    hero_performance = dota_player.get_hero_performance_with_players(hero, get_available_dota_players(), heroes_dict)
+    hero_performance = dota_player.get_hero_performance_with_players(hero, get_match_index(), heroes)
 
     hero_performance_table = dbc.Table.from_dataframe(
                                     hero_performance.sort_values("t_matches", ascending=False),
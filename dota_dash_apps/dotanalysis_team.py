@@ -9,7 +9,7 @@ from dash import html, dcc
 from dash.dependencies import Input, Output, State
 from dash_app import app
 from dota_dash_apps.dotanalysis_dash_components import (style_center, get_players_data, get_team_info, get_monthly_matches_data)
-from dotanalysis_control.dta import (get_available_players, get_dota_team)
+from dotanalysis_control.dta import (get_available_players, get_team_results)
 
 ################ LOGGING
 logger = logging.getLogger(__name__)
@@ -150,8 +150,7 @@ def updating_dota_team(*args):
     Input('dota-team', 'data')
 )
 def plot_winrate_graph_callback(dota_team):
-    dota_team_obj = get_dota_team(dota_team)
-    fig = dota_team_obj.get_winrate_fig()
+    fig = get_team_results(dota_team)["winrate_fig"]
     if dota_team:
         return fig, {'display':'block'}
     return fig, {'display':'none'}
@@ -180,8 +179,7 @@ def get_team_info_callback(dota_team):
 def get_team_winrate_callback(dota_team):
     if not dota_team:
         return " %"
-    dota_team_obj = get_dota_team(dota_team)
-    return "{:10.2f}".format(dota_team_obj.get_team_winrate())+" %",
+    return "{:10.2f}".format(get_team_results(dota_team)["winrate"])+" %",
 
 ## Expand "More" info card
 @app.callback(
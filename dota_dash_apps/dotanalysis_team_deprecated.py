@@ -10,7 +10,7 @@ from dash.dependencies import Input, Output, State
 from dota_lib.dota_team import DotaTeam
 from dash_app import app
 from dota_dash_apps.dotanalysis_dash_components import style_center
-from dotanalysis_control.dta import get_available_players, get_dota_player, heroes_dict
+from dotanalysis_control.dta import get_available_players, get_dota_player, heroes
 
 ################ Logging information
 logger = logging.getLogger(__name__)
@@ -186,7 +186,7 @@ def get_dota_team(team):
 
 def get_most_played_heroes():
     global dota_team_obj
-    most_played_heroes_list = dota_team_obj.get_most_played_heroes(heroes_dict)
+    most_played_heroes_list = dota_team_obj.get_most_played_heroes(heroes)
     table_header = [
         html.Thead(html.Tr([html.Th("Hero"), html.Th("Matches"), html.Th("Winrate")]))
     ]
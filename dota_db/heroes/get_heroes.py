@@ -2,13 +2,19 @@
 OpenDota documentation for heroes queries:
 https://docs.opendota.com/#tag/heroes
 '''
-import requests
 import json
+import os
+import sys
 import pandas as pd
 
+# dota_lib lives two folders above dota_db/heroes
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from dota_lib.dota_client import get_client
+
 # Query OpenDota API for heroes
-dota_heroes_api = 'https://api.opendota.com/api/heroes'
-dota_heroes_response = requests.get(dota_heroes_api)
+dota_heroes_response = get_client().get("heroes")
+if dota_heroes_response is None or dota_heroes_response.status_code != 200:
+    sys.exit("Error querying OpenDota heroes")
 
 # Parse response into a json
 dota_heroes = json.loads(dota_heroes_response.text)
@@ -0,0 +1,192 @@
+'''
+On-disk cache of OpenDota API responses, used by the shared OpenDotaClient.
+Each response is kept as <sha1 of url>.body + <sha1 of url>.json (metadata) under cache_dir:
+- entries are fresh for a TTL that depends on the endpoint class (see CACHE_TTL)
+- stale entries are revalidated with If-None-Match/If-Modified-Since when the server
+  gave an ETag/Last-Modified, so an unchanged resource costs a 304 without body
+- once the cache grows over max_size bytes, least recently used entries are evicted
+'''
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import requests
+from requests.structures import CaseInsensitiveDict
+from dota_lib.dota_io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+HTTP_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "dota_db", "http_cache")
+HTTP_CACHE_MAX_SIZE = 256*1024*1024
+
+# Seconds a response stays fresh, per endpoint class (see OpenDotaClient.get_endpoint)
+# or per first path segment. Endpoints not listed are not cached, e.g. players/<id>/matches
+# or matches/<id> (DotaMatch keeps the details it downloaded under dota_db/matches anyway)
+CACHE_TTL = {
+    "heroes": 7*86400,
+    "constants": 7*86400,
+    "players/<id>": 10*60,
+    "players/<id>/wardmap": 10*60,
+    "players/<id>/wordcloud": 10*60,
+}
+
+class DotaResponseCache:
+    '''
+    DotaResponseCache class to keep OpenDota responses on disk
+    - cache_dir : folder of the cache files (created if needed)
+    - max_size : max total size of the cached bodies, in bytes
+    - ttl : dict of endpoint class -> seconds, defaults to CACHE_TTL
+    '''
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, max_size=HTTP_CACHE_MAX_SIZE, ttl=None):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self._index = None
+        self._lock = threading.RLock()
+
+    def __repr__(self) -> str:
+        return "DotaResponseCache('{}', max_size={})".format(self.cache_dir, self.max_size)
+
+    @staticmethod
+    def get_key(url, params=None):
+        '''
+        Full URL of the request (query string included) and its cache file name
+        '''
+        url = requests.Request("GET", url, params=params).prepare().url
+        return url, hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get_ttl(self, endpoint):
+        return self.ttl.get(endpoint, self.ttl.get(endpoint.split("/")[0], 0))
+
+    @property
+    def index(self):
+        '''
+        dict of key -> metadata of every cached response, read from cache_dir on first access
+        '''
+        with self._lock:
+            if self._index is None:
+                self._index = {}
+                os.makedirs(self.cache_dir, exist_ok=True)
+                for file_name in os.listdir(self.cache_dir):
+                    if not file_name.endswith(".json"):
+                        continue
+                    try:
+                        with open(os.path.join(self.cache_dir, file_name)) as content:
+                            self._index[file_name[:-5]] = json.load(content)
+                    except (OSError, ValueError):
+                        logger.warning("Invalid cache entry %s, ignoring it", file_name)
+            return self._index
+
+    def get(self, key):
+        '''
+        Metadata of a cached response (with its "body"), or None
+        '''
+        with self._lock:
+            meta = self.index.get(key)
+            if meta is None:
+                return None
+            try:
+                with open(os.path.join(self.cache_dir, key+".body"), 'rb') as content:
+                    body = content.read()
+            except OSError:
+                self.index.pop(key, None)
+                return None
+            meta["last_access"] = time.time()
+            return dict(meta, body=body)
+
+    def is_fresh(self, entry):
+        return time.time() - entry["stored_at"] < entry["ttl"]
+
+    def put(self, key, url, endpoint, response):
+        '''
+        Store a 200 response (only if its endpoint class has a TTL)
+        '''
+        ttl = self.get_ttl(endpoint)
+        if not ttl:
+            return
+        meta = {
+            "url": url,
+            "endpoint": endpoint,
+            "ttl": ttl,
+            "stored_at": time.time(),
+            "last_access": time.time(),
+            "size": len(response.content),
+            "encoding": response.encoding,
+            "headers": {name: response.headers[name] for name in
+                        ("Content-Type", "ETag", "Last-Modified") if name in response.headers},
+        }
+        with self._lock:
+            # Reading the index first also creates cache_dir
+            index = self.index
+            atomic_write(os.path.join(self.cache_dir, key+".body"), response.content)
+            self.save_meta(key, meta)
+            index[key] = meta
+            self.evict()
+
+    def touch(self, key):
+        '''
+        Mark a cached response as fresh again (after a 304 Not Modified)
+        '''
+        with self._lock:
+            meta = self.index.get(key)
+            if meta:
+                meta["stored_at"] = time.time()
+                self.save_meta(key, meta)
+
+    def save_meta(self, key, meta):
+        atomic_write(os.path.join(self.cache_dir, key+".json"), json.dumps(meta).encode('utf-8'))
+
+    def remove(self, key):
+        with self._lock:
+            self.index.pop(key, None)
+            for suffix in (".body", ".json"):
+                try:
+                    os.remove(os.path.join(self.cache_dir, key+suffix))
+                except FileNotFoundError:
+                    pass
+
+    def evict(self):
+        '''
+        Remove least recently used entries until the cache fits in max_size
+        '''
+        with self._lock:
+            size = sum(meta["size"] for meta in self.index.values())
+            if size <= self.max_size:
+                return
+            for key, meta in sorted(self.index.items(), key=lambda item: item[1]["last_access"]):
+                if size <= self.max_size:
+                    break
+                size -= meta["size"]
+                self.remove(key)
+                logger.debug("Cache entry %s evicted", meta["url"])
+
+    def clear(self):
+        with self._lock:
+            for key in list(self.index):
+                self.remove(key)
+
+    def stats(self):
+        '''
+        Returns a dict with the number of cached responses and their total size
+        '''
+        with self._lock:
+            return {"entries": len(self.index),
+                    "size": sum(meta["size"] for meta in self.index.values()),
+                    "max_size": self.max_size}
+
+    @staticmethod
+    def get_response(entry):
+        '''
+        Build a requests.Response from a cached entry
+        '''
+        response = requests.Response()
+        response.status_code = 200
+        response.url = entry["url"]
+        response._content = entry["body"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = entry["encoding"]
+        response.from_cache = True
+        return response
@@ -0,0 +1,109 @@
+'''
+Catalog of the players stored in a dota_db players folder.
+A single catalog.json keeps a summary of every player, so listing players doesn't require
+listing folders or loading each player's data
+'''
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime as dtm
+from dota_lib.dota_io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "catalog.json"
+
+# Serializes read-modify-write cycles of catalog files within the process
+_catalog_lock = threading.Lock()
+
+class DotaCatalog:
+    '''
+    DotaCatalog class to read and update <players_path>/catalog.json
+    Each entry is keyed by the player's folder name (<player_name>_<account_id>) and has:
+    - "account_id", "player_name"
+    - "last_updated" : data_info["Last Updated"]
+    - "last_full_sync" : data_info["Last Full Sync"] (last full download of matches)
+    - "matches" : number of matches stored
+    - "first_match" / "last_match" : date range of the stored matches (<year>-<month>-<day>)
+    - "data_version" : increased every time the player is saved
+    '''
+    def __init__(self, players_path):
+        self.players_path = players_path
+        self.catalog_path = os.path.join(players_path, CATALOG_FILE)
+
+    def __repr__(self) -> str:
+        return "DotaCatalog('{}')".format(self.catalog_path)
+
+    def exists(self):
+        return os.path.isfile(self.catalog_path)
+
+    def load(self):
+        '''
+        Returns the catalog's dict (empty dict if there is no catalog yet)
+        '''
+        if not self.exists():
+            return {}
+        with open(self.catalog_path) as content:
+            return json.load(content)
+
+    def save(self, catalog):
+        '''
+        Write the whole catalog atomically (temporary file + os.replace)
+        '''
+        atomic_write(self.catalog_path,
+                     json.dumps(catalog, ensure_ascii=False, indent=4, sort_keys=True).encode('utf-8'))
+
+    @staticmethod
+    def get_entry(dota_player, data_version=1):
+        '''
+        Build a catalog entry from a DotaPlayer object
+        '''
+        start_time = dota_player.match_columns.start_time
+        entry = {
+            "account_id": str(dota_player.account_id),
+            "player_name": dota_player.player_name,
+            "last_updated": dota_player.data_info.get("Last Updated", ""),
+            "last_full_sync": dota_player.data_info.get("Last Full Sync", ""),
+            "matches": int(len(start_time)),
+            "first_match": "",
+            "last_match": "",
+            "data_version": data_version,
+        }
+        if len(start_time):
+            entry["first_match"] = dtm.fromtimestamp(int(start_time.min())).strftime("%Y-%m-%d")
+            entry["last_match"] = dtm.fromtimestamp(int(start_time.max())).strftime("%Y-%m-%d")
+        return entry
+
+    def update_player(self, player, dota_player):
+        '''
+        Add/refresh the entry of player (folder name) with the data of dota_player
+        Returns False if there is no catalog yet: it has to list every player folder (see
+        rebuild), so it is not created from a single entry
+        '''
+        with _catalog_lock:
+            if not self.exists():
+                logger.info("No catalog in %s, %s not added", self.players_path, player)
+                return False
+            catalog = self.load()
+            data_version = catalog.get(player, {}).get("data_version", 0) + 1
+            catalog[player] = self.get_entry(dota_player, data_version)
+            self.save(catalog)
+        logger.info("Catalog entry updated for %s (data_version=%s)", player, data_version)
+        return True
+
+    def rebuild(self, dota_players):
+        '''
+        Rewrite the catalog from scratch given a dict of player (folder name) -> DotaPlayer
+        '''
+        started = time.time()
+        with _catalog_lock:
+            old_catalog = self.load()
+            catalog = {}
+            for player, dota_player in dota_players.items():
+                data_version = old_catalog.get(player, {}).get("data_version", 1)
+                catalog[player] = self.get_entry(dota_player, data_version)
+            self.save(catalog)
+        logger.info("Catalog rebuilt with %s players in %.2fs", len(catalog), time.time()-started)
+        return catalog
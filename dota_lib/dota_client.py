@@ -0,0 +1,272 @@
+'''
+Shared HTTP client for the OpenDota API (https://api.opendota.com/api/)
+Refer to OpenDota API official documentation: https://docs.opendota.com/
+- a single pooled keep-alive requests.Session for every DotaPlayer/DotaMatch query
+- retries on 429/5xx/connection errors with exponential backoff + jitter, honoring Retry-After
+- configurable timeouts
+- a token bucket rate limiter shared by all threads, matched to OpenDota's quota
+- an optional on-disk response cache (see dota_cache), read through by get
+- latency, retries, bytes and cache hits counted per endpoint
+'''
+import email.utils
+import logging
+import os
+import random
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from dota_lib.dota_cache import DotaResponseCache
+
+logger = logging.getLogger(__name__)
+
+OPENDOTA_API = "https://api.opendota.com/api/"
+
+# HTTP status codes worth retrying
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# OpenDota's free tier allows 60 requests per minute
+RATE_LIMIT_PER_MINUTE = 60
+RATE_LIMIT_BURST = 5
+
+# Set DOTA_HTTP_CACHE=0 to disable the on-disk response cache of the shared client
+HTTP_CACHE_ENABLED = os.environ.get("DOTA_HTTP_CACHE", "1") != "0"
+
+class TokenBucket:
+    '''
+    Thread-safe token bucket rate limiter
+    - rate : tokens added per second
+    - capacity : max tokens accumulated (burst size)
+    '''
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "TokenBucket(rate={}, capacity={})".format(self.rate, self.capacity)
+
+    def acquire(self, tokens=1):
+        '''
+        Block until tokens are available, returns the number of seconds waited
+        '''
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return waited
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+class OpenDotaClient:
+    '''
+    OpenDotaClient class to query the OpenDota API through a pooled session
+    - timeout : (connect timeout, read timeout) in seconds
+    - max_retries : number of retries after the first attempt
+    - backoff_base / backoff_max : exponential backoff parameters in seconds
+    - pool_size : max number of keep-alive connections kept in the pool
+    - limiter : TokenBucket shared by every request (None disables rate limiting)
+    - cache : DotaResponseCache read through by non-streamed requests (None disables it)
+    '''
+    def __init__(self, timeout=(5, 60), max_retries=5, backoff_base=1.0, backoff_max=120.0,
+                 pool_size=10, limiter=None, cache=None):
+        self.timeout = timeout
+        self.limiter = limiter
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+        logger.info("OpenDotaClient created, timeout=%s, max_retries=%s", timeout, max_retries)
+
+    def __repr__(self) -> str:
+        return "OpenDotaClient(timeout={}, max_retries={})".format(self.timeout, self.max_retries)
+
+    @staticmethod
+    def get_url(path):
+        '''
+        Accepts either a full URL or a path relative to OPENDOTA_API
+        '''
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return OPENDOTA_API + path.lstrip("/")
+
+    @staticmethod
+    def get_endpoint(url):
+        '''
+        Endpoint class of an URL, used to group stats, e.g. "players/<id>/matches"
+        '''
+        path = url.split("?")[0]
+        if path.startswith(OPENDOTA_API):
+            path = path[len(OPENDOTA_API):]
+        return re.sub(r"/\d+", "/<id>", "/"+path.strip("/")).lstrip("/")
+
+    def get_backoff(self, attempt, response=None):
+        '''
+        Seconds to wait before retry number attempt (starting at 0)
+        Retry-After (seconds or HTTP date) is honored when provided by the server,
+        otherwise exponential backoff with full jitter is used
+        '''
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                try:
+                    retry_date = email.utils.parsedate_to_datetime(retry_after)
+                    return min(max(retry_date.timestamp() - time.time(), 0), self.backoff_max)
+                except (TypeError, ValueError):
+                    logger.warning("Invalid Retry-After header: %s", retry_after)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    def get(self, path, params=None, stream=False, timeout=None):
+        '''
+        GET an OpenDota API path (or full URL). Retries on 429/5xx and connection errors
+        Returns the last requests.Response (callers check status_code), or None if the
+        server could not be reached at all
+        Non-streamed requests go through the cache: fresh responses are returned without
+        querying the server, stale ones are revalidated when possible
+        '''
+        url = self.get_url(path)
+        endpoint = self.get_endpoint(url)
+        timeout = timeout or self.timeout
+        headers = {}
+        cached = None
+        if self.cache and not stream:
+            cache_url, cache_key = self.cache.get_key(url, params)
+            cached = self.cache.get(cache_key)
+            if cached and self.cache.is_fresh(cached):
+                self.record_cache_hit(endpoint)
+                return self.cache.get_response(cached)
+            if cached and "ETag" in cached["headers"]:
+                headers["If-None-Match"] = cached["headers"]["ETag"]
+            if cached and "Last-Modified" in cached["headers"]:
+                headers["If-Modified-Since"] = cached["headers"]["Last-Modified"]
+        response = None
+        for attempt in range(self.max_retries + 1):
+            if self.limiter:
+                self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, stream=stream, timeout=timeout,
+                                            headers=headers)
+            except (requests.ConnectionError, requests.Timeout) as exception:
+                self.record(endpoint, time.perf_counter() - started, error=True)
+                logger.warning("GET %s failed (%s), attempt %s/%s", url, exception,
+                               attempt + 1, self.max_retries + 1)
+                response = None
+            else:
+                # Streamed bodies are counted while read, see iter_content
+                size = 0 if stream else len(response.content)
+                self.record(endpoint, time.perf_counter() - started, size=size,
+                            error=response.status_code not in (200, 304))
+                if cached and response.status_code == 304:
+                    self.cache.touch(cache_key)
+                    self.record_cache_hit(endpoint, revalidated=True)
+                    return self.cache.get_response(cached)
+                if self.cache and not stream and response.status_code == 200:
+                    self.cache.put(cache_key, cache_url, endpoint, response)
+                if response.status_code not in RETRY_STATUS:
+                    return response
+                logger.warning("HTTP error %s received for %s, attempt %s/%s",
+                               response.status_code, url, attempt + 1, self.max_retries + 1)
+            if attempt == self.max_retries:
+                break
+            if response is not None and stream:
+                response.close()
+            backoff = self.get_backoff(attempt, response)
+            self.record_retry(endpoint)
+            logger.info("Waiting %.1f seconds before querying %s again", backoff, url)
+            time.sleep(backoff)
+        logger.error("Giving up on %s after %s attempts", url, self.max_retries + 1)
+        return response
+
+    def iter_content(self, response, chunk_size):
+        '''
+        Iterate over a streamed response's body, counting its bytes in the endpoint's stats
+        '''
+        endpoint = self.get_endpoint(response.url)
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            with self._lock:
+                self.get_endpoint_stats(endpoint)["bytes"] += len(chunk)
+            yield chunk
+
+    def record(self, endpoint, latency, size=0, error=False):
+        with self._lock:
+            stats = self.get_endpoint_stats(endpoint)
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["bytes"] += size
+            stats["latency"] += latency
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self.get_endpoint_stats(endpoint)["retries"] += 1
+
+    def record_cache_hit(self, endpoint, revalidated=False):
+        with self._lock:
+            stats = self.get_endpoint_stats(endpoint)
+            stats["cache_hits"] += 1
+            stats["revalidated"] += int(revalidated)
+
+    def get_endpoint_stats(self, endpoint):
+        # Must be called with self._lock held
+        return self._stats.setdefault(endpoint, {"requests": 0, "errors": 0, "retries": 0,
+                                                 "bytes": 0, "latency": 0.0,
+                                                 "cache_hits": 0, "revalidated": 0})
+
+    def stats(self):
+        '''
+        Returns a dict of endpoint -> requests, errors, retries, bytes, total and mean latency,
+        cache hits (revalidated ones included)
+        '''
+        with self._lock:
+            stats = {endpoint: dict(values) for endpoint, values in self._stats.items()}
+        for values in stats.values():
+            values["mean_latency"] = values["latency"] / max(values["requests"], 1)
+        return stats
+
+    def log_stats(self):
+        for endpoint, values in sorted(self.stats().items()):
+            logger.info("%s: %s requests, %s errors, %s retries, %s bytes, %.3fs mean latency, "
+                        "%s cache hits (%s revalidated)",
+                        endpoint, values["requests"], values["errors"], values["retries"],
+                        values["bytes"], values["mean_latency"],
+                        values["cache_hits"], values["revalidated"])
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    '''
+    Returns the process-wide OpenDotaClient (created on first use)
+    '''
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = OpenDotaClient(
+                limiter=TokenBucket(RATE_LIMIT_PER_MINUTE/60, RATE_LIMIT_BURST),
+                cache=DotaResponseCache() if HTTP_CACHE_ENABLED else None)
+        return _client
+
+def set_client(client):
+    '''
+    Replace the process-wide OpenDotaClient, e.g. to use other timeouts/retries
+    '''
+    global _client
+    with _client_lock:
+        _client = client
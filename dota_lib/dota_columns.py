@@ -0,0 +1,375 @@
+'''
+Columnar storage for a player's history of matches.
+Each field is kept as a fixed-width NumPy array and saved as a .npy file, so a stored
+player can be opened with mmap instead of parsing the whole player_matches.json.
+Files are partitioned by month, so date-bounded queries only open the months they need
+'''
+import codecs
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+from array import array
+import numpy as np
+import pandas as pd
+from dateutil.tz import gettz
+from dota_lib.dota_io import GZIP_SUFFIX, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Directory (inside the player's folder) holding one sub-folder per month, each with
+# one .npy file per column
+COLUMNS_DIR = "player_matches_columns"
+PARTITIONS_FILE = "partitions.json"
+
+# Column name -> fixed-width dtype
+MATCH_COLUMNS = {
+    "match_id": np.int64,
+    "start_time": np.int64,
+    "hero_id": np.int16,
+    "player_slot": np.uint8,
+    "radiant_win": np.bool_,
+    "game_mode": np.uint8,
+    "kills": np.int16,
+    "deaths": np.int16,
+    "assists": np.int16,
+    "duration": np.int32,
+}
+
+# array.array typecode matching each column's dtype (used while streaming)
+BUFFER_TYPECODES = {
+    "match_id": "q",
+    "start_time": "q",
+    "hero_id": "h",
+    "player_slot": "B",
+    "radiant_win": "B",
+    "game_mode": "B",
+    "kills": "h",
+    "deaths": "h",
+    "assists": "h",
+    "duration": "i",
+}
+
+class MatchColumns:
+    '''
+    MatchColumns class holding a player's matches as one NumPy array per field.
+    Columns are reachable either as attributes (columns.match_id) or by name (columns["hero_id"])
+    '''
+    def __init__(self, columns=None):
+        columns = columns or {}
+        self.columns = {}
+        for name, dtype in MATCH_COLUMNS.items():
+            if name in columns:
+                self.columns[name] = columns[name]
+            else:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+
+    def __repr__(self) -> str:
+        return "MatchColumns({} matches)".format(len(self))
+
+    def __len__(self) -> int:
+        return len(self.columns["match_id"])
+
+    def __getattr__(self, name):
+        columns = self.__dict__.get("columns", {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        '''
+        columns["name"] returns a single column, any other key (mask, slice, index array)
+        returns a new MatchColumns with the selected rows
+        '''
+        if isinstance(key, str):
+            return self.columns[key]
+        return MatchColumns({name: column[key] for name, column in self.columns.items()})
+
+    @classmethod
+    def from_matches(cls, matches):
+        '''
+        Build columns from OpenDota's list of matches (list of dicts)
+        Missing/null values are stored as 0 (False for "radiant_win")
+        '''
+        matches = matches or []
+        columns = {}
+        for name, dtype in MATCH_COLUMNS.items():
+            columns[name] = np.fromiter((match.get(name) or 0 for match in matches),
+                                        dtype=dtype, count=len(matches))
+        return cls(columns)
+
+    @classmethod
+    def concatenate(cls, parts):
+        '''
+        Concatenate several MatchColumns objects (a single part is returned as is)
+        '''
+        if len(parts) == 1:
+            return parts[0]
+        return cls({name: np.concatenate([part[name] for part in parts])
+                    for name in MATCH_COLUMNS})
+
+    def filter_time(self, start_time=None, end_time=None):
+        '''
+        Returns the matches with start_time >= start_time and start_time < end_time
+        (unix timestamps, None means unbounded)
+        '''
+        if start_time is None and end_time is None:
+            return self
+        mask = np.ones(len(self), dtype=bool)
+        if start_time is not None:
+            mask &= self.columns["start_time"] >= start_time
+        if end_time is not None:
+            mask &= self.columns["start_time"] < end_time
+        return self[mask]
+
+    def get_months(self):
+        '''
+        Returns the partition key (<year>-<month>, UTC) of every match
+        '''
+        return np.datetime_as_string(self.columns["start_time"].astype("datetime64[s]"), unit="M")
+
+    def get_hash(self):
+        '''
+        SHA-1 of all columns' data, used to detect partitions that didn't change
+        '''
+        sha1 = hashlib.sha1()
+        for name, dtype in MATCH_COLUMNS.items():
+            sha1.update(np.ascontiguousarray(self.columns[name], dtype=dtype).tobytes())
+        return sha1.hexdigest()
+
+    def get_signature(self):
+        '''
+        (number of matches, latest match_id), cheap way to detect new matches
+        '''
+        match_id = self.columns["match_id"]
+        return len(match_id), int(match_id.max()) if len(match_id) else 0
+
+    @staticmethod
+    def load_manifest(columns_dir):
+        '''
+        Returns the partitions' manifest of columns_dir (empty dict if not partitioned)
+        '''
+        manifest_path = os.path.join(columns_dir, PARTITIONS_FILE)
+        if not os.path.isfile(manifest_path):
+            return {}
+        with open(manifest_path) as content:
+            return json.load(content)
+
+    @classmethod
+    def load(cls, columns_dir, mmap=True, start_time=None, end_time=None):
+        '''
+        Open the columns saved in columns_dir. With mmap=True the arrays are memory-mapped
+        read-only, so only the pages that are actually used get read from disk
+        If start_time/end_time are given, only the monthly partitions overlapping that
+        range are opened
+        '''
+        manifest = cls.load_manifest(columns_dir)
+        if not manifest:
+            # Not partitioned (columns saved before partitioning was introduced)
+            return cls.load_partition(columns_dir, mmap).filter_time(start_time, end_time)
+        parts = []
+        for month in sorted(manifest, reverse=True):
+            if start_time is not None and manifest[month]["last"] < start_time:
+                continue
+            if end_time is not None and manifest[month]["first"] >= end_time:
+                continue
+            parts.append(cls.load_partition(os.path.join(columns_dir, month), mmap))
+        logger.debug("%s of %s partitions opened from %s", len(parts), len(manifest), columns_dir)
+        if not parts:
+            return cls()
+        return cls.concatenate(parts).filter_time(start_time, end_time)
+
+    @classmethod
+    def load_partition(cls, partition_dir, mmap=True):
+        '''
+        Open the <column>.npy files of a single partition
+        '''
+        logger.debug("Loading match columns from %s (mmap=%s)", partition_dir, mmap)
+        columns = {}
+        for name in MATCH_COLUMNS:
+            file_path = os.path.join(partition_dir, name+".npy")
+            if not os.path.isfile(file_path):
+                logger.warning("Column %s not found in %s", name, partition_dir)
+                continue
+            columns[name] = np.load(file_path, mmap_mode="r" if mmap else None)
+        return cls(columns)
+
+    def save(self, columns_dir):
+        '''
+        Save matches partitioned by month: <columns_dir>/<year>-<month>/<column>.npy
+        plus a manifest (partitions.json) with rows, time range and hash of every partition
+        Partitions whose content didn't change are not rewritten, so an update usually only
+        rewrites the current month
+        '''
+        if not os.path.isdir(columns_dir):
+            os.mkdir(columns_dir)
+        old_manifest = self.load_manifest(columns_dir)
+        manifest = {}
+        months = self.get_months()
+        written = 0
+        for month in np.unique(months).tolist():
+            partition = self[months == month]
+            partition_hash = partition.get_hash()
+            partition_dir = os.path.join(columns_dir, month)
+            manifest[month] = {
+                "rows": len(partition),
+                "first": int(partition.start_time.min()),
+                "last": int(partition.start_time.max()),
+                "hash": partition_hash,
+            }
+            if old_manifest.get(month, {}).get("hash") == partition_hash and \
+                    os.path.isdir(partition_dir):
+                continue
+            partition.save_partition(partition_dir)
+            written += 1
+        atomic_write(os.path.join(columns_dir, PARTITIONS_FILE),
+                     json.dumps(manifest, indent=4, sort_keys=True).encode('utf-8'))
+
+        # Remove partitions that no longer exist and columns from the non-partitioned layout
+        for entry in os.listdir(columns_dir):
+            entry_path = os.path.join(columns_dir, entry)
+            if os.path.isdir(entry_path) and entry not in manifest:
+                shutil.rmtree(entry_path)
+            elif entry.endswith(".npy"):
+                os.remove(entry_path)
+        logger.info("%s match columns saved to %s (%s of %s partitions written)",
+                    len(self), columns_dir, written, len(manifest))
+
+    def save_partition(self, partition_dir):
+        '''
+        Save every column as <partition_dir>/<column>.npy
+        Columns are written to a temporary file and then replaced, so arrays that are
+        currently memory-mapped from partition_dir remain valid
+        '''
+        if not os.path.isdir(partition_dir):
+            os.mkdir(partition_dir)
+        for name, dtype in MATCH_COLUMNS.items():
+            file_path = os.path.join(partition_dir, name+".npy")
+            with open(file_path+".tmp", 'wb') as file:
+                np.save(file, np.asarray(self.columns[name], dtype=dtype))
+            os.replace(file_path+".tmp", file_path)
+
+    def to_matches(self):
+        '''
+        Convert columns back to a list of dicts (only the columnar fields are available)
+        '''
+        names = list(MATCH_COLUMNS)
+        values = [self.columns[name].tolist() for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+class MatchColumnsBuilder:
+    '''
+    MatchColumnsBuilder class to append matches one by one into typed buffers
+    (array.array, a few bytes per field) and build a MatchColumns object at the end
+    '''
+    def __init__(self):
+        self.buffers = {name: array(typecode) for name, typecode in BUFFER_TYPECODES.items()}
+
+    def __len__(self) -> int:
+        return len(self.buffers["match_id"])
+
+    def append(self, match):
+        '''
+        Append one match (dict from OpenDota), missing/null values are stored as 0
+        '''
+        for name, buffer in self.buffers.items():
+            buffer.append(match.get(name) or 0)
+
+    def build(self):
+        columns = {}
+        for name, dtype in MATCH_COLUMNS.items():
+            columns[name] = np.frombuffer(self.buffers[name], dtype=BUFFER_TYPECODES[name]) \
+                              .astype(dtype)
+        return MatchColumns(columns)
+
+def iter_json_array(chunks):
+    '''
+    Incrementally parse a JSON array of objects given as an iterable of bytes chunks
+    (e.g. response.iter_content()), yielding one object at a time
+    '''
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, pos = "", 0
+    started = False
+    for chunk in chunks:
+        buffer = buffer[pos:] + utf8_decoder.decode(chunk)
+        pos = 0
+        while True:
+            # Skip whitespace and separators between objects
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Object not complete yet, wait for the next chunk
+                break
+            pos = end
+            yield obj
+    # The closing "]" was never found
+    raise ValueError("Incomplete JSON array")
+
+def iter_json_file(file_path, chunk_size=64*1024):
+    '''
+    Incrementally parse a JSON array of objects saved in file_path (plain or gzipped)
+    '''
+    opener = gzip.open if file_path.endswith(GZIP_SUFFIX) else open
+    with opener(file_path, 'rb') as content:
+        yield from iter_json_array(iter(lambda: content.read(chunk_size), b""))
+
+def write_json_line(file, obj):
+    '''
+    Append obj to a binary file as one line of compact JSON
+    '''
+    file.write(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')+b"\n")
+
+def read_json_lines(file):
+    '''
+    Returns a function iterating over the objects written to file by write_json_line,
+    from the start of the file every time it is called
+    '''
+    def records():
+        pos = 0
+        while True:
+            # Seek every time, so iterations of the same file can be interleaved
+            file.seek(pos)
+            line = file.readline()
+            if not line:
+                return
+            pos = file.tell()
+            yield json.loads(line)
+    return records
+
+def columns_from_json_stream(chunks, records=None):
+    '''
+    Build a MatchColumns object straight from a streamed JSON list of matches,
+    without ever materializing the whole list of dicts
+    If records (binary file) is given, every match is also written to it with all its
+    fields, as a JSON line (see write_json_line/read_json_lines)
+    '''
+    builder = MatchColumnsBuilder()
+    for match in iter_json_array(chunks):
+        builder.append(match)
+        if records is not None:
+            write_json_line(records, match)
+    return builder.build()
+
+def local_datetimes(timestamps):
+    '''
+    Convert unix timestamps to naive local datetime64[ns] (same as datetime.fromtimestamp)
+    '''
+    datetimes = pd.to_datetime(np.asarray(timestamps, dtype=np.int64), unit="s", utc=True)
+    # gettz() is the local timezone (TZ or /etc/localtime) with all its past offset changes
+    datetimes = datetimes.tz_convert(gettz()).tz_localize(None)
+    return datetimes.to_numpy().astype("datetime64[ns]")
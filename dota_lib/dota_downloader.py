@@ -0,0 +1,100 @@
+'''
+Bulk download of DotaMatch data, e.g. every match a team played together.
+Matches are queried concurrently through the shared OpenDota client (so still under its
+rate limit), and matches already stored are skipped
+'''
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dota_lib.dota_client import get_client
+from dota_lib.dota_io import find_json
+from dota_lib.dota_matches import DotaMatch
+from dota_lib.dota_sqlite import DotaSQLite
+
+logger = logging.getLogger(__name__)
+
+# Number of matches downloaded concurrently
+DOWNLOAD_WORKERS = 4
+
+class DotaMatchDownloader:
+    '''
+    DotaMatchDownloader class to download and save many DotaMatch at once
+    - output_path : dota_db matches folder, or a DotaSQLite store
+    - max_workers : number of matches downloaded concurrently
+    '''
+    def __init__(self, output_path, max_workers=DOWNLOAD_WORKERS):
+        self.output_path = output_path
+        self.max_workers = max_workers
+
+    def __repr__(self) -> str:
+        return "DotaMatchDownloader('{}', max_workers={})".format(self.output_path,
+                                                                 self.max_workers)
+
+    @staticmethod
+    def get_team_match_ids(dota_team):
+        '''
+        match_ids of the matches all players of a DotaTeam played together
+        '''
+        return [match["match_id"] for match in dota_team.get_team_simplified_matches()]
+
+    def is_stored(self, match_id):
+        if isinstance(self.output_path, DotaSQLite):
+            return self.output_path.has_match(match_id)
+        match_dir = os.path.join(self.output_path, str(match_id))
+        return any(find_json(os.path.join(match_dir, file_name))
+                   for file_name in ("match_core.json", "match_info.json"))
+
+    def download_match(self, match_id):
+        '''
+        Query and save a single match, returns True if successful
+        '''
+        dota_match = DotaMatch(match_id)
+        if not dota_match.get_match_info():
+            return False
+        dota_match.save_data(self.output_path)
+        return True
+
+    def download(self, match_ids, progress=None):
+        '''
+        Download and save every match in match_ids that is not stored yet
+        progress, if given, is called as progress(match_id, success) after each match
+        Returns a dict with "requested", "skipped", "downloaded", "failed" (list of match_ids),
+        "elapsed" (seconds), "matches_per_second" and "bytes" (received from OpenDota)
+        '''
+        match_ids = list(dict.fromkeys(str(match_id) for match_id in match_ids))
+        missing = [match_id for match_id in match_ids if not self.is_stored(match_id)]
+        logger.info("%s matches requested, %s already stored", len(match_ids),
+                    len(match_ids) - len(missing))
+        bytes_before = get_client().stats().get("matches/<id>", {}).get("bytes", 0)
+        started = time.perf_counter()
+        downloaded, failed = 0, []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.download_match, match_id): match_id
+                       for match_id in missing}
+            for future in as_completed(futures):
+                match_id = futures[future]
+                try:
+                    success = future.result()
+                except Exception:
+                    logger.exception("Error downloading match %s", match_id)
+                    success = False
+                if success:
+                    downloaded += 1
+                else:
+                    failed.append(match_id)
+                if progress:
+                    progress(match_id, success)
+        elapsed = time.perf_counter() - started
+        report = {
+            "requested": len(match_ids),
+            "skipped": len(match_ids) - len(missing),
+            "downloaded": downloaded,
+            "failed": failed,
+            "elapsed": elapsed,
+            "matches_per_second": downloaded / elapsed if elapsed else 0.0,
+            "bytes": get_client().stats().get("matches/<id>", {}).get("bytes", 0) - bytes_before,
+        }
+        logger.info("%s matches downloaded in %.1fs (%.2f matches/s), %s failed",
+                    downloaded, elapsed, report["matches_per_second"], len(failed))
+        return report
@@ -0,0 +1,101 @@
+'''
+Hero registry built once from OpenDota's heroes list (dota_db/heroes/heroes.json, see
+dota_db/heroes/get_heroes.py), shared by every hero ID <-> hero name translation
+'''
+import json
+import logging
+import os
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HEROES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "dota_db", "heroes", "heroes.json")
+
+# Prefix of the heroes' internal names, e.g. "npc_dota_hero_antimage"
+HERO_NAME_PREFIX = "npc_dota_hero_"
+
+def normalize_hero_name(hero):
+    '''
+    Normalized form of a hero name used for lookups, e.g. "Anti-Mage" -> "anti_mage"
+    '''
+    return str(hero).strip().replace(" ", "_").replace("-", "_").lower()
+
+class DotaHeroes:
+    '''
+    DotaHeroes class with the lookup tables of every hero
+    - names : NumPy array indexed by hero ID -> hero Name (str(hero ID) for unused IDs)
+    - ids : dict of normalized hero Name/alias -> hero ID. Aliases are the internal name
+      without its prefix (e.g. "antimage") and the hero ID as a string
+    '''
+    def __init__(self, heroes):
+        max_id = max((hero["id"] for hero in heroes), default=0)
+        self.names = np.array([str(hero_id) for hero_id in range(max_id+1)], dtype=object)
+        self.ids = {}
+        for hero in heroes:
+            self.names[hero["id"]] = hero["localized_name"]
+            aliases = [hero["localized_name"], str(hero["id"])]
+            if hero.get("name", "").startswith(HERO_NAME_PREFIX):
+                aliases.append(hero["name"][len(HERO_NAME_PREFIX):])
+            for alias in aliases:
+                self.ids.setdefault(normalize_hero_name(alias), hero["id"])
+        self.count = len(heroes)
+
+    def __repr__(self) -> str:
+        return "DotaHeroes({} heroes)".format(self.count)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def load(cls, heroes_file=HEROES_FILE):
+        '''
+        Build the registry from a heroes.json file (OpenDota's /heroes response)
+        '''
+        with open(heroes_file, encoding='utf-8') as content:
+            heroes = json.load(content)
+        logger.info("%s heroes loaded from %s", len(heroes), heroes_file)
+        return cls(heroes)
+
+    def get_name(self, hero_id):
+        '''
+        Hero Name of a hero ID (str(hero_id) if unknown)
+        '''
+        hero_id = int(hero_id)
+        if 0 <= hero_id < len(self.names):
+            return self.names[hero_id]
+        return str(hero_id)
+
+    def get_names(self, hero_ids):
+        '''
+        Hero Names of an array of hero IDs (object array, str(hero_id) for unknown IDs)
+        '''
+        hero_ids = np.asarray(hero_ids, dtype=np.int64)
+        known = (hero_ids >= 0) & (hero_ids < len(self.names))
+        names = hero_ids.astype(str).astype(object)
+        names[known] = self.names[hero_ids[known]]
+        return names
+
+    def get_id(self, hero):
+        '''
+        Hero ID of a hero Name, alias or ID (int or str), None if unknown
+        IDs not in the registry yet (e.g. a new hero) are returned as they are
+        '''
+        hero_id = self.ids.get(normalize_hero_name(hero))
+        if hero_id is None and str(hero).strip().isdigit():
+            return int(hero)
+        return hero_id
+
+_heroes = None
+_heroes_lock = threading.Lock()
+
+def get_heroes():
+    '''
+    Returns the process-wide DotaHeroes registry (loaded from HEROES_FILE on first use)
+    '''
+    global _heroes
+    with _heroes_lock:
+        if _heroes is None:
+            _heroes = DotaHeroes.load()
+        return _heroes
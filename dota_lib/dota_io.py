@@ -0,0 +1,127 @@
+'''
+File helpers shared by dota_lib objects to save/load their JSON data.
+Writes are atomic (temporary file + os.replace), so a crash or a concurrent reader never
+sees a half-written file, and payloads can optionally be written compact and/or gzipped
+'''
+import gzip
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+GZIP_SUFFIX = ".gz"
+
+def atomic_write(file_path, data):
+    '''
+    Write bytes to file_path through a temporary file in the same folder + os.replace
+    '''
+    tmp_path = file_path+".tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, file_path)
+
+def content_hash(payload):
+    '''
+    SHA-1 of the payload's compact JSON encoding (independent of how the file is written)
+    '''
+    encoded = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+def find_json(file_path):
+    '''
+    Returns the existing variant of file_path (plain .json or .json.gz), or None
+    '''
+    for path in (file_path, file_path+GZIP_SUFFIX):
+        if os.path.isfile(path):
+            return path
+    return None
+
+def dump_json(payload, file_path, compact=False, compress=False, known_hash=None):
+    '''
+    Save payload as JSON to file_path (file_path+".gz" if compress is True)
+    - compact : no indentation/whitespace
+    - known_hash : content hash of the data already on disk, if it matches (and the file
+      still exists) nothing is written
+    Returns the payload's content hash
+    '''
+    payload_hash = content_hash(payload)
+    target_path = file_path+GZIP_SUFFIX if compress else file_path
+    if known_hash == payload_hash and os.path.isfile(target_path):
+        logger.debug("%s unchanged (hash %s), skip writing", target_path, payload_hash)
+        return payload_hash
+
+    if compact:
+        encoded = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    else:
+        encoded = json.dumps(payload, ensure_ascii=False, indent=4)
+    data = encoded.encode('utf-8')
+    if compress:
+        data = gzip.compress(data, compresslevel=6)
+    atomic_write(target_path, data)
+
+    # Remove the other encoding so that only one variant of the file exists
+    other_path = file_path if compress else file_path+GZIP_SUFFIX
+    if os.path.isfile(other_path):
+        os.remove(other_path)
+    logger.debug("%s written (%s bytes)", target_path, len(data))
+    return payload_hash
+
+def dump_json_records(records, file_path, compress=False):
+    '''
+    Save an iterable of records as a compact JSON array to file_path (file_path+".gz" if
+    compress is True), one record at a time, so the whole list is never in memory
+    The file is written to a temporary file first and then replaced, as in atomic_write
+    Returns the same content hash as dump_json(list(records)) and the number of records
+    '''
+    target_path = file_path+GZIP_SUFFIX if compress else file_path
+    tmp_path = target_path+".tmp"
+    sha1 = hashlib.sha1()
+    n_records = 0
+    with open(tmp_path, 'wb') as raw_file:
+        file = gzip.GzipFile(fileobj=raw_file, mode='wb', compresslevel=6) if compress \
+            else raw_file
+        for record in records:
+            data = ("," if n_records else "[") + \
+                json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+            data = data.encode('utf-8')
+            sha1.update(data)
+            file.write(data)
+            n_records += 1
+        data = b"]" if n_records else b"[]"
+        sha1.update(data)
+        file.write(data)
+        if compress:
+            file.close()
+        raw_file.flush()
+        os.fsync(raw_file.fileno())
+    os.replace(tmp_path, target_path)
+
+    # Remove the other encoding so that only one variant of the file exists
+    other_path = file_path if compress else file_path+GZIP_SUFFIX
+    if os.path.isfile(other_path):
+        os.remove(other_path)
+    logger.debug("%s written (%s records)", target_path, n_records)
+    return sha1.hexdigest(), n_records
+
+def load_json(file_path):
+    '''
+    Load a JSON file written either by dump_json (plain or gzipped) or by json.dump
+    '''
+    if file_path.endswith(GZIP_SUFFIX):
+        with gzip.open(file_path, 'rt', encoding='utf-8') as content:
+            return json.load(content)
+    with open(file_path, encoding='utf-8') as content:
+        return json.load(content)
+
+def json_name(file_path):
+    '''
+    Base name of file_path without the ".gz" suffix, e.g. "player_info.json"
+    '''
+    name = os.path.basename(file_path)
+    if name.endswith(GZIP_SUFFIX):
+        name = name[:-len(GZIP_SUFFIX)]
+    return name
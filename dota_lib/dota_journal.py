@@ -0,0 +1,216 @@
+'''
+Ingestion journal, to resume interrupted downloads from OpenDota.
+- every endpoint a DotaPlayer got successfully is checkpointed with its payload under
+  <journal_dir>/players/<account_id>/, so a failed/interrupted get_all can be retried without
+  querying again what it already got (as long as it's fresher than freshness seconds)
+- update_all runs keep the players already updated in <journal_dir>/update_all.json, so an
+  interrupted run restarts where it stopped
+'''
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from itertools import islice
+from dota_lib.dota_columns import MatchColumns, iter_json_file, read_json_lines, write_json_line
+from dota_lib.dota_io import atomic_write, dump_json, dump_json_records, find_json, load_json
+
+logger = logging.getLogger(__name__)
+
+# Seconds a checkpointed payload (or an interrupted update_all run) can be reused
+JOURNAL_FRESHNESS = 3600
+
+JOURNAL_FILE = "journal.json"
+RUN_FILE = "update_all.json"
+
+# DotaPlayer attribute of each endpoint checkpointed as JSON (matches are handled apart)
+JOURNAL_PAYLOADS = {
+    "player_info": "player_info",
+    "wardmap": "player_wardmap",
+    "wordcloud": "player_wordcloud",
+}
+
+# data_info keys set by get_matches, restored along with the matches
+MATCHES_DATA_INFO = ("Last Full Sync", "Match Sync")
+
+class DotaIngestJournal:
+    '''
+    DotaIngestJournal class to checkpoint and resume player ingestion
+    - journal_dir : folder of the journal (created if needed)
+    - freshness : seconds a checkpoint can be reused
+    '''
+    def __init__(self, journal_dir, freshness=JOURNAL_FRESHNESS):
+        self.journal_dir = journal_dir
+        self.freshness = freshness
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "DotaIngestJournal('{}', freshness={})".format(self.journal_dir, self.freshness)
+
+    ################ ENDPOINT CHECKPOINTS
+    def get_player_dir(self, account_id):
+        return os.path.join(self.journal_dir, "players", str(account_id))
+
+    def load_entries(self, account_id):
+        journal_file = os.path.join(self.get_player_dir(account_id), JOURNAL_FILE)
+        if not os.path.isfile(journal_file):
+            return {}
+        with open(journal_file) as content:
+            return json.load(content)
+
+    def save(self, dota_player, endpoint):
+        '''
+        Checkpoint an endpoint dota_player got successfully, along with its payload
+        '''
+        player_dir = self.get_player_dir(dota_player.account_id)
+        with self._lock:
+            os.makedirs(player_dir, exist_ok=True)
+            entry = {"completed_at": time.time(), "data_info": {}}
+            if endpoint == "matches":
+                self.save_matches(dota_player, player_dir, entry)
+            else:
+                dump_json(getattr(dota_player, JOURNAL_PAYLOADS[endpoint]),
+                          os.path.join(player_dir, endpoint+".json"), compact=True, compress=True)
+            entries = self.load_entries(dota_player.account_id)
+            entries[endpoint] = entry
+            atomic_write(os.path.join(player_dir, JOURNAL_FILE), json.dumps(entries).encode('utf-8'))
+        logger.debug("Journal: %s checkpointed for ID %s", endpoint, dota_player.account_id)
+
+    def restore(self, dota_player, endpoint):
+        '''
+        Load a fresh checkpointed endpoint into dota_player, returns True if it was restored
+        '''
+        player_dir = self.get_player_dir(dota_player.account_id)
+        with self._lock:
+            entry = self.load_entries(dota_player.account_id).get(endpoint)
+            if not entry or time.time() - entry["completed_at"] > self.freshness:
+                return False
+            if endpoint == "matches":
+                if not self.restore_matches(dota_player, player_dir, entry):
+                    return False
+            else:
+                setattr(dota_player, JOURNAL_PAYLOADS[endpoint],
+                        load_json(find_json(os.path.join(player_dir, endpoint+".json"))))
+                if endpoint == "player_info" and not dota_player.player_name:
+                    dota_player.player_name = dota_player.player_info["profile"]["personaname"]
+            dota_player.data_info.update(entry["data_info"])
+        logger.info("Journal: %s of ID %s reused from %s", endpoint, dota_player.account_id,
+                    time.strftime("%H:%M:%S", time.localtime(entry["completed_at"])))
+        return True
+
+    @staticmethod
+    def save_matches(dota_player, player_dir, entry):
+        '''
+        Checkpoint the matches dota_player got (entry["format"]):
+        - "new" : incremental sync, only the new matches (none if nothing new was played),
+          restored on top of the same stored matches (entry["base"], their signature)
+        - "columns" : full sync streamed into columns, along with the full records
+        - "json" : full sync as OpenDota's list of dicts
+        '''
+        columns = dota_player.match_columns
+        match_sync = dota_player.data_info.get("Match Sync", {})
+        if match_sync.get("Mode") == "incremental":
+            # New matches are ahead of the stored ones
+            new_matches = match_sync.get("New Matches", 0)
+            entry["format"] = "new"
+            entry["matches"] = new_matches
+            entry["base"] = columns[new_matches:].get_signature()
+            if new_matches:
+                columns[:new_matches].save_partition(os.path.join(player_dir, "matches"))
+                dump_json_records(islice(dota_player.iter_player_matches(), new_matches),
+                                  os.path.join(player_dir, "matches_records.json"),
+                                  compress=True)
+        elif dota_player.matches_as_columns:
+            entry["format"] = "columns"
+            columns.save_partition(os.path.join(player_dir, "matches"))
+            # Along with their full records, so no field is lost when resuming
+            dump_json_records(dota_player.iter_player_matches(),
+                              os.path.join(player_dir, "matches_records.json"), compress=True)
+        else:
+            entry["format"] = "json"
+            dump_json_records(dota_player.iter_player_matches(),
+                              os.path.join(player_dir, "matches.json"), compress=True)
+        entry["data_info"] = {key: dota_player.data_info[key]
+                              for key in MATCHES_DATA_INFO if key in dota_player.data_info}
+
+    @staticmethod
+    def restore_matches(dota_player, player_dir, entry):
+        '''
+        Load checkpointed matches into dota_player (see save_matches), returns False if
+        they can't be used (new matches checkpointed on top of other stored matches)
+        '''
+        records_file = find_json(os.path.join(player_dir, "matches_records.json"))
+        if entry["format"] == "new":
+            if list(dota_player.get_matches_signature()) != entry["base"]:
+                logger.info("Journal: stored matches of ID %s changed, new matches not reused",
+                            dota_player.account_id)
+                return False
+            if entry["matches"]:
+                # Spool the full records: new ones + stored ones (same as get_new_matches)
+                spool = tempfile.TemporaryFile()
+                for match in iter_json_file(records_file):
+                    write_json_line(spool, match)
+                for match in dota_player.iter_player_matches():
+                    write_json_line(spool, match)
+                dota_player.match_columns = MatchColumns.concatenate([MatchColumns.load_partition(
+                    os.path.join(player_dir, "matches"), mmap=False), dota_player.match_columns])
+                dota_player.set_matches_source(read_json_lines(spool))
+        elif entry["format"] == "columns":
+            dota_player.match_columns = MatchColumns.load_partition(
+                os.path.join(player_dir, "matches"), mmap=False)
+            if records_file:
+                dota_player.set_matches_source(lambda: iter_json_file(records_file))
+        else:
+            dota_player.player_matches = load_json(
+                find_json(os.path.join(player_dir, "matches.json")))
+        return True
+
+    def complete_player(self, account_id):
+        '''
+        Drop the checkpoints of a player whose data was saved
+        '''
+        with self._lock:
+            shutil.rmtree(self.get_player_dir(account_id), ignore_errors=True)
+
+    ################ UPDATE ALL RUNS
+    def get_run_file(self):
+        return os.path.join(self.journal_dir, RUN_FILE)
+
+    def start_run(self):
+        '''
+        Returns the players already updated by an interrupted (and still fresh) run,
+        or starts a new run
+        '''
+        with self._lock:
+            run_file = self.get_run_file()
+            if os.path.isfile(run_file):
+                with open(run_file) as content:
+                    run = json.load(content)
+                if time.time() - run["updated_at"] <= self.freshness:
+                    logger.info("Journal: resuming update_all, %s players already updated",
+                                len(run["done"]))
+                    return set(run["done"])
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self.save_run({"started_at": time.time(), "updated_at": time.time(), "done": []})
+            return set()
+
+    def player_done(self, player):
+        with self._lock:
+            with open(self.get_run_file()) as content:
+                run = json.load(content)
+            run["done"].append(player)
+            run["updated_at"] = time.time()
+            self.save_run(run)
+
+    def finish_run(self):
+        '''
+        Forget the run (only called once every player of the run was updated)
+        '''
+        with self._lock:
+            if os.path.isfile(self.get_run_file()):
+                os.remove(self.get_run_file())
+
+    def save_run(self, run):
+        atomic_write(self.get_run_file(), json.dumps(run).encode('utf-8'))
@@ -0,0 +1,175 @@
+'''
+Inverted index of the matches stored in a dota_db players folder: match_id -> registered
+players that played it (with their side and hero).
+A single match_index.npz keeps one row per (match, registered player) sorted by match_id, so
+finding who else played a set of matches is a binary search per match instead of loading
+and intersecting every player's matches
+'''
+import io
+import logging
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from dota_lib.dota_io import atomic_write
+
+logger = logging.getLogger(__name__)
+
+MATCH_INDEX_FILE = "match_index.npz"
+
+# Column name -> dtype of the index rows
+MATCH_INDEX_COLUMNS = {
+    "match_id": np.int64,
+    "player": np.int32,
+    "player_slot": np.uint8,
+    "hero_id": np.int16,
+}
+
+# Serializes read-modify-write cycles of match index files within the process
+_match_index_lock = threading.Lock()
+
+class DotaMatchIndex:
+    '''
+    DotaMatchIndex class to read and update <players_path>/match_index.npz
+    - "players" : player keys (folder names, <player_name>_<account_id>)
+    - one row per (match, player): "match_id", "player" (position in "players"),
+      "player_slot" and "hero_id", sorted by match_id
+    The index is kept in memory once loaded, and reloaded only when the file changes
+    '''
+    def __init__(self, players_path):
+        self.players_path = players_path
+        self.index_path = os.path.join(players_path, MATCH_INDEX_FILE)
+        self._index = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return "DotaMatchIndex('{}')".format(self.index_path)
+
+    def exists(self):
+        return os.path.isfile(self.index_path)
+
+    def get_signature(self):
+        stat = os.stat(self.index_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self):
+        '''
+        Returns the index's dict of arrays (empty index if there is no file yet)
+        '''
+        if not self.exists():
+            return self.get_empty()
+        with self._lock:
+            signature = self.get_signature()
+            if self._signature != signature:
+                with np.load(self.index_path) as content:
+                    self._index = {name: content[name] for name in content.files}
+                self._signature = signature
+                logger.debug("Match index loaded from %s (%s rows)", self.index_path,
+                             len(self._index["match_id"]))
+            return self._index
+
+    @staticmethod
+    def get_empty():
+        index = {name: np.array([], dtype=dtype) for name, dtype in MATCH_INDEX_COLUMNS.items()}
+        index["players"] = np.array([], dtype=str)
+        return index
+
+    def save(self, index):
+        '''
+        Write the whole index atomically (temporary file + os.replace)
+        '''
+        content = io.BytesIO()
+        np.savez(content, **index)
+        atomic_write(self.index_path, content.getvalue())
+
+    @staticmethod
+    def get_rows(player_idx, dota_player):
+        '''
+        Index rows of all matches of a DotaPlayer object
+        '''
+        columns = dota_player.match_columns
+        return {
+            "match_id": np.asarray(columns.match_id, dtype=np.int64),
+            "player": np.full(len(columns), player_idx, dtype=np.int32),
+            "player_slot": np.asarray(columns.player_slot, dtype=np.uint8),
+            "hero_id": np.asarray(columns.hero_id, dtype=np.int16),
+        }
+
+    @staticmethod
+    def sort_rows(rows):
+        '''
+        Sort rows by match_id, then player
+        '''
+        order = np.lexsort((rows["player"], rows["match_id"]))
+        return {name: rows[name][order] for name in MATCH_INDEX_COLUMNS}
+
+    def update_player(self, player, dota_player):
+        '''
+        Replace the rows of player (folder name) with the matches of dota_player
+        Returns False if there is no index yet (it has to be built from every player, see
+        rebuild) or if the player's rows didn't change, in which case nothing is written
+        '''
+        with _match_index_lock:
+            if not self.exists():
+                logger.info("No match index in %s, %s not added", self.players_path, player)
+                return False
+            index = self.load()
+            players = index["players"].tolist()
+            player_idx = players.index(player) if player in players else len(players)
+            new_rows = self.sort_rows(self.get_rows(player_idx, dota_player))
+            keep = index["player"] != player_idx
+            if player_idx < len(players):
+                # Rows are sorted by match_id, so are the player's current rows
+                if all(np.array_equal(index[name][~keep], new_rows[name])
+                       for name in MATCH_INDEX_COLUMNS):
+                    logger.debug("Match index unchanged for %s", player)
+                    return False
+            else:
+                players.append(player)
+            rows = {name: index[name][keep] for name in MATCH_INDEX_COLUMNS}
+            rows = self.sort_rows({name: np.concatenate([rows[name], new_rows[name]])
+                                   for name in MATCH_INDEX_COLUMNS})
+            rows["players"] = np.array(players, dtype=str)
+            self.save(rows)
+        logger.info("Match index updated for %s (%s matches)", player, len(new_rows["match_id"]))
+        return True
+
+    def rebuild(self, dota_players):
+        '''
+        Rewrite the index from scratch given a dict of player (folder name) -> DotaPlayer
+        '''
+        started = time.time()
+        players = sorted(dota_players)
+        with _match_index_lock:
+            parts = [self.get_rows(player_idx, dota_players[player])
+                     for player_idx, player in enumerate(players)]
+            rows = self.get_empty()
+            if parts:
+                rows = self.sort_rows({name: np.concatenate([part[name] for part in parts])
+                                       for name in MATCH_INDEX_COLUMNS})
+            rows["players"] = np.array(players, dtype=str)
+            self.save(rows)
+        logger.info("Match index rebuilt with %s players (%s rows) in %.2fs", len(players),
+                    len(rows["match_id"]), time.time()-started)
+
+    def get_match_participants(self, match_ids):
+        '''
+        Registered players of the given matches
+        Returns a Pandas DataFrame with columns "match_id", "player" (folder name),
+        "player_slot" and "hero_id", one row per (match, player)
+        '''
+        index = self.load()
+        match_ids = np.unique(np.asarray(match_ids, dtype=np.int64))
+        # Rows of each match are contiguous: [first, last) found by binary search
+        first = np.searchsorted(index["match_id"], match_ids, side="left")
+        last = np.searchsorted(index["match_id"], match_ids, side="right")
+        counts = last - first
+        rows = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return pd.DataFrame({
+            "match_id": index["match_id"][rows],
+            "player": index["players"][index["player"][rows]].astype(object),
+            "player_slot": index["player_slot"][rows],
+            "hero_id": index["hero_id"][rows],
+        }, columns=list(MATCH_INDEX_COLUMNS))
@@ -5,14 +5,24 @@ Refer to OpenDota API official documentation: https://docs.opendota.com/
 import json
 import logging
 import os
-import requests
 from datetime import datetime as dtm
+from dota_lib.dota_client import get_client
+from dota_lib.dota_io import dump_json, find_json, json_name, load_json
+from dota_lib.dota_sqlite import DotaSQLite
 
 logger = logging.getLogger(__name__)
 
+# Match fields that are always kept in the "core" record, even if they are lists/dicts
+CORE_MATCH_FIELDS = ("players", "picks_bans")
+
 class DotaMatch:
     '''
     DotaMatch class to gather and analyze data from a specific match
+    Stored matches are split in two files:
+    - match_core.json : scalar fields (scores, duration, ...), picks_bans and the scalar
+      fields of each player (hero, k/d/a, gpm/xpm, items, ...)
+    - match_heavy.json.gz : every list/dict field (chat, teamfights, cosmetics, objectives,
+      players' *_log, *_t, damage_*, ...), only loaded on first access
     '''
     def __init__(self, match_id):
         self.match_id = str(match_id)
@@ -20,9 +30,89 @@ class DotaMatch:
 
         logger.info("DotaMatch created, id=%s", match_id)
 
+    def __getattr__(self, name):
+        '''
+        Match fields are reachable as attributes, e.g. dota_match.duration or dota_match.chat
+        Heavy fields are loaded on first access (dota_match.players only has the core
+        fields of each player, use dota_match.match_info["players"] for all of them)
+        '''
+        if name.startswith("_"):
+            raise AttributeError(name)
+        core = self.core
+        if name in core:
+            return core[name]
+        if name in core.get("_heavy", ()):
+            return self.match_info[name]
+        raise AttributeError(name)
+
+    @property
+    def match_info(self):
+        '''
+        Complete match info (OpenDota's /matches/<match_id> response)
+        '''
+        if self._match_info is None:
+            self._match_info = self.merge(self._core, load_json(self._heavy_file))
+            logger.info("%s loaded successfully!", self._heavy_file)
+        return self._match_info
+
+    @match_info.setter
+    def match_info(self, match_info):
+        self._match_info = match_info
+        self._core = None
+        self._heavy_file = None
+
+    @property
+    def core(self):
+        '''
+        Core record of the match (without heavy fields), doesn't require loading the heavy file
+        '''
+        if self._core is None:
+            self._core = self.split(self.match_info)[0] if self.match_info else {}
+        return self._core
+
+    @staticmethod
+    def split(match_info):
+        '''
+        Split match_info into (core, heavy) dicts
+        '''
+        core, heavy = {}, {"match": {}, "players": []}
+        for field, value in match_info.items():
+            if field in CORE_MATCH_FIELDS or not isinstance(value, (list, dict)):
+                core[field] = value
+            else:
+                heavy["match"][field] = value
+        core["_heavy"] = list(heavy["match"])
+        if isinstance(match_info.get("players"), list):
+            core["players"] = []
+            for player in match_info["players"]:
+                core["players"].append({field: value for field, value in player.items()
+                                        if not isinstance(value, (list, dict))})
+                heavy["players"].append({field: value for field, value in player.items()
+                                         if isinstance(value, (list, dict))})
+        return core, heavy
+
+    @staticmethod
+    def merge(core, heavy):
+        '''
+        Rebuild match_info from its (core, heavy) dicts
+        '''
+        match_info = {field: value for field, value in core.items() if field != "_heavy"}
+        match_info.update(heavy["match"])
+        if heavy["players"]:
+            match_info["players"] = [dict(player, **heavy_player) for player, heavy_player
+                                     in zip(core["players"], heavy["players"])]
+        return match_info
+
     def save_data(self, output_path):
         '''
+        Save match to <output_path>/<match_id>/ as match_core.json + match_heavy.json.gz
+        output_path can also be a DotaSQLite store
         '''
+        if isinstance(output_path, DotaSQLite):
+            if self.match_info:
+                output_path.save_match(self)
+            return
+
         # Create a folder for the specific match
         match_dir = os.path.join(output_path, self.match_id)
         if not os.path.isdir(match_dir):
@@ -30,20 +120,36 @@ class DotaMatch:
 
         # Save match_info if available
         if self.match_info:
-            file_path = os.path.join(match_dir, "match_info.json")
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(self.match_info, file, ensure_ascii=False, indent=4)
+            core, heavy = self.split(self.match_info)
+            dump_json(core, os.path.join(match_dir, "match_core.json"), compact=True)
+            dump_json(heavy, os.path.join(match_dir, "match_heavy.json"), compact=True,
+                      compress=True)
+            # match_info.json is superseded by the split files
+            legacy_file = find_json(os.path.join(match_dir, "match_info.json"))
+            if legacy_file:
+                os.remove(legacy_file)
 
     def load_data(self, dota_match_files):
         '''
         Load data from Dota Match's files given as input
+        Only match_core.json is read, match_heavy.json.gz is read on first access to a heavy field
+        dota_match_files can also be a DotaSQLite store, in which case self.match_id is loaded
         '''
+        if isinstance(dota_match_files, DotaSQLite):
+            return dota_match_files.load_match(self)
         logger.debug("Loading data from files: %s", dota_match_files)
-        for dota_match_file in dota_match_files:
-            if os.path.basename(dota_match_file) == "match_info.json":
-                with open(dota_match_file) as content:
-                    self.match_info = json.load(content)
-                logger.info("match_info.json loaded successfully!")
+        files = {json_name(dota_match_file): dota_match_file for dota_match_file in dota_match_files}
+        if "match_core.json" in files:
+            self._core = load_json(files["match_core.json"])
+            self._match_info = None
+            self._heavy_file = files.get("match_heavy.json")
+            if not self._heavy_file:
+                logger.warning("match_heavy.json.gz not found, only core data available")
+                self._match_info = self.merge(self._core, {"match": {}, "players": []})
+            logger.info("match_core.json loaded successfully!")
+        elif "match_info.json" in files:
+            self.match_info = load_json(files["match_info.json"])
+            logger.info("match_info.json loaded successfully!")
 
     def get_match_info(self):
         '''
@@ -51,8 +157,8 @@ class DotaMatch:
         '''
         if self.match_id:
             link = "https://api.opendota.com/api/matches/"+str(self.match_id)
-            mtach_response = requests.get(link)
-            if mtach_response.status_code != 200:
+            mtach_response = get_client().get(link)
+            if mtach_response is None or mtach_response.status_code != 200:
                 logger.error("Error querying mtach for ID %s", self.match_id)
                 logger.error("Check if match ID %s is valid", self.match_id)
                 return False
@@ -0,0 +1,147 @@
+'''
+Plan refreshes of the registered players within a budget of OpenDota API requests.
+Players are ordered by how stale their data is, weighted by how active they are, and the
+plan is truncated once the estimated number of requests reaches the budget
+'''
+import logging
+import math
+from datetime import datetime as dtm
+from dota_lib.dota_player import FULL_SYNC_INTERVAL_DAYS, MATCHES_PAGE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# OpenDota's free tier allows 50000 requests per month, i.e. ~1600 per day
+REFRESH_REQUEST_BUDGET = 1600
+
+# Requests of a full refresh: player_info, matches, wardmap and wordcloud
+FULL_REFRESH_COST = 4
+
+# Players without a match in this many days are considered less and less active
+ACTIVITY_WINDOW_DAYS = 30
+
+class DotaRefreshPlan:
+    '''
+    DotaRefreshPlan class, the result of DotaRefreshPlanner.plan
+    - players : entries to refresh, in order
+    - skipped : entries left out because of the budget
+    Each entry has "player", "last_updated", "staleness" (days, None if never updated),
+    "activity" (matches per day), "cost" (requests) and "score"
+    '''
+    def __init__(self, players, skipped, budget):
+        self.players = players
+        self.skipped = skipped
+        self.budget = budget
+
+    def __repr__(self) -> str:
+        return "DotaRefreshPlan({} players, {} requests, budget={})".format(
+            len(self.players), self.cost, self.budget)
+
+    def __str__(self) -> str:
+        return self.format()
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def __iter__(self):
+        return iter(entry["player"] for entry in self.players)
+
+    @property
+    def cost(self):
+        return sum(entry["cost"] for entry in self.players)
+
+    def format(self):
+        '''
+        Text table of the plan, e.g. to review it before running it
+        '''
+        lines = ["{:<4}{:<32}{:<14}{:>10}{:>10}{:>6}".format(
+            "#", "Player", "Last Updated", "Staleness", "Matches/d", "Cost")]
+        for idx, entry in enumerate(self.players, start=1):
+            lines.append("{:<4}{:<32}{:<14}{:>10}{:>10.2f}{:>6}".format(
+                idx, entry["player"], entry["last_updated"] or "never",
+                "-" if entry["staleness"] is None else str(entry["staleness"])+"d",
+                entry["activity"], entry["cost"]))
+        lines.append("Total: "+str(len(self.players))+" players, "+str(self.cost)+
+                     " requests (budget "+str(self.budget)+")")
+        if self.skipped:
+            lines.append("Skipped (over budget): "+
+                         ", ".join(entry["player"] for entry in self.skipped))
+        return "\n".join(lines)
+
+class DotaRefreshPlanner:
+    '''
+    DotaRefreshPlanner class to order and truncate a refresh of the players in a catalog
+    - budget : max number of requests of the plan (None for no limit)
+    '''
+    def __init__(self, budget=REFRESH_REQUEST_BUDGET):
+        self.budget = budget
+
+    def __repr__(self) -> str:
+        return "DotaRefreshPlanner(budget={})".format(self.budget)
+
+    @staticmethod
+    def days_since(date, now):
+        '''
+        Days between a <year>-<month>-<day> date and now (None if date is empty)
+        '''
+        if not date:
+            return None
+        return max((now - dtm.strptime(date, "%Y-%m-%d")).days, 0)
+
+    def get_activity(self, entry, now):
+        '''
+        Estimated matches per day: matches stored over the stored date range, lowered
+        when the last match is older than ACTIVITY_WINDOW_DAYS
+        '''
+        if not entry.get("matches") or not entry.get("first_match"):
+            return 0.0
+        span = max(self.days_since(entry["first_match"], now) -
+                   self.days_since(entry["last_match"], now), 1)
+        idle = self.days_since(entry["last_match"], now)
+        return entry["matches"] / span * min(1.0, ACTIVITY_WINDOW_DAYS / max(idle, 1))
+
+    def get_cost(self, entry, staleness, activity, now):
+        '''
+        Estimated requests to refresh a player (see DotaPlayer.get_all with incremental=True):
+        a full refresh if no full sync was done in FULL_SYNC_INTERVAL_DAYS, otherwise the
+        pages of new matches, plus the other endpoints only if new matches are expected
+        '''
+        last_full_sync = self.days_since(entry.get("last_full_sync", ""), now)
+        if staleness is None or last_full_sync is None or \
+                last_full_sync >= FULL_SYNC_INTERVAL_DAYS:
+            return FULL_REFRESH_COST
+        new_matches = activity * staleness
+        pages = max(1, math.ceil(new_matches / MATCHES_PAGE_SIZE))
+        return pages + (FULL_REFRESH_COST - 1 if new_matches >= 0.5 else 0)
+
+    def plan(self, catalog, now=None):
+        '''
+        Build a DotaRefreshPlan from a catalog (dict of player -> catalog entry, see
+        DotaCatalog). Never updated players come first, then the highest
+        staleness * (1 + activity)
+        '''
+        now = now or dtm.now()
+        entries = []
+        for player, entry in catalog.items():
+            staleness = self.days_since(entry.get("last_updated", ""), now)
+            activity = self.get_activity(entry, now)
+            score = math.inf if staleness is None else staleness * (1 + activity)
+            entries.append({
+                "player": player,
+                "last_updated": entry.get("last_updated", ""),
+                "staleness": staleness,
+                "activity": activity,
+                "cost": self.get_cost(entry, staleness, activity, now),
+                "score": score,
+            })
+        entries.sort(key=lambda entry: entry["score"], reverse=True)
+
+        players, skipped, cost = [], [], 0
+        for entry in entries:
+            if self.budget is None or cost + entry["cost"] <= self.budget:
+                players.append(entry)
+                cost += entry["cost"]
+            else:
+                skipped.append(entry)
+        logger.info("Refresh plan: %s players, %s requests, %s skipped (budget=%s)",
+                    len(players), cost, len(skipped), self.budget)
+        return DotaRefreshPlan(players, skipped, self.budget)
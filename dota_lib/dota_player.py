@@ -5,13 +5,34 @@ Refer to OpenDota API official documentation: https://docs.opendota.com/
 import json
 import logging
 import os
+import tempfile
 import time
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dtm
-import requests
+from dota_lib.dota_catalog import DotaCatalog
+from dota_lib.dota_client import get_client
+from dota_lib.dota_columns import COLUMNS_DIR, MatchColumns, columns_from_json_stream, \
+    iter_json_file, local_datetimes, read_json_lines, write_json_line
+from dota_lib.dota_heroes import get_heroes
+from dota_lib.dota_io import dump_json, dump_json_records, find_json, json_name, load_json
+from dota_lib.dota_match_index import DotaMatchIndex
+from dota_lib.dota_sqlite import DotaSQLite
 
 logger = logging.getLogger(__name__)
 
+# Size of the chunks read from streamed responses
+STREAM_CHUNK_SIZE = 64*1024
+
+# game_mode of the matches considered in analyses ("All Pick" and "Ranked All Pick")
+ALL_PICK_MODES = (1, 22)
+
+# Incremental match sync: page size of /players/<id>/matches queries (limit/offset) and
+# number of days after which the whole history is downloaded again to reconcile it
+MATCHES_PAGE_SIZE = 100
+FULL_SYNC_INTERVAL_DAYS = 7
+
 class DotaPlayer:
     '''
     DotaPlayer class to gather and analyze data from a specific player
@@ -34,12 +55,115 @@ class DotaPlayer:
         return "{} - {}".format(self.account_id, self.player_name)
 
     def __len__(self) -> int:
-        return len(self.player_matches)
+        return len(self.match_columns)
+
+    @property
+    def player_matches(self):
+        '''
+        OpenDota's list of matches. When the player was loaded from match columns,
+        player_matches.json is only parsed on first access
+        '''
+        if self._player_matches is None:
+            if self._player_matches_file:
+                self._player_matches = load_json(self._player_matches_file)
+                logger.info("player_matches.json loaded successfully!")
+            elif self._matches_source:
+                self._player_matches = list(self._matches_source())
+            elif self._match_columns is not None or self._columns_dir:
+                self._player_matches = self.match_columns.to_matches()
+            else:
+                self._player_matches = []
+        return self._player_matches
+
+    @player_matches.setter
+    def player_matches(self, player_matches):
+        self._player_matches = player_matches
+        self._player_matches_file = None
+        self._matches_source = None
+        self._match_columns = None
+        self._columns_dir = None
+
+    def set_matches_source(self, source):
+        '''
+        Where OpenDota's full match records are, while the matches only exist as match columns
+        (e.g. streamed into columns, or loaded from a DotaSQLite store)
+        - source : function returning an iterator over the records, newest match first
+        Must be set after match_columns, which resets it
+        '''
+        self._matches_source = source
+
+    def iter_player_matches(self):
+        '''
+        Iterate over OpenDota's full match records (all fields) without loading them all at
+        once when possible. Only the columnar fields exist if the matches were loaded from
+        match columns alone
+        '''
+        if self._player_matches is not None:
+            return iter(self._player_matches)
+        if self._player_matches_file:
+            return iter_json_file(self._player_matches_file)
+        if self._matches_source:
+            return self._matches_source()
+        if self._match_columns is not None or self._columns_dir:
+            return iter(self.match_columns.to_matches())
+        return iter([])
+
+    @property
+    def matches_as_columns(self):
+        '''
+        True if the player's matches only exist as match columns (streamed from OpenDota
+        or loaded from match columns without player_matches.json)
+        '''
+        return self._player_matches is None and self._player_matches_file is None
+
+    @property
+    def match_columns(self):
+        '''
+        Player's matches as a MatchColumns object (one NumPy array per field)
+        When loaded from disk, all monthly partitions are opened on first access
+        '''
+        if self._match_columns is None:
+            if self._columns_dir:
+                self._match_columns = MatchColumns.load(self._columns_dir)
+                logger.info("%s loaded successfully!", COLUMNS_DIR)
+            else:
+                self._match_columns = MatchColumns.from_matches(self.player_matches)
+        return self._match_columns
 
-    def save_data(self, output_path, overwrite_data=True):
+    @match_columns.setter
+    def match_columns(self, match_columns):
+        self._match_columns = match_columns
+        self._player_matches = None
+        self._player_matches_file = None
+        self._matches_source = None
+        self._columns_dir = None
+
+    def get_match_columns(self, start_time=None, end_time=None):
+        '''
+        Player's matches with start_time >= start_time and start_time < end_time
+        (unix timestamps). If the full history isn't loaded yet, only the monthly
+        partitions overlapping that range are opened
+        '''
+        if self._match_columns is None and self._columns_dir and \
+                (start_time is not None or end_time is not None):
+            return MatchColumns.load(self._columns_dir, start_time=start_time, end_time=end_time)
+        return self.match_columns.filter_time(start_time, end_time)
+
+    def save_data(self, output_path, overwrite_data=True, save_columns=True,
+                  compact=False, compress=False):
         '''
         Save all data from DotaPlayer to self.output_path
+        If save_columns is True, player's matches are also saved as match columns
+        Files are written atomically, and only if their content changed since last save
+        (content hashes are kept in data_info["Content Hash"])
+        - compact : write JSON files without indentation
+        - compress : write JSON files gzipped (<file>.json.gz)
+        output_path can also be a DotaSQLite store
         '''
+        if isinstance(output_path, DotaSQLite):
+            output_path.save_player(self)
+            return
+
         # Create a folder for the specific player
         player_dir = os.path.join(output_path,
             self.player_name.replace(" ", "_")+"_"+str(self.account_id))
@@ -50,35 +174,48 @@ class DotaPlayer:
                 player_dir, overwrite_data)
             return
 
-        # Save player_info if available
-        if self.player_info:
-            file_path = os.path.join(player_dir, "player_info.json")
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(self.player_info, file, ensure_ascii=False, indent=4)
-
-        # Save player_matches if available
-        if self.player_matches:
-            file_path = os.path.join(player_dir, "player_matches.json")
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(self.player_matches, file, ensure_ascii=False, indent=4)
-
-        # Save player_wardmap if available
-        if self.player_wardmap:
-            file_path = os.path.join(player_dir, "player_wardmap.json")
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(self.player_wardmap, file, ensure_ascii=False, indent=4)
-
-        # Save player_wordcloud if available
-        if self.player_wordcloud:
-            file_path = os.path.join(player_dir, "player_wordcloud.json")
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(self.player_wordcloud, file, ensure_ascii=False, indent=4)
-
-        # Save data_info if available
-        if self.data_info:
-            file_path = os.path.join(player_dir, "data_info.json")
-            with open(file_path, 'w', encoding='utf-8') as file:
-                json.dump(self.data_info, file, ensure_ascii=False, indent=4)
+        # Hashes of the files already on disk (from the stored data_info if not loaded)
+        if "Content Hash" not in self.data_info:
+            data_info_file = find_json(os.path.join(player_dir, "data_info.json"))
+            if data_info_file:
+                self.data_info["Content Hash"] = load_json(data_info_file).get("Content Hash", {})
+        content_hash = self.data_info.setdefault("Content Hash", {})
+        payloads = (
+            ("player_info.json", self.player_info),
+            # player_matches is skipped if it was never parsed, i.e. unchanged
+            ("player_matches.json", self._player_matches),
+            ("player_wardmap.json", self.player_wardmap),
+            ("player_wordcloud.json", self.player_wordcloud),
+        )
+        # Save each file if available
+        for file_name, payload in payloads:
+            if not payload:
+                continue
+            content_hash[file_name] = dump_json(payload, os.path.join(player_dir, file_name),
+                                                compact=compact, compress=compress,
+                                                known_hash=content_hash.get(file_name))
+
+        # Matches streamed into columns: write their full records (every OpenDota field)
+        # one at a time, player_matches.json then is the stored copy
+        if self._matches_source:
+            matches_file = os.path.join(player_dir, "player_matches.json")
+            content_hash["player_matches.json"], _ = dump_json_records(
+                self._matches_source(), matches_file, compress=compress)
+            self._player_matches_file = find_json(matches_file)
+            self._matches_source = None
+
+        # Save player_matches as match columns (skipped if never opened, i.e. unchanged)
+        columns_dir = os.path.join(player_dir, COLUMNS_DIR)
+        if save_columns and not (self._match_columns is None and self._columns_dir == columns_dir) \
+                and len(self.match_columns):
+            self.match_columns.save(columns_dir)
+
+        # Save data_info (always, since it carries the hashes of the other files)
+        dump_json(self.data_info, os.path.join(player_dir, "data_info.json"),
+                  compact=compact, compress=compress)
+
+        # Update player's entry in output_path's catalog
+        DotaCatalog(output_path).update_player(os.path.basename(player_dir), self)
 
     def load_data_path(self, dota_player_files_path):
         '''
@@ -90,33 +227,42 @@ class DotaPlayer:
     def load_data(self, dota_player_files):
         '''
         Load data from Dota Player's files given as input
+        dota_player_files can also be a DotaSQLite store, in which case self.account_id is loaded
         '''
+        if isinstance(dota_player_files, DotaSQLite):
+            return dota_player_files.load_player(self)
         logger.info("Loading data from files: %s", dota_player_files)
+        # Match columns are preferred over player_matches.json, which then is parsed lazily
+        # Columns themselves are only opened when needed (see match_columns/get_match_columns)
+        columns_dirs = [dota_player_file for dota_player_file in dota_player_files
+                        if os.path.basename(dota_player_file) == COLUMNS_DIR]
+        if columns_dirs:
+            self.match_columns = None
+            self._columns_dir = columns_dirs[0]
         for dota_player_file in dota_player_files:
-            if os.path.basename(dota_player_file) == "player_info.json":
+            file_name = json_name(dota_player_file)
+            if file_name == "player_info.json":
                 logger.debug(dota_player_file)
-                with open(dota_player_file) as content:
-                    self.player_info = json.load(content)
+                self.player_info = load_json(dota_player_file)
                 self.account_id = self.player_info["profile"]["account_id"]
                 self.player_name = self.player_info["profile"]["personaname"]
                 logger.info("player_info.json loaded successfully!")
                 logger.debug("Player Info: account_id=%s, player_name=%s",
                     self.account_id, self.player_name)
-            elif os.path.basename(dota_player_file) == "player_matches.json":
-                with open(dota_player_file) as content:
-                    self.player_matches = json.load(content)
+            elif file_name == "player_matches.json":
+                if columns_dirs:
+                    self._player_matches_file = dota_player_file
+                    continue
+                self.player_matches = load_json(dota_player_file)
                 logger.info("player_matches.json loaded successfully!")
-            elif os.path.basename(dota_player_file) == "player_wardmap.json":
-                with open(dota_player_file) as content:
-                    self.player_wardmap = json.load(content)
+            elif file_name == "player_wardmap.json":
+                self.player_wardmap = load_json(dota_player_file)
                 logger.info("player_wardmap.json loaded successfully!")
-            elif os.path.basename(dota_player_file) == "player_wordcloud.json":
-                with open(dota_player_file) as content:
-                    self.player_wordcloud = json.load(content)
+            elif file_name == "player_wordcloud.json":
+                self.player_wordcloud = load_json(dota_player_file)
                 logger.info("player_wordcloud.json loaded successfully!")
-            elif os.path.basename(dota_player_file) == "data_info.json":
-                with open(dota_player_file) as content:
-                    self.data_info = json.load(content)
+            elif file_name == "data_info.json":
+                self.data_info = load_json(dota_player_file)
                 logger.info("data_info.json loaded successfully!")
 
     def get_player_info(self):
@@ -125,13 +271,8 @@ class DotaPlayer:
         Player's info
         '''
         link = "https://api.opendota.com/api/players/"+str(self.account_id)
-        player_info_response = requests.get(link)
-        if player_info_response.status_code == 429:
-            logger.warning("HTTP error 429 received, waiting 70 seconds...")
-            time.sleep(70)
-            logger.info("70 seconds timer expired, trying to query data again")
-            player_info_response = requests.get(link)
-        if player_info_response.status_code != 200:
+        player_info_response = get_client().get(link)
+        if player_info_response is None or player_info_response.status_code != 200:
             logger.error("Error querying player info for ID %s", self.account_id)
             logger.error("Check if account ID %s is valid", self.account_id)
             return False
@@ -142,24 +283,108 @@ class DotaPlayer:
         self.data_info["Last Updated"] = time.strftime("%Y-%m-%d")
         return True
 
-    def get_matches(self):
+    def get_matches(self, stream=False, incremental=False):
         '''
         Query https://api.opendota.com/api/players/<account_id>/matches
         Player's history of matches
+        If stream is True, the response is parsed incrementally straight into match columns,
+        so the whole list of dicts never exists in memory. The full records are spooled to
+        a temporary file meanwhile, and written to player_matches.json by save_data
+        If incremental is True and matches are already stored, only the matches newer than
+        the stored ones are queried (see get_new_matches), unless a full sync is due
         '''
+        if incremental and not self.needs_full_sync():
+            return self.get_new_matches(stream=stream)
         link = "https://api.opendota.com/api/players/"+str(self.account_id)+"/matches"
-        player_matches_response = requests.get(link)
-        if player_matches_response.status_code == 429:
-            logger.warning("HTTP error 429 received, waiting 70 seconds...")
-            time.sleep(70)
-            logger.info("70 seconds timer expired, trying to query data again")
-            player_matches_response = requests.get(link)
-        if player_matches_response.status_code != 200:
+        player_matches_response = get_client().get(link, stream=stream)
+        if player_matches_response is None or player_matches_response.status_code != 200:
             logger.error("Error querying player info for ID %s", self.account_id)
             logger.error("Check if account ID %s is valid", self.account_id)
             return False
-        self.player_matches = json.loads(player_matches_response.text)
+        if stream:
+            spool = tempfile.TemporaryFile()
+            self.match_columns = columns_from_json_stream(
+                get_client().iter_content(player_matches_response, STREAM_CHUNK_SIZE), spool)
+            self.set_matches_source(read_json_lines(spool))
+        else:
+            self.player_matches = json.loads(player_matches_response.text)
         self.data_info["Last Updated"] = time.strftime("%Y-%m-%d")
+        self.data_info["Last Full Sync"] = time.strftime("%Y-%m-%d")
+        self.data_info["Match Sync"] = {"Mode": "full", "Requests": 1}
+        return True
+
+    def needs_full_sync(self, full_sync_days=FULL_SYNC_INTERVAL_DAYS):
+        '''
+        True if the whole history of matches must be queried: no matches stored yet,
+        or the last full sync is older than full_sync_days (periodic reconciliation)
+        '''
+        last_full_sync = self.data_info.get("Last Full Sync")
+        if not last_full_sync or not len(self):
+            return True
+        return (dtm.now() - dtm.strptime(last_full_sync, "%Y-%m-%d")).days >= full_sync_days
+
+    def get_new_matches(self, stream=False):
+        '''
+        Query https://api.opendota.com/api/players/<account_id>/matches?date=<days>
+        Only the days since the newest stored match are queried, MATCHES_PAGE_SIZE matches
+        at a time (limit/offset). New matches are merged with the stored ones, deduplicated
+        by match_id
+        '''
+        stored_ids = self.match_columns.match_id
+        newest = int(self.match_columns.start_time.max())
+        days = int((time.time() - newest) // 86400) + 1
+        link = "https://api.opendota.com/api/players/"+str(self.account_id)+"/matches"
+        pages = []
+        # Full records of the streamed pages
+        new_spool = tempfile.TemporaryFile() if stream else None
+        while True:
+            params = {"date": days, "limit": MATCHES_PAGE_SIZE,
+                      "offset": len(pages)*MATCHES_PAGE_SIZE}
+            player_matches_response = get_client().get(link, params=params, stream=stream)
+            if player_matches_response is None or player_matches_response.status_code != 200:
+                logger.error("Error querying new matches for ID %s", self.account_id)
+                return False
+            if stream:
+                pages.append(columns_from_json_stream(
+                    get_client().iter_content(player_matches_response, STREAM_CHUNK_SIZE),
+                    new_spool))
+            else:
+                pages.append(json.loads(player_matches_response.text))
+            if len(pages[-1]) < MATCHES_PAGE_SIZE:
+                break
+
+        if stream:
+            new_matches = MatchColumns.concatenate(pages)
+            # Pages may overlap if matches were played while paginating
+            _, first = np.unique(new_matches.match_id, return_index=True)
+            new_matches = new_matches[np.sort(first)]
+            new_matches = new_matches[~np.isin(new_matches.match_id, stored_ids)]
+            if len(new_matches):
+                # Spool the full records: new ones (same dedup as the columns) + stored ones
+                spool = tempfile.TemporaryFile()
+                new_ids = set(new_matches.match_id.tolist())
+                for match in read_json_lines(new_spool)():
+                    if match["match_id"] in new_ids:
+                        new_ids.discard(match["match_id"])
+                        write_json_line(spool, match)
+                for match in self.iter_player_matches():
+                    write_json_line(spool, match)
+                self.match_columns = MatchColumns.concatenate([new_matches, self.match_columns])
+                self.set_matches_source(read_json_lines(spool))
+        else:
+            known_ids = set(stored_ids.tolist())
+            new_matches = []
+            for match in (match for page in pages for match in page):
+                if match["match_id"] not in known_ids:
+                    known_ids.add(match["match_id"])
+                    new_matches.append(match)
+            if new_matches:
+                self.player_matches = new_matches + self.player_matches
+        logger.info("%s new matches for ID %s (%s days queried in %s requests)",
+                    len(new_matches), self.account_id, days, len(pages))
+        self.data_info["Last Updated"] = time.strftime("%Y-%m-%d")
+        self.data_info["Match Sync"] = {"Mode": "incremental", "Days": days,
+                                        "Requests": len(pages), "New Matches": len(new_matches)}
         return True
 
     def get_wardmap(self):
@@ -168,13 +393,8 @@ class DotaPlayer:
         Player's history of wardmap
         '''
         link = "https://api.opendota.com/api/players/"+str(self.account_id)+"/wardmap"
-        player_wardmap_response = requests.get(link)
-        if player_wardmap_response.status_code == 429:
-            logger.warning("HTTP error 429 received, waiting 70 seconds...")
-            time.sleep(70)
-            logger.info("70 seconds timer expired, trying to query data again")
-            player_wardmap_response = requests.get(link)
-        if player_wardmap_response.status_code != 200:
+        player_wardmap_response = get_client().get(link)
+        if player_wardmap_response is None or player_wardmap_response.status_code != 200:
             logger.error("Error querying player wardmap for ID %s", self.account_id)
             logger.error("Check if account ID %s is valid", self.account_id)
             return False
@@ -188,13 +408,8 @@ class DotaPlayer:
         Player's history of wordcloud
         '''
         link = "https://api.opendota.com/api/players/"+str(self.account_id)+"/wordcloud"
-        player_wordcloud_response = requests.get(link)
-        if player_wordcloud_response.status_code == 429:
-            logger.warning("HTTP error 429 received, waiting 70 seconds...")
-            time.sleep(70)
-            logger.info("70 seconds timer expired, trying to query data again")
-            player_wordcloud_response = requests.get(link)
-        if player_wordcloud_response.status_code != 200:
+        player_wordcloud_response = get_client().get(link)
+        if player_wordcloud_response is None or player_wordcloud_response.status_code != 200:
             logger.error("Error querying player wordcloud for ID %s", self.account_id)
             logger.error("Check if account ID %s is valid", self.account_id)
             return False
@@ -202,196 +417,259 @@ class DotaPlayer:
         self.data_info["Last Updated"] = time.strftime("%Y-%m-%d")
         return True
 
-    def get_all(self):
+    def get_all(self, stream_matches=False, incremental=False, journal=None):
         '''
         Combined method of all GET data methods available
+        incremental is passed to get_matches (only query matches newer than the stored ones)
+        The requests run concurrently (still under the shared client's rate limit),
+        it's all-or-nothing: if any of them fails, the player's data is left as before
+        On an incremental sync, matches are queried first: if no new match was played,
+        player_info, wardmap and wordcloud can't have changed and are not queried again
+        (listed in data_info["Skipped Endpoints"])
+        With a DotaIngestJournal, every endpoint is checkpointed once it succeeds and fresh
+        checkpoints are reused instead of querying again (listed in data_info["Resumed Endpoints"])
+        Time taken by each endpoint is kept in data_info["Endpoint Timings"]
         '''
-        if not self.get_player_info():
-            return False
-        if not self.get_matches():
-            return False
-        if not self.get_wardmap():
-            return False
-        if not self.get_wordcloud():
+        queries = {
+            "player_info": self.get_player_info,
+            "matches": lambda: self.get_matches(stream=stream_matches, incremental=incremental),
+            "wardmap": self.get_wardmap,
+            "wordcloud": self.get_wordcloud,
+        }
+        resumed = []
+        if journal:
+            queries = {name: self.checkpointed(journal, name, query, resumed)
+                       for name, query in queries.items()}
+        stored = {
+            "player_info": self.player_info,
+            "wardmap": self.player_wardmap,
+            "wordcloud": self.player_wordcloud,
+        }
+        previous_state = dict(self.__dict__)
+        previous_data_info = dict(self.data_info)
+        results = {}
+        skipped = []
+        if incremental and not self.needs_full_sync():
+            signature = self.get_matches_signature()
+            results["matches"] = self.timed(queries.pop("matches"))
+            if results["matches"][0] and self.get_matches_signature() == signature:
+                skipped = [name for name in queries if stored[name]]
+                for name in skipped:
+                    del queries[name]
+        if queries and all(success for success, _ in results.values()):
+            with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+                futures = {name: executor.submit(self.timed, request)
+                           for name, request in queries.items()}
+                results.update({name: future.result() for name, future in futures.items()})
+        if not all(success for success, _ in results.values()):
+            failed = [name for name, (success, _) in results.items() if not success]
+            logger.error("get_all failed for ID %s (%s), data left unchanged",
+                         self.account_id, ", ".join(failed))
+            self.__dict__.update(previous_state)
+            self.data_info = previous_data_info
             return False
+        if skipped:
+            logger.info("No new matches for ID %s, skipped %s", self.account_id, ", ".join(skipped))
+        self.data_info["Skipped Endpoints"] = skipped
+        self.data_info["Resumed Endpoints"] = sorted(resumed)
+        self.data_info["Endpoint Timings"] = {name: round(elapsed, 3)
+                                              for name, (_, elapsed) in results.items()}
         self.data_info["Last Updated"] = time.strftime("%Y-%m-%d")
         return True
 
-    def simplified_matches(self, hero_dict=None):
+    def get_matches_signature(self):
+        '''
+        (number of matches, latest match_id) of the stored matches, used to detect changes
+        '''
+        return self.match_columns.get_signature()
+
+    def checkpointed(self, journal, endpoint, query, resumed):
+        '''
+        Wrap query so that a fresh checkpoint of endpoint in journal is restored instead of
+        querying again, and a successful query is checkpointed
+        '''
+        def run():
+            if journal.restore(self, endpoint):
+                resumed.append(endpoint)
+                return True
+            success = query()
+            if success:
+                journal.save(self, endpoint)
+            return success
+        return run
+
+    @staticmethod
+    def timed(request):
+        '''
+        Run request(), returns (result, seconds taken)
+        '''
+        started = time.perf_counter()
+        try:
+            result = request()
+        except Exception:
+            logger.exception("Unexpected error in %s", request)
+            result = False
+        return result, time.perf_counter() - started
+
+    def simplified_matches(self, heroes=None, start_time=None, end_time=None):
         '''
         Based on self.player_matches return a list with:
         - "match_id" : match ID
-        - "date" : <year>-<month>-<day> in a string format
+        - "date" : match's local datetime
         - "kda" : <kill>/<death>/<assist> in a string format
-        - "hero" : in case hero_dict is provided, translate ID to hero's name
+        - "hero" : in case heroes (DotaHeroes) is provided, translate ID to hero's name
         - "side" : either 'radiant' or 'dire'
         - "win" : 0 = lose; 1 = win
+        start_time/end_time (unix timestamps) can be used to only get matches in that range
         '''
-        hero_dict = hero_dict or {}
-        simplified = []
-        if self.player_matches:
-            for match in self.player_matches:
-                # Skip games that are not "All Pick"
-                if match["game_mode"] not in (1, 22):
-                    continue
-                entry = {}
-                entry["match_id"] = match["match_id"]
-                entry["date"] = dtm.fromtimestamp(match["start_time"])
-                entry["kda"] = str(match["kills"])
-                entry["kda"] += "/"+str(match["deaths"])
-                entry["kda"] += "/"+str(match["assists"])
-                entry["hero"] = hero_dict.get(str(match["hero_id"]), str(match["hero_id"]))
-                # "player_slot" > 127 : Dire
-                # "player_slot" < 128 : Radiant
-                if match["player_slot"] > 127:
-                    entry["side"] = "dire"
-                else:
-                    entry["side"] = "radiant"
-                if entry["side"] == "radiant" and match["radiant_win"]:
-                    entry["win"] = 1
-                elif entry["side"] == "dire" and not match["radiant_win"]:
-                    entry["win"] = 1
-                else:
-                    entry["win"] = 0
-                simplified.append(entry)
-        return simplified
-
-    def simplified_matches_df(self, hero_dict=None):
-        '''
-        Based on self.player_matches return a Pandas DataFrame with:
-        - pd.DataFrame(data, columns)
-        -- data : list(zip(match_id, date, kda, hero, side, win))
-        -- columns : ["match_id", "date", "kda", "hero", "side", "win"]
-        --- "match_id" : match ID
-        --- "date" : <year>-<month>-<day> in a string format
-        --- "kda" : <kill>/<death>/<assist> in a string format
-        --- "hero" : in case hero_dict is provided, translate ID to hero's name
-        --- "side" : either 'radiant' or 'dire'
-        --- "win" : 0 = lose; 1 = win
-        '''
-        hero_dict = hero_dict or {}
-        match_id, date, kda, hero, side, win = [], [], [], [], [], []
-        if self.player_matches:
-            for match in self.player_matches:
-                # Skip games that are not "All Pick"
-                if match["game_mode"] not in (1, 22):
-                    continue
-                entry = {}
-                match_id.append(match["match_id"])
-                date.append(dtm.fromtimestamp(match["start_time"]))
-                kda.append(str(match["kills"])+"/"+str(match["deaths"])+"/"+str(match["assists"]))
-                hero.append(hero_dict.get(str(match["hero_id"]), str(match["hero_id"])))
-                # "player_slot" > 127 : Dire
-                # "player_slot" < 128 : Radiant
-                if match["player_slot"] > 127:
-                    side.append("dire")
-                else:
-                    side.append("radiant")
-                if side[-1] == "radiant" and match["radiant_win"]:
-                    win.append(1)
-                elif side[-1] == "dire" and not match["radiant_win"]:
-                    win.append(1)
-                else:
-                    win.append(0)
-        simplified = pd.DataFrame(list(zip(match_id, date, kda, hero, side, win)),
-                                  columns=["match_id", "date", "kda", "hero", "side", "win"])
-        return simplified
+        return self.simplified_records(self.simplified_matches_df(heroes, start_time, end_time))
+
+    @staticmethod
+    def simplified_records(simplified):
+        '''
+        Convert a simplified_matches_df DataFrame into simplified_matches' list of dicts
+        '''
+        dates = pd.DatetimeIndex(simplified["date"]).to_pydatetime().tolist()
+        return [{"match_id": match_id, "date": date, "kda": kda, "hero": hero,
+                 "side": side, "win": win}
+                for match_id, date, kda, hero, side, win in zip(
+                    simplified["match_id"].tolist(), dates, simplified["kda"].tolist(),
+                    simplified["hero"].tolist(), simplified["side"].tolist(),
+                    simplified["win"].tolist())]
+
+    def get_all_pick_columns(self, start_time=None, end_time=None):
+        '''
+        Match columns of the "All Pick" matches (see ALL_PICK_MODES), the only matches
+        considered in analyses, optionally in the [start_time, end_time) range
+        '''
+        columns = self.get_match_columns(start_time, end_time)
+        return columns[np.isin(columns.game_mode, ALL_PICK_MODES)]
+
+    def simplified_matches_df(self, heroes=None, start_time=None, end_time=None):
+        '''
+        Based on self.player_matches return a Pandas DataFrame of "All Pick" matches with:
+        - "match_id" : match ID (int64)
+        - "date" : match's local datetime (datetime64)
+        - "kda" : <kill>/<death>/<assist> in a string format
+        - "hero" : in case heroes (DotaHeroes) is provided, translate ID to hero's name (categorical)
+        - "side" : either 'radiant' or 'dire' (categorical)
+        - "win" : 0 = lose; 1 = win (int8)
+        - "hero_id", "kills", "deaths", "assists" : numeric values
+        start_time/end_time (unix timestamps) can be used to only get matches in that range
+        Built with vectorized operations over the match columns
+        '''
+        # Skip games that are not "All Pick"
+        columns = self.get_all_pick_columns(start_time, end_time)
+
+        # "player_slot" > 127 : Dire
+        # "player_slot" < 128 : Radiant
+        dire = columns.player_slot > 127
+        side = pd.Categorical.from_codes(dire.astype(np.int8), categories=["radiant", "dire"])
+        win = (dire != columns.radiant_win).astype(np.int8)
+
+        hero_ids, hero_codes = np.unique(columns.hero_id, return_inverse=True)
+        hero = pd.Categorical.from_codes(
+            hero_codes.ravel(), categories=heroes.get_names(hero_ids) if heroes
+            else hero_ids.astype(str))
+
+        kills, deaths, assists = columns.kills, columns.deaths, columns.assists
+        if len(columns):
+            # Small integers: build "k/d/a" from a table of their strings
+            low = int(min(kills.min(), deaths.min(), assists.min()))
+            high = int(max(kills.max(), deaths.max(), assists.max()))
+            numbers = np.array([str(number) for number in range(low, high+1)], dtype=object)
+            kda = numbers[kills-low] + "/" + numbers[deaths-low] + "/" + numbers[assists-low]
+        else:
+            kda = np.array([], dtype=object)
+
+        return pd.DataFrame({
+            "match_id": np.asarray(columns.match_id, dtype=np.int64),
+            "date": local_datetimes(columns.start_time),
+            "kda": kda,
+            "hero": hero,
+            "side": side,
+            "win": win,
+            "hero_id": np.asarray(columns.hero_id),
+            "kills": np.asarray(kills),
+            "deaths": np.asarray(deaths),
+            "assists": np.asarray(assists),
+        })
 
     def get_winrate_info(self):
         '''
         Requires player_matches
         '''
-        win = 0
-        loss = 0
-        if self.player_matches:
-            for match in self.player_matches:
-                # "player_slot" > 127 : Dire
-                # "player_slot" < 128 : Radiant
-                if match["player_slot"] > 127 and not match["radiant_win"]:
-                    win += 1
-                elif match["player_slot"] <= 127 and match["radiant_win"]:
-                    win += 1
-                else:
-                    loss += 1
-            return win, loss
+        columns = self.match_columns
+        if len(columns):
+            # "player_slot" > 127 : Dire
+            # "player_slot" < 128 : Radiant
+            win = int(((columns.player_slot > 127) != columns.radiant_win).sum())
+            return win, len(columns) - win
         return 0, 0
 
-    def get_hero_performance(self, heroes_dict=None):
+    def get_hero_performance(self, heroes=None):
         '''
         '''
         logger.info("get_hero_performance called")
-        heroes_dict = heroes_dict or {}
+        heroes = heroes or get_heroes()
 
-    def get_hero_performance_with_players(self, hero, players, heroes_dict=None):
+    def get_hero_performance_with_players(self, hero, players, heroes=None):
         '''
         Input:
-        - hero (str|int) : it can be either the hero name or hero ID
-        - players : list of DotaPlayer
-        
+        - hero (str|int) : it can be either the hero name (or alias) or hero ID
+        - heroes : DotaHeroes registry used to find the hero ID, defaults to get_heroes()
+        - players : list of DotaPlayer, or a match index (DotaMatchIndex or DotaSQLite store)
+          of the registered players, in which case only this hero's matches are looked up
+
         Output:
         - pd.DataFrame(data, columns)
         -- data : list(zip(player_id, t_matches, win, winrate))
         -- columns : ["player_id", "t_matches", "win", "winrate"]
-        --- "player_id" : player ID
+        --- "player_id" : player ID (<player_name>_<account_id>)
         --- "t_matches" : total matches
         --- "win" : total matches won
         --- "winrate" : winrate
         '''
         logger.info("get_hero_performance_with_players called")
         logger.debug("  for hero %s, players = %s", hero, players)
-        heroes_dict = heroes_dict or {}
+        heroes = heroes or get_heroes()
 
-        if not isinstance(players, list):
-            logger.error("ERROR! players is not a list!")
+        if not isinstance(players, (list, DotaMatchIndex, DotaSQLite)):
+            logger.error("ERROR! players is not a list nor a match index!")
             return pd.DataFrame()
 
-        hero_dict_id = {}
-        if isinstance(hero, str):
-            if hero not in heroes_dict:
-                hero_dict_id =  {y.replace(" ", "_").replace("-", "_").lower():x
-                                for x,y in heroes_dict.items()}
-                hero = hero.replace(" ", "_").replace("-", "_").lower()
-                if hero in hero_dict_id:
-                    hero_id = hero_dict_id[hero.replace(" ", "_").replace("-", "_").lower()]
-                else:
-                    logger.debug("Couldn't find %s in %s",
-                                hero.replace(" ", "_").replace("-", "_").lower(),
-                                hero_dict_id)
-                    hero_id = hero
-        elif isinstance(hero, int):
-            hero_id = str(hero)
-        else:
+        if not isinstance(hero, (str, int)):
             logger.error("ERROR! Hero provided must be either int or str!")
             return pd.DataFrame()
+        hero_id = heroes.get_id(hero)
 
-        if self.player_matches:
-            simplified_matches = self.simplified_matches_df()
-            flt = simplified_matches['hero'].isin([hero_id])
-            matches_hero_match_id = simplified_matches[flt]["match_id"].tolist()
-            matches_hero_win = simplified_matches[flt]["win"].tolist()
-            matches_hero = dict(zip(matches_hero_match_id, matches_hero_win))
-
-            player_id, t_matches, win, winrate = [], [], [], []
-
-            try:
-                for player in players:
-                    player_matches_id = [match["match_id"] for match in player.player_matches]
-                    intersec = list(set(matches_hero_match_id) & set(player_matches_id))
-                    if not intersec:
-                        continue
-                    player_id.append(player.player_name+"_"+str(player.account_id))
-                    win.append(0)
-                    t_matches.append(0)
-                    for match_id in intersec:
-                        t_matches[-1]+=1
-                        if matches_hero[match_id]:
-                            win[-1]+=1
-                    winrate.append(win[-1]/t_matches[-1])
-                return pd.DataFrame(list(zip(player_id, t_matches, win, winrate)),
-                                            columns=["player_id", "t_matches", "win", "winrate"])
-            except ZeroDivisionError:
-                logger.exception("ERROR! calculating data for player %s", player)
-                logger.debug("matches_hero_match_id : %s", matches_hero_match_id)
-        else:
+        if not len(self.match_columns):
             logger.error("ERROR! self.matches is not populated!")
             return pd.DataFrame()
+        if hero_id is None:
+            logger.debug("Couldn't find hero %s", hero)
+            return pd.DataFrame(columns=["player_id", "t_matches", "win", "winrate"])
+
+        # Matches played with this hero, sorted by match_id, and their result
+        columns = self.get_all_pick_columns()
+        columns = columns[columns.hero_id == hero_id]
+        order = np.argsort(columns.match_id, kind="stable")
+        hero_match_ids = np.asarray(columns.match_id, dtype=np.int64)[order]
+        hero_wins = ((columns.player_slot > 127) != columns.radiant_win)[order]
+
+        if isinstance(players, list):
+            participants = pd.concat([pd.DataFrame({
+                "match_id": hero_match_ids[np.isin(hero_match_ids, player.match_columns.match_id)],
+                "player": player.player_name.replace(" ", "_")+"_"+str(player.account_id)})
+                for player in players] or [pd.DataFrame(columns=["match_id", "player"])])
+        else:
+            participants = players.get_match_participants(hero_match_ids)
+        win = hero_wins[np.searchsorted(hero_match_ids,
+                                        participants["match_id"].values.astype(np.int64))]
+        hero_performance = pd.DataFrame({"player_id": participants["player"].values,
+                                         "win": win.astype(np.int64)})
+        hero_performance = hero_performance.groupby("player_id", sort=True)["win"] \
+            .agg(["size", "sum"]).reset_index()
+        hero_performance.columns = ["player_id", "t_matches", "win"]
+        hero_performance["winrate"] = hero_performance.win/hero_performance.t_matches
+        return hero_performance
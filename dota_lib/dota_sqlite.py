@@ -0,0 +1,486 @@
+'''
+SQLite storage engine for dota_db (stdlib sqlite3).
+Players, their matches, data_info and DotaMatch details are kept in a single database file,
+with indexes so questions like "matches on hero X" or "matches in March" don't need full reads
+'''
+import json
+import logging
+import os
+import sqlite3
+import threading
+from itertools import zip_longest
+import numpy as np
+import pandas as pd
+from datetime import datetime as dtm
+from dota_lib.dota_columns import MATCH_COLUMNS, MatchColumns
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 5
+
+# Fields of OpenDota's match records that are the same for every player of a match,
+# kept once in matches.extra (other fields, besides MATCH_COLUMNS, go to participation.payload)
+MATCH_FIELDS = ("lobby_type", "version", "average_rank", "cluster", "region", "patch")
+
+# Match columns of a row of matches/participation (in the tables' order)
+MATCH_ROW_COLUMNS = ("match_id", "start_time", "game_mode", "radiant_win", "duration")
+PARTICIPATION_ROW_COLUMNS = ("match_id", "start_time", "player_slot", "hero_id", "kills",
+                             "deaths", "assists")
+
+# Max number of ? placeholders used in a single query
+SQLITE_MAX_VARIABLES = 900
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS players (
+    account_id INTEGER PRIMARY KEY,
+    player_name TEXT NOT NULL,
+    player_info TEXT,
+    player_wardmap TEXT,
+    player_wordcloud TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS data_info (
+    account_id INTEGER PRIMARY KEY,
+    data_info TEXT NOT NULL
+);
+-- One record per match, shared by all registered players that played it
+CREATE TABLE IF NOT EXISTS matches (
+    match_id INTEGER PRIMARY KEY,
+    start_time INTEGER NOT NULL,
+    game_mode INTEGER NOT NULL,
+    radiant_win INTEGER NOT NULL,
+    duration INTEGER NOT NULL,
+    -- MATCH_FIELDS of OpenDota's match record (JSON)
+    extra TEXT
+);
+-- One record per (match, registered player)
+-- start_time is copied from matches, so a player's matches in a time range use one index
+CREATE TABLE IF NOT EXISTS participation (
+    match_id INTEGER NOT NULL,
+    account_id INTEGER NOT NULL,
+    start_time INTEGER NOT NULL,
+    player_slot INTEGER NOT NULL,
+    hero_id INTEGER NOT NULL,
+    kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL,
+    assists INTEGER NOT NULL,
+    -- Player's fields of OpenDota's match record (JSON), that are neither match columns
+    -- nor MATCH_FIELDS. NULL for matches stored before schema version 3
+    payload TEXT,
+    PRIMARY KEY (account_id, match_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_matches_start_time ON matches (start_time);
+CREATE INDEX IF NOT EXISTS idx_participation_match ON participation (match_id);
+CREATE INDEX IF NOT EXISTS idx_participation_hero ON participation (hero_id);
+CREATE INDEX IF NOT EXISTS idx_participation_account_start ON participation (account_id, start_time);
+CREATE VIEW IF NOT EXISTS player_matches AS
+    SELECT p.account_id, m.match_id, m.start_time, p.hero_id, p.player_slot, m.radiant_win,
+           m.game_mode, p.kills, p.deaths, p.assists, m.duration
+    FROM participation p JOIN matches m ON m.match_id = p.match_id;
+CREATE TABLE IF NOT EXISTS match_details (
+    match_id INTEGER PRIMARY KEY,
+    match_info TEXT NOT NULL
+);
+'''
+
+def split_match_record(record):
+    '''
+    Split an OpenDota match record into (match's extra fields, player's extra fields),
+    without the fields already kept as match columns
+    '''
+    match_extra, player_extra = {}, {}
+    for key, value in record.items():
+        if key in MATCH_FIELDS:
+            match_extra[key] = value
+        elif key not in MATCH_COLUMNS:
+            player_extra[key] = value
+    return match_extra, player_extra
+
+class DotaSQLite:
+    '''
+    DotaSQLite class to save/load DotaPlayer and DotaMatch data to/from a SQLite database.
+    One connection is opened per thread, so a store can be shared with background threads
+    '''
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self.connection() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self.migrate(conn)
+            conn.executescript(SCHEMA)
+            conn.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+
+        logger.info("DotaSQLite opened, db_path=%s", db_path)
+
+    def __repr__(self) -> str:
+        return "DotaSQLite('{}')".format(self.db_path)
+
+    def connection(self):
+        '''
+        Returns the sqlite3 connection of the current thread
+        '''
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def migrate(conn):
+        '''
+        Update a database created with an older schema version (before SCHEMA is run)
+        - 1 -> 2 : the player_matches table, with a full copy of every match per player, is
+          split into the deduplicated matches and participation tables
+        - 2 -> 3 : participation keeps OpenDota's full match record (payload column)
+        - 3 -> 4 : participation gets the match's start_time, indexed with account_id
+        - 4 -> 5 : the match's fields of the full records are moved to matches (extra column)
+        '''
+        tables = dict(conn.execute("SELECT name, type FROM sqlite_master").fetchall())
+        if tables.get("player_matches") == "table":
+            logger.info("Migrating player_matches table to matches/participation")
+            conn.execute("ALTER TABLE player_matches RENAME TO player_matches_v1")
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "INSERT OR REPLACE INTO matches (match_id, start_time, game_mode, radiant_win, "
+                "duration) SELECT match_id, start_time, game_mode, radiant_win, duration "
+                "FROM player_matches_v1")
+            conn.execute(
+                "INSERT OR REPLACE INTO participation (match_id, account_id, start_time, "
+                "player_slot, hero_id, kills, deaths, assists) SELECT match_id, account_id, "
+                "start_time, player_slot, hero_id, kills, deaths, assists FROM player_matches_v1")
+            conn.execute("DROP TABLE player_matches_v1")
+        elif "participation" in tables:
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(participation)")]
+            if "payload" not in columns:
+                logger.info("Adding payload column to participation")
+                conn.execute("ALTER TABLE participation ADD COLUMN payload TEXT")
+            if "start_time" not in columns:
+                logger.info("Adding start_time column to participation")
+                conn.execute("ALTER TABLE participation ADD COLUMN start_time INTEGER NOT NULL "
+                             "DEFAULT 0")
+                conn.execute("UPDATE participation SET start_time = (SELECT m.start_time FROM "
+                             "matches m WHERE m.match_id = participation.match_id)")
+            if "extra" not in [row[1] for row in conn.execute("PRAGMA table_info(matches)")]:
+                logger.info("Moving match fields of participation payloads to matches")
+                conn.execute("ALTER TABLE matches ADD COLUMN extra TEXT")
+                rows = conn.execute("SELECT account_id, match_id, payload FROM participation "
+                                    "WHERE payload IS NOT NULL").fetchall()
+                for account_id, match_id, payload in rows:
+                    match_extra, player_extra = split_match_record(json.loads(payload))
+                    conn.execute("UPDATE matches SET extra = ? WHERE match_id = ?",
+                                 (json.dumps(match_extra, ensure_ascii=False), match_id))
+                    conn.execute("UPDATE participation SET payload = ? WHERE account_id = ? AND "
+                                 "match_id = ?", (json.dumps(player_extra, ensure_ascii=False),
+                                                  account_id, match_id))
+        else:
+            return
+        missing = conn.execute(
+            "SELECT COUNT(*) FROM participation WHERE payload IS NULL").fetchone()[0]
+        if missing:
+            logger.warning("%s matches were stored before schema version 3 and only keep their "
+                           "match columns, run \"python run.py -import_sqlite\" to store their "
+                           "full records", missing)
+
+    ################ PLAYERS
+    def list_players(self):
+        '''
+        Returns a list of "<player_name>_<account_id>", same as the JSON tree folders
+        '''
+        rows = self.connection().execute(
+            "SELECT player_name, account_id FROM players ORDER BY player_name").fetchall()
+        return [name.replace(" ", "_")+"_"+str(account_id) for name, account_id in rows]
+
+    def get_player_version(self, account_id):
+        '''
+        Returns the player's data version, increased on every save_player
+        '''
+        row = self.connection().execute(
+            "SELECT version FROM players WHERE account_id = ?", (int(account_id),)).fetchone()
+        return row[0] if row else None
+
+    def save_player(self, dota_player):
+        '''
+        Save all data from a DotaPlayer object, including OpenDota's full match records
+        (match's fields in matches, player's fields in participation)
+        '''
+        account_id = int(dota_player.account_id)
+        columns = dota_player.match_columns
+        # Player's fields of every record, filled while the matches are inserted
+        payloads = []
+
+        def match_rows():
+            # Records are in the same order as the match columns, None once they run out
+            # (columns only player)
+            for match_id, start_time, game_mode, radiant_win, duration, record in zip_longest(
+                    *[columns[name].tolist() for name in MATCH_ROW_COLUMNS],
+                    dota_player.iter_player_matches()):
+                if record is None:
+                    extra, payload = None, None
+                elif record["match_id"] != match_id:
+                    raise ValueError("Match records of {} are not in the same order as its match "
+                                     "columns".format(account_id))
+                else:
+                    extra, payload = [json.dumps(fields, ensure_ascii=False)
+                                      for fields in split_match_record(record)]
+                payloads.append(payload)
+                yield match_id, start_time, game_mode, int(radiant_win), duration, extra
+
+        def participation_rows():
+            for row in zip(*[columns[name].tolist() for name in PARTICIPATION_ROW_COLUMNS],
+                           payloads):
+                yield (row[0], account_id) + row[1:]
+
+        with self.connection() as conn:
+            conn.execute(
+                "INSERT INTO players (account_id, player_name, player_info, player_wardmap, "
+                "player_wordcloud, version) VALUES (?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT(account_id) DO UPDATE SET player_name = excluded.player_name, "
+                "player_info = excluded.player_info, player_wardmap = excluded.player_wardmap, "
+                "player_wordcloud = excluded.player_wordcloud, version = version + 1",
+                (account_id, dota_player.player_name,
+                 json.dumps(dota_player.player_info, ensure_ascii=False),
+                 json.dumps(dota_player.player_wardmap, ensure_ascii=False),
+                 json.dumps(dota_player.player_wordcloud, ensure_ascii=False)))
+            conn.execute("INSERT OR REPLACE INTO data_info (account_id, data_info) VALUES (?, ?)",
+                         (account_id, json.dumps(dota_player.data_info, ensure_ascii=False)))
+            conn.execute("DELETE FROM participation WHERE account_id = ?", (account_id,))
+            # A match saved without its record (pre schema version 3) keeps its stored extra
+            conn.executemany(
+                "INSERT INTO matches (match_id, start_time, game_mode, radiant_win, duration, "
+                "extra) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(match_id) DO UPDATE SET "
+                "start_time = excluded.start_time, game_mode = excluded.game_mode, "
+                "radiant_win = excluded.radiant_win, duration = excluded.duration, "
+                "extra = COALESCE(excluded.extra, extra)", match_rows())
+            conn.executemany(
+                "INSERT INTO participation (match_id, account_id, start_time, player_slot, hero_id, "
+                "kills, deaths, assists, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                participation_rows())
+        logger.info("Player %s saved to %s (%s matches)", account_id, self.db_path, len(columns))
+
+    def load_player(self, dota_player):
+        '''
+        Load data into a DotaPlayer object, using its account_id.
+        Returns False if the player is not stored
+        '''
+        account_id = int(dota_player.account_id)
+        conn = self.connection()
+        row = conn.execute(
+            "SELECT player_name, player_info, player_wardmap, player_wordcloud FROM players "
+            "WHERE account_id = ?", (account_id,)).fetchone()
+        if not row:
+            logger.error("Player %s not found in %s", account_id, self.db_path)
+            return False
+        dota_player.player_name = row[0]
+        dota_player.player_info = json.loads(row[1])
+        dota_player.player_wardmap = json.loads(row[2])
+        dota_player.player_wordcloud = json.loads(row[3])
+        data_info = conn.execute("SELECT data_info FROM data_info WHERE account_id = ?",
+                                 (account_id,)).fetchone()
+        dota_player.data_info = json.loads(data_info[0]) if data_info else {}
+        dota_player.match_columns = self.get_player_match_columns(account_id)
+        # Full match records are only read when needed (e.g. player_matches)
+        dota_player.set_matches_source(lambda: self.iter_player_match_records(account_id))
+        logger.info("Player %s loaded from %s", account_id, self.db_path)
+        return True
+
+    def get_catalog(self):
+        '''
+        Returns a summary of all stored players, same format as DotaCatalog
+        '''
+        rows = self.connection().execute(
+            "SELECT p.player_name, p.account_id, d.data_info, p.version, "
+            "COUNT(m.match_id), MIN(m.start_time), MAX(m.start_time) "
+            "FROM players p LEFT JOIN data_info d ON d.account_id = p.account_id "
+            "LEFT JOIN participation pa ON pa.account_id = p.account_id "
+            "LEFT JOIN matches m ON m.match_id = pa.match_id "
+            "GROUP BY p.account_id").fetchall()
+        catalog = {}
+        for name, account_id, data_info, version, n_matches, first_match, last_match in rows:
+            data_info = json.loads(data_info) if data_info else {}
+            catalog[name.replace(" ", "_")+"_"+str(account_id)] = {
+                "account_id": str(account_id),
+                "player_name": name,
+                "last_updated": data_info.get("Last Updated", ""),
+                "last_full_sync": data_info.get("Last Full Sync", ""),
+                "matches": n_matches,
+                "first_match": dtm.fromtimestamp(first_match).strftime("%Y-%m-%d") if n_matches else "",
+                "last_match": dtm.fromtimestamp(last_match).strftime("%Y-%m-%d") if n_matches else "",
+                "data_version": version,
+            }
+        return catalog
+
+    def get_player_match_columns(self, account_id, hero_id=None, start_time=None, end_time=None):
+        '''
+        Query a player's matches, optionally filtered by hero_id and/or
+        start_time >= start_time and start_time < end_time (unix timestamps)
+        Returns a MatchColumns object ordered from newest to oldest match (same as OpenDota)
+        Uses the participation (account_id, start_time) index
+        '''
+        query = ("SELECT m.match_id, p.start_time, p.hero_id, p.player_slot, m.radiant_win, "
+                 "m.game_mode, p.kills, p.deaths, p.assists, m.duration "
+                 "FROM participation p JOIN matches m ON m.match_id = p.match_id "
+                 "WHERE p.account_id = ?")
+        params = [int(account_id)]
+        if hero_id is not None:
+            query += " AND p.hero_id = ?"
+            params.append(int(hero_id))
+        if start_time is not None:
+            query += " AND p.start_time >= ?"
+            params.append(int(start_time))
+        if end_time is not None:
+            query += " AND p.start_time < ?"
+            params.append(int(end_time))
+        query += " ORDER BY p.start_time DESC, p.match_id DESC"
+        rows = self.connection().execute(query, params).fetchall()
+        columns = {}
+        for idx, (name, dtype) in enumerate(MATCH_COLUMNS.items()):
+            columns[name] = np.fromiter((row[idx] for row in rows), dtype=dtype, count=len(rows))
+        return MatchColumns(columns)
+
+    def iter_player_match_records(self, account_id):
+        '''
+        Iterate over a player's full OpenDota match records, newest match first: match columns
+        merged with the match's and player's extra fields
+        Matches stored before schema version 3 only have their columnar fields
+        Read with their own connection, i.e. a snapshot that save_player can overwrite meanwhile
+        '''
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.execute(
+                "SELECT m.extra, p.payload, m.match_id, m.start_time, p.hero_id, p.player_slot, "
+                "m.radiant_win, m.game_mode, p.kills, p.deaths, p.assists, m.duration "
+                "FROM participation p JOIN matches m ON m.match_id = p.match_id "
+                "WHERE p.account_id = ? ORDER BY p.start_time DESC, p.match_id DESC",
+                (int(account_id),))
+            for row in cursor:
+                match = dict(zip(MATCH_COLUMNS, row[2:]))
+                match["radiant_win"] = bool(match["radiant_win"])
+                if row[1] is not None:
+                    match.update(json.loads(row[0] or "{}"))
+                    match.update(json.loads(row[1]))
+                yield match
+        finally:
+            conn.close()
+
+    def get_team_match_columns(self, account_ids, start_time=None, end_time=None):
+        '''
+        Query the matches played together (on the same side) by all given players,
+        optionally only with start_time >= start_time and start_time < end_time
+        Returns a MatchColumns object with the first player's participation, newest match first
+        '''
+        account_ids = [int(account_id) for account_id in account_ids]
+        query = ("SELECT m.match_id, m.start_time, p0.hero_id, p0.player_slot, m.radiant_win, "
+                 "m.game_mode, p0.kills, p0.deaths, p0.assists, m.duration "
+                 "FROM participation p0 JOIN matches m ON m.match_id = p0.match_id")
+        for idx in range(1, len(account_ids)):
+            query += (" JOIN participation p{0} ON p{0}.match_id = p0.match_id"
+                      " AND p{0}.account_id = ?"
+                      " AND (p{0}.player_slot > 127) = (p0.player_slot > 127)").format(idx)
+        query += " WHERE p0.account_id = ?"
+        params = account_ids[1:]+account_ids[:1]
+        if start_time is not None:
+            query += " AND p0.start_time >= ?"
+            params.append(int(start_time))
+        if end_time is not None:
+            query += " AND p0.start_time < ?"
+            params.append(int(end_time))
+        query += " ORDER BY p0.start_time DESC"
+        rows = self.connection().execute(query, params).fetchall()
+        columns = {}
+        for idx, (name, dtype) in enumerate(MATCH_COLUMNS.items()):
+            columns[name] = np.fromiter((row[idx] for row in rows), dtype=dtype, count=len(rows))
+        return MatchColumns(columns)
+
+    def get_match_participants(self, match_ids):
+        '''
+        Registered players of the given matches, same format as
+        DotaMatchIndex.get_match_participants (uses the participation table's match_id index)
+        '''
+        match_ids = sorted(set(int(match_id) for match_id in match_ids))
+        rows = []
+        # Stay under SQLite's limit of variables per query
+        for start in range(0, len(match_ids), SQLITE_MAX_VARIABLES):
+            chunk = match_ids[start:start+SQLITE_MAX_VARIABLES]
+            rows += self.connection().execute(
+                "SELECT pa.match_id, p.player_name, pa.account_id, pa.player_slot, pa.hero_id "
+                "FROM participation pa JOIN players p ON p.account_id = pa.account_id "
+                "WHERE pa.match_id IN ("+", ".join("?"*len(chunk))+") "
+                "ORDER BY pa.match_id", chunk).fetchall()
+        return pd.DataFrame({
+            "match_id": np.array([row[0] for row in rows], dtype=np.int64),
+            "player": [row[1].replace(" ", "_")+"_"+str(row[2]) for row in rows],
+            "player_slot": np.array([row[3] for row in rows], dtype=np.uint8),
+            "hero_id": np.array([row[4] for row in rows], dtype=np.int16),
+        }, columns=["match_id", "player", "player_slot", "hero_id"])
+
+    ################ MATCHES
+    def save_match(self, dota_match):
+        '''
+        Save DotaMatch's match_info
+        '''
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO match_details (match_id, match_info) VALUES (?, ?)",
+                         (int(dota_match.match_id),
+                          json.dumps(dota_match.match_info, ensure_ascii=False)))
+
+    def load_match(self, dota_match):
+        '''
+        Load match_info into a DotaMatch object. Returns False if the match is not stored
+        '''
+        row = self.connection().execute("SELECT match_info FROM match_details WHERE match_id = ?",
+                                        (int(dota_match.match_id),)).fetchone()
+        if not row:
+            return False
+        dota_match.match_info = json.loads(row[0])
+        return True
+
+    def has_match(self, match_id):
+        row = self.connection().execute("SELECT 1 FROM match_details WHERE match_id = ?",
+                                        (int(match_id),)).fetchone()
+        return row is not None
+
+    ################ IMPORT
+    def import_json_tree(self, dota_db_path):
+        '''
+        Import an existing JSON tree (dota_db/players/<name>_<id>/ and dota_db/matches/<id>/)
+        Returns the number of players and matches imported
+        '''
+        # Imported here since dota_player/dota_matches use DotaSQLite themselves
+        from dota_lib.dota_matches import DotaMatch
+        from dota_lib.dota_player import DotaPlayer
+
+        n_players, n_matches = 0, 0
+        players_path = os.path.join(dota_db_path, "players")
+        if os.path.isdir(players_path):
+            for player in sorted(os.listdir(players_path)):
+                player_dir = os.path.join(players_path, player)
+                if not os.path.isdir(player_dir):
+                    continue
+                dota_player = DotaPlayer()
+                dota_player.load_data([os.path.join(player_dir, file)
+                                       for file in os.listdir(player_dir)])
+                if not dota_player.account_id:
+                    logger.warning("Skipping %s, no player_info.json found", player_dir)
+                    continue
+                if dota_player.matches_as_columns:
+                    logger.warning("%s has no player_matches.json, only the match columns of its "
+                                   "matches are imported", player_dir)
+                # Keep the registered name (folder name) instead of the profile's personaname
+                dota_player.player_name = "_".join(player.split("_")[:-1])
+                self.save_player(dota_player)
+                n_players += 1
+        matches_path = os.path.join(dota_db_path, "matches")
+        if os.path.isdir(matches_path):
+            for match_id in sorted(os.listdir(matches_path)):
+                match_dir = os.path.join(matches_path, match_id)
+                if not os.path.isdir(match_dir):
+                    continue
+                dota_match = DotaMatch(match_id)
+                dota_match.load_data([os.path.join(match_dir, file)
+                                      for file in os.listdir(match_dir)])
+                if dota_match.match_info:
+                    self.save_match(dota_match)
+                    n_matches += 1
+        logger.info("Imported %s players and %s matches from %s", n_players, n_matches, dota_db_path)
+        return n_players, n_matches
@@ -3,6 +3,7 @@ DotaTeam class that groups up to 5 DotaPlayer objects to gather information abou
 the team as a whole, e.g. winrate together
 '''
 import logging
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from dota_lib.dota_player import DotaPlayer
@@ -10,11 +11,24 @@ from datetime import datetime as dtm
 
 logger = logging.getLogger(__name__)
 
+def in_sorted(sorted_values, values):
+    '''
+    Boolean mask of the values found in sorted_values (a sorted NumPy array)
+    '''
+    values = np.asarray(values)
+    if not len(sorted_values):
+        return np.zeros(len(values), dtype=bool)
+    idx = np.searchsorted(sorted_values, values)
+    return sorted_values[np.minimum(idx, len(sorted_values)-1)] == values
+
 class DotaTeam:
     '''
     DotaPlayer class to gather and analyze data from a specific player
+    If a DotaSQLite store is given, team matches are queried with a join on its
+    participation table instead of intersecting every player's matches
     '''
-    def __init__(self, dota_team=None):
+    def __init__(self, dota_team=None, store=None):
+        self.store = store
         if not dota_team:
             self.dota_team = []
             self.matches = []
@@ -87,13 +101,14 @@ class DotaTeam:
             self.winrate = self.get_team_winrate()
             logger.info("Team's winrate updated")
 
-    def get_team_simplified_matches(self):
+    def get_team_simplified_matches(self, start_time=None, end_time=None):
         '''
         Use current dota_team's players info to generate a list of matches with key information:
         - "match_id" : match ID
         - "date" : <year>-<month>-<day> in a string format
         - "side" : either 'radiant' or 'dire'
         - "win" : 0 = lose; 1 = win
+        start_time/end_time (unix timestamps) can be used to only get matches in that range
         '''
         logger.info("get_team_simplified_matches requested...")
         # If there is no dota_player, return empty list
@@ -101,24 +116,46 @@ class DotaTeam:
             logger.info("dota_team is empty, returning empty match list")
             return []
         logger.debug("Current DotaTeam: %s", [player.player_name for player in self.dota_team])
+        # Team matches straight from the store's participation table
+        if self.store and len(self.dota_team) > 1:
+            team_player = DotaPlayer(self.dota_team[0].account_id)
+            team_player.match_columns = self.store.get_team_match_columns(
+                [player.account_id for player in self.dota_team], start_time, end_time)
+            return team_player.simplified_matches()
         # Start using first player's matches as a base
-        simplified_matches = self.dota_team[0].simplified_matches()
+        simplified_matches = self.dota_team[0].simplified_matches_df(start_time=start_time,
+                                                                     end_time=end_time)
         # If only one player is available, return simplified_matches
-        if len(self.dota_team) == 1: return simplified_matches
-        # Parsing matches to get only matches as a team
-        team_matches = [(entry["match_id"], entry["side"]) for entry in simplified_matches]
-        for dota_player in self.dota_team[1:]:
-            aux_simpl_matches = dota_player.simplified_matches()
-            player_matches = [(entry["match_id"], entry["side"]) for entry in aux_simpl_matches]
-            intersection_matches = set(team_matches).intersection(set(player_matches))
-            team_matches = list(intersection_matches)
-        team_matches_id = [match[0] for match in team_matches]
-        # Reformulating simplified_matches to only consider team matches
-        simplified_matches_final = []
-        for match in simplified_matches:
-            if match["match_id"] in team_matches_id:
-                simplified_matches_final.append(match)
-        return simplified_matches_final
+        if len(self.dota_team) == 1:
+            return DotaPlayer.simplified_records(simplified_matches)
+        # Keeping only matches played as a team
+        team_matches_id = self.get_team_match_ids(start_time, end_time)
+        return DotaPlayer.simplified_records(
+            simplified_matches[in_sorted(team_matches_id, simplified_matches["match_id"].values)])
+
+    def get_team_match_keys(self, start_time=None, end_time=None):
+        '''
+        Sorted array of match_id*2 + side (0 = radiant, 1 = dire) of the "All Pick" matches
+        every player of the team played, on the same side
+        Each player's keys are sorted once and then intersected, without any Python loop
+        '''
+        team_keys = None
+        for dota_player in self.dota_team:
+            columns = dota_player.get_all_pick_columns(start_time, end_time)
+            player_keys = np.unique(np.asarray(columns.match_id, dtype=np.int64)*2 +
+                                    (columns.player_slot > 127))
+            if team_keys is None:
+                team_keys = player_keys
+            else:
+                team_keys = np.intersect1d(team_keys, player_keys, assume_unique=True)
+        return team_keys if team_keys is not None else np.array([], dtype=np.int64)
+
+    def get_team_match_ids(self, start_time=None, end_time=None):
+        '''
+        Sorted array of the match IDs every player of the team played together
+        '''
+        # A match can only be kept with one side, so match IDs are still sorted and unique
+        return self.get_team_match_keys(start_time, end_time) >> 1
 
     def get_team_simplified_matches_df(self):
         '''
@@ -183,19 +220,79 @@ class DotaTeam:
 
         return winrate, n_of_matches
 
-    def get_most_played_heroes(self, hero_dict=None):
+    def get_hero_stats(self, heroes=None, top=None):
+        '''
+        Require self.matches to be populated
+        Matches, wins and winrate of every (player, hero) over the team's matches, grouped in a
+        single pass over all players' "All Pick" matches
+        ------------------------------------------------
+        Input
+        ------------------------------------------------
+        (optional) heroes : DotaHeroes registry to translate hero ID to hero Name
+        (optional) top : only keep the top N most played heroes of each player
+        ------------------------------------------------
+        Output
+        ------------------------------------------------
+        Pandas DataFrame with columns:
+        - "player" : index of the player in self.dota_team
+        - "hero_id" / "hero" : hero ID and hero Name (or ID if heroes is not provided)
+        - "matches" / "wins" : number of matches and wins with this particular hero
+        - "winrate" : winrate %
+        Ordered by player, then by matches (ties in order of the most recent match)
+        '''
+        stats_columns = ["player", "hero_id", "hero", "matches", "wins", "winrate"]
+        if not self.matches: return pd.DataFrame(columns=stats_columns)
+        # Sorted array of all the common Matches from the Team
+        team_matches = np.sort(np.fromiter((entry["match_id"] for entry in self.matches),
+                                           dtype=np.int64, count=len(self.matches)))
+        player_idx, hero_ids, wins = [], [], []
+        for idx, dota_player in enumerate(self.dota_team):
+            columns = dota_player.get_all_pick_columns()
+            columns = columns[in_sorted(team_matches, columns.match_id)]
+            player_idx.append(np.full(len(columns), idx, dtype=np.int64))
+            hero_ids.append(np.asarray(columns.hero_id, dtype=np.int64))
+            wins.append((columns.player_slot > 127) != columns.radiant_win)
+        # One key per (player, hero), hero IDs fit in 16 bits
+        keys = np.concatenate(player_idx) << 16 | np.concatenate(hero_ids)
+        group_keys, first, inverse, matches = np.unique(keys, return_index=True,
+                                                        return_inverse=True, return_counts=True)
+        group_wins = np.bincount(inverse.ravel(), weights=np.concatenate(wins),
+                                 minlength=len(group_keys)).astype(np.int64)
+        group_player = group_keys >> 16
+        order = np.lexsort((first, -matches, group_player))
+        group_keys, matches, group_wins, group_player = \
+            group_keys[order], matches[order], group_wins[order], group_player[order]
+        if top is not None:
+            # Rank of each hero within its player's block
+            rank = np.arange(len(group_keys)) - np.searchsorted(group_player, group_player)
+            keep = rank < top
+            group_keys, matches, group_wins, group_player = \
+                group_keys[keep], matches[keep], group_wins[keep], group_player[keep]
+        group_heroes = group_keys & 0xFFFF
+        return pd.DataFrame({
+            "player": group_player,
+            "hero_id": group_heroes,
+            "hero": heroes.get_names(group_heroes) if heroes
+                    else group_heroes.astype(str).astype(object),
+            "matches": matches,
+            "wins": group_wins,
+            "winrate": 100*group_wins/matches,
+        }, columns=stats_columns)
+
+    def get_most_played_heroes(self, heroes=None, top=None):
         '''
         Require self.matches to be populated
         Returns a list of most played heroes by player
         ------------------------------------------------
         Input
         ------------------------------------------------
-        (optional) hero_dict : dictionary to translate hero ID to hero Name
+        (optional) heroes : DotaHeroes registry to translate hero ID to hero Name
+        (optional) top : only keep the top N most played heroes of each player
         ------------------------------------------------
         Output
         ------------------------------------------------
         List : same length as self.dota_team. Each entry will have:
-        - [0] hero (string) : either hero ID or hero Name depending if hero_dict is provided or not
+        - [0] hero (string) : either hero ID or hero Name depending if heroes is provided or not
         - [1] list of:
         -- [0] n_matches (integer) : number of matches with this particular hero
         -- [1] wins (integer) : number of wins with this particular hero
@@ -203,50 +300,44 @@ class DotaTeam:
         '''
         logger.info("get_most_played_heroes called")
         if not self.matches: return []
-        hero_dict = hero_dict or {}
-        most_played_heroes = []
-        # List of all the common Matches from the Team
-        team_matches = [entry["match_id"] for entry in self.matches]
-        for dota_players in self.dota_team:
-            heroes = {}
-            for match in dota_players.simplified_matches():
-                if match["match_id"] in team_matches:
-                    hero = hero_dict.get(str(match["hero"]), str(match["hero"]))
-                    if hero not in heroes: heroes[hero] = [1, 0]
-                    else: heroes[hero][0] += 1
-                    heroes[hero][1] += match["win"]
-            # Converting to list and sorting items
-            heroes = sorted(heroes.items(), key=lambda item: item[1][0], reverse=True)
-            most_played_heroes.append(heroes)
-        return most_played_heroes
+        hero_stats = self.get_hero_stats(heroes, top)
+        return [list(zip(player_stats.hero.tolist(),
+                         ([n, wins] for n, wins in zip(player_stats.matches.tolist(),
+                                                       player_stats.wins.tolist()))))
+                for player_stats in self.split_by_player(hero_stats)]
 
-    def get_most_played_heroes_df(self, hero_dict=None):
+    def get_most_played_heroes_df(self, heroes=None, top=None):
         '''
-        Require self.matches to be populated
-        Returns a list of most played heroes by player
+        Returns a list of most played heroes by player, ready to be rendered
         ------------------------------------------------
         Input
         ------------------------------------------------
-        (optional) hero_dict : dictionary to translate hero ID to hero Name
+        (optional) heroes : DotaHeroes registry to translate hero ID to hero Name
+        (optional) top : only keep the top N most played heroes of each player
         ------------------------------------------------
         Output
         ------------------------------------------------
         List of Pandas DataFrames : same length as self.dota_team. Each entry will have:
-        - pd.DataFrame(data, columns)
-        -- data : list(zip(heroes, n_matches, winrate))
-        -- columns : ["Hero", "Matches", "Winrate"]
+        -- columns : ["Hero", "Matches", "Winrate"], winrate formatted with 2 decimals
         '''
         logger.info("get_most_played_heroes_df called")
-        most_played_heroes_list = self.get_most_played_heroes(hero_dict)
-        most_played_heroes_list_df = []
-        for most_played_heroes in most_played_heroes_list:
-            heroes = [a[0] for a in most_played_heroes]
-            n_matches = [a[1][0] for a in most_played_heroes]
-            winrate = ["{:10.2f}".format(100*a[1][1]/a[1][0]) for a in most_played_heroes]
-            mph_df = pd.DataFrame(list(zip(heroes, n_matches, winrate)),
-                                  columns=["Hero", "Matches", "Winrate"])
-            most_played_heroes_list_df.append(mph_df)
-        return most_played_heroes_list_df
+        hero_stats = self.get_hero_stats(heroes, top)
+        hero_stats = pd.DataFrame({
+            "player": hero_stats.player,
+            "Hero": hero_stats.hero,
+            "Matches": hero_stats.matches,
+            "Winrate": hero_stats.winrate.map("{:10.2f}".format),
+        })
+        return [player_stats[["Hero", "Matches", "Winrate"]].reset_index(drop=True)
+                for player_stats in self.split_by_player(hero_stats)]
+
+    def split_by_player(self, hero_stats):
+        '''
+        Split a get_hero_stats DataFrame (ordered by player) into one DataFrame per player
+        '''
+        bounds = np.searchsorted(hero_stats.player.values.astype(np.int64),
+                                 np.arange(len(self.dota_team)+1))
+        return [hero_stats.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
 
     def get_winrate_fig(self):
         '''
@@ -273,15 +364,20 @@ class DotaTeam:
     def get_monthly_matches_df(self, date):
         '''
         Returns a Pandas DataFrame with matches details on a particular month
+        Only the players' partitions of that month are read
         '''
-        sdf = self.get_team_simplified_matches_df()
-        if sdf.empty:
-            return sdf
-
-        date_flt = str(date.year)+"-"+str(date.month)
+        month_start = dtm(date.year, date.month, 1)
+        if date.month == 12:
+            month_end = dtm(date.year+1, 1, 1)
+        else:
+            month_end = dtm(date.year, date.month+1, 1)
+        matches_month = pd.DataFrame(
+            self.get_team_simplified_matches(month_start.timestamp(), month_end.timestamp()))
+        if matches_month.empty:
+            return matches_month
 
-        matches_month = sdf.loc[date_flt][['match_id', 'side', 'win']]
-        matches_month.index = matches_month.index.strftime("%Y-%m-%d")
+        matches_month.index = matches_month.date.dt.strftime("%Y-%m-%d")
+        matches_month = matches_month[['match_id', 'side', 'win']].copy()
         matches_month["date"] = matches_month.index
 
         return matches_month
@@ -1,14 +1,24 @@
 '''
 Management of files using DotaPlayer and DotaTeam objects
 '''
-import json
 import logging
 import os
 import pandas as pd
 import plotly.graph_objects as go
 import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime as dtm
+from dota_lib.dota_catalog import DotaCatalog
+from dota_lib.dota_client import get_client
+from dota_lib.dota_downloader import DotaMatchDownloader
+from dota_lib.dota_heroes import get_heroes
+from dota_lib.dota_journal import DotaIngestJournal
+from dota_lib.dota_match_index import DotaMatchIndex
+from dota_lib.dota_planner import DotaRefreshPlanner, REFRESH_REQUEST_BUDGET
 from dota_lib.dota_player import DotaPlayer
+from dota_lib.dota_sqlite import DotaSQLite
 from dota_lib.dota_team import DotaTeam
 
 logger = logging.getLogger(__name__)
@@ -16,17 +26,126 @@ cwd = os.getcwd()
 PLAYER_DIR_PATH = os.path.join(cwd, 'dota_db', 'players')
 DOTA_DB = os.path.join(cwd, "dota_db")
 DOTA_DB_PLAYERS = os.path.join(DOTA_DB, "players")
+DOTA_DB_MATCHES = os.path.join(DOTA_DB, "matches")
+DOTA_DB_SQLITE = os.path.join(DOTA_DB, "dota_db.sqlite")
 
-with open(os.path.join(cwd, "dota_db", "heroes", "heroes_dict.json")) as content:
-    heroes_dict = json.load(content)
+# Number of players updated concurrently by update_all
+UPDATE_ALL_WORKERS = 4
 
-def get_dota_player(player):
-    player_dir = os.path.join(PLAYER_DIR_PATH, player)
+# Max OpenDota requests spent by update_all (DOTA_REFRESH_BUDGET=0 for no limit)
+REFRESH_BUDGET = int(os.environ.get("DOTA_REFRESH_BUDGET", REFRESH_REQUEST_BUDGET)) or None
+
+# Most played heroes shown per player in the team page
+MOST_PLAYED_HEROES_TOP = 15
+MOST_PLAYED_HEROES_COLUMNS = ["Hero", "Matches", "Winrate"]
+
+# Storage backend: "json" (dota_db/players/<name>_<id>/ tree, default) or "sqlite"
+DOTA_DB_BACKEND = os.environ.get("DOTA_DB_BACKEND", "json").lower()
+dota_db_store = DotaSQLite(DOTA_DB_SQLITE) if DOTA_DB_BACKEND == "sqlite" else None
+
+# Checkpoints of player downloads and update_all runs, to resume them if interrupted
+ingest_journal = DotaIngestJournal(os.path.join(DOTA_DB, "journal"))
+
+# Inverted index match_id -> registered players (kept up to date by register_player)
+match_index = DotaMatchIndex(DOTA_DB_PLAYERS)
+
+# Hero registry (hero ID <-> hero Name lookup tables), built once from heroes.json
+heroes = get_heroes()
+
+def get_player_dir(player):
+    return os.path.join(PLAYER_DIR_PATH, player)
+
+def get_player_account_id(player):
+    return player.split("_")[-1]
+
+def get_player_data_version(player):
+    '''
+    Data version of a stored player: the signature (file name, mtime, size) of its directory
+    or, with the SQLite backend, its version counter
+    '''
+    if dota_db_store:
+        return dota_db_store.get_player_version(get_player_account_id(player))
+    signature = []
+    with os.scandir(get_player_dir(player)) as entries:
+        for entry in entries:
+            stat = entry.stat()
+            signature.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(signature))
+
+def load_dota_player(player):
+    '''
+    Load a DotaPlayer from the current backend (JSON tree or SQLite)
+    '''
+    if dota_db_store:
+        dota_player = DotaPlayer(get_player_account_id(player))
+        dota_player.load_data(dota_db_store)
+        return dota_player
+    player_dir = get_player_dir(player)
     dota_player_files = [os.path.join(player_dir, file) for file in os.listdir(player_dir)]
     dota_player = DotaPlayer()
     dota_player.load_data(dota_player_files)
     return dota_player
 
+class DotaPlayerCache:
+    '''
+    Bounded LRU cache of loaded DotaPlayer objects, keyed by player ("<name>_<id>" directory).
+    An entry is reloaded whenever the player's data version changes
+    '''
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get(self, player):
+        '''
+        Returns the DotaPlayer for player, loading it only if it is not cached
+        or if its data changed since it was cached
+        '''
+        version = get_player_data_version(player)
+        with self._lock:
+            cached = self._cache.get(player)
+            if cached and cached[0] == version:
+                self._cache.move_to_end(player)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        dota_player = load_dota_player(player)
+        with self._lock:
+            self._cache[player] = (version, dota_player)
+            self._cache.move_to_end(player)
+            while len(self._cache) > self.max_size:
+                evicted, _ = self._cache.popitem(last=False)
+                logger.debug("DotaPlayerCache: %s evicted", evicted)
+        return dota_player
+
+    def invalidate(self, player=None):
+        '''
+        Drop player from the cache (or the whole cache if player is None)
+        '''
+        with self._lock:
+            if player is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(player, None)
+
+    def stats(self):
+        '''
+        Returns a dict with the cache's hits, misses and current size
+        '''
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._cache), "max_size": self.max_size}
+
+dota_player_cache = DotaPlayerCache()
+
+def get_dota_player(player):
+    return dota_player_cache.get(player)
+
 def get_dota_team(dota_team):
     dota_team_obj = []
 
@@ -35,12 +154,140 @@ def get_dota_team(dota_team):
         dota_player = get_dota_player(player)
         dota_team_obj.append(dota_player)
 
-    return DotaTeam(dota_team_obj)
+    return DotaTeam(dota_team_obj, store=dota_db_store)
+
+class DotaTeamCache:
+    '''
+    Bounded LRU cache of DotaTeam results, keyed by the frozenset of player directories.
+    Each entry remembers the data version of its players and is recomputed when any of them changes
+    Cached results (dict):
+    - "team" : DotaTeam object
+    - "matches" : team's simplified matches
+    - "winrate" : team's winrate %
+    - "radiant" / "dire" : (winrate %, number of matches) per side
+    - "most_played_heroes" : dict of player -> top MOST_PLAYED_HEROES_TOP heroes Pandas DataFrame
+    - "winrate_fig" : plotly figure with the monthly winrate
+    '''
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        self._key_locks = {}
+
+    def get(self, dota_team):
+        '''
+        Returns the cached results for dota_team (list of player directories)
+        '''
+        key = frozenset(dota_team)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # Callbacks for the same team usually fire together, so only one of them computes
+        with key_lock:
+            versions = {player: get_player_data_version(player) for player in key}
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached and cached[0] == versions:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return cached[1]
+                self.misses += 1
+            results = self.compute(sorted(key))
+            with self._lock:
+                self._cache[key] = (versions, results)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.max_size:
+                    evicted, _ = self._cache.popitem(last=False)
+                    self._key_locks.pop(evicted, None)
+        return results
+
+    @staticmethod
+    def compute(dota_team):
+        '''
+        Build the DotaTeam and compute all results used by the team page
+        '''
+        dota_team_obj = get_dota_team(dota_team)
+        most_played_heroes = dict(zip(dota_team, dota_team_obj.get_most_played_heroes_df(
+            heroes, top=MOST_PLAYED_HEROES_TOP)))
+        return {
+            "team": dota_team_obj,
+            "matches": dota_team_obj.matches,
+            "winrate": dota_team_obj.get_team_winrate(),
+            "radiant": dota_team_obj.get_team_radiant_winrate_matches(),
+            "dire": dota_team_obj.get_team_dire_winrate_matches(),
+            # Players without team matches get an empty table
+            "most_played_heroes": {player: most_played_heroes.get(
+                player, pd.DataFrame(columns=MOST_PLAYED_HEROES_COLUMNS)) for player in dota_team},
+            "winrate_fig": dota_team_obj.get_winrate_fig(),
+        }
+
+    def stats(self):
+        '''
+        Returns a dict with the cache's hits, misses and current size
+        '''
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._cache), "max_size": self.max_size}
+
+dota_team_cache = DotaTeamCache()
+
+def get_team_results(dota_team):
+    return dota_team_cache.get(dota_team)
+
+def get_catalog():
+    '''
+    Returns the players' catalog: dict of "<name>_<id>" -> summary
+    (account_id, player_name, last_updated, matches, first_match, last_match, data_version)
+    '''
+    if dota_db_store:
+        return dota_db_store.get_catalog()
+    catalog = DotaCatalog(DOTA_DB_PLAYERS)
+    if not catalog.exists():
+        return rebuild_catalog()
+    return catalog.load()
+
+def rebuild_catalog():
+    '''
+    Rebuild catalog.json by loading every player folder (only needed once, or if folders
+    were added/removed by hand)
+    '''
+    available_players = [player for player in os.listdir(PLAYER_DIR_PATH)
+                         if os.path.isdir(get_player_dir(player))]
+    return DotaCatalog(DOTA_DB_PLAYERS).rebuild(
+        {player: get_dota_player(player) for player in available_players})
+
+def get_match_index():
+    '''
+    Returns the index of which registered players played each match: the SQLite store
+    (participation table) or match_index, built on first use or when it misses players
+    '''
+    if dota_db_store:
+        return dota_db_store
+    # Also rebuilt if players were saved without going through register_player
+    if not match_index.exists() or \
+            set(get_catalog()) - set(match_index.load()["players"].tolist()):
+        rebuild_match_index()
+    return match_index
+
+def rebuild_match_index():
+    '''
+    Rebuild match_index.npz by loading every registered player (only needed once, or if
+    folders were added/removed by hand)
+    '''
+    match_index.rebuild({player: get_dota_player(player) for player in get_catalog()})
+
+def download_team_matches(dota_team, progress=None):
+    '''
+    Download every match the players of dota_team (list of "<name>_<id>") played together
+    and that is not stored yet, see DotaMatchDownloader.download for the returned report
+    '''
+    team = get_dota_team(dota_team)
+    downloader = DotaMatchDownloader(dota_db_store or DOTA_DB_MATCHES)
+    return downloader.download(downloader.get_team_match_ids(team), progress=progress)
 
 def get_available_players():
-    available_players = os.listdir(PLAYER_DIR_PATH)
-    if ".gitignore" in available_players:
-        available_players.remove(".gitignore")
+    available_players = sorted(get_catalog())
     if available_players:
         return available_players
     else:
@@ -53,28 +300,112 @@ def get_available_dota_players():
         dota_players.append(get_dota_player(player))
     return dota_players
 
-def register_player(player_id, player_name):
-    dota_player = DotaPlayer(player_id, player_name)
-    if not dota_player.get_all(): return
-    dota_player.save_data(DOTA_DB_PLAYERS, overwrite_data=True)
+def get_registered_player(player_id, player_name=""):
+    '''
+    Returns the "<name>_<id>" key of an already registered player, or None
+    '''
+    catalog = get_catalog()
+    if player_name:
+        player = player_name.replace(" ", "_")+"_"+str(player_id)
+        return player if player in catalog else None
+    for player, entry in catalog.items():
+        if entry.get("account_id") == str(player_id):
+            return player
+    return None
+
+def register_player(player_id, player_name, incremental=True):
+    '''
+    Query and save all data from a player, returns True if successful
+    If the player is already registered and incremental is True, its stored data is
+    loaded and only the matches newer than the stored ones are queried
+    Endpoints are checkpointed in ingest_journal, so a failed attempt can be retried
+    without querying again what it already got
+    '''
+    player = get_registered_player(player_id, player_name) if incremental else None
+    if player:
+        dota_player = load_dota_player(player)
+        # Keep the name used when registering (and so the player's folder)
+        dota_player.player_name = "_".join(player.split("_")[:-1])
+    else:
+        dota_player = DotaPlayer(player_id, player_name)
+    if not dota_player.get_all(stream_matches=True, incremental=bool(player),
+                               journal=ingest_journal): return False
+    dota_player.save_data(dota_db_store or DOTA_DB_PLAYERS, overwrite_data=True)
+    ingest_journal.complete_player(dota_player.account_id)
+    player = dota_player.player_name.replace(" ", "_")+"_"+str(dota_player.account_id)
+    dota_player_cache.invalidate(player)
+    if not dota_db_store:
+        # Skipped while there is no index yet, get_match_index then builds it from every player
+        match_index.update_player(player, dota_player)
+    return True
+
+def get_refresh_plan(budget=REFRESH_BUDGET):
+    '''
+    Plan of update_all: registered players ordered by staleness and activity,
+    truncated to the given budget of OpenDota requests (see DotaRefreshPlanner)
+    '''
+    return DotaRefreshPlanner(budget).plan(get_catalog())
 
-def update_all(queue=None):
-    update_all_thread = threading.Thread(target=update_all_t, kwargs={'queue':queue})
+def update_all(queue=None, max_workers=UPDATE_ALL_WORKERS, budget=REFRESH_BUDGET):
+    update_all_thread = threading.Thread(target=update_all_t,
+                                         kwargs={'queue':queue, 'max_workers':max_workers,
+                                                 'budget':budget})
     update_all_thread.start()
 
-def update_all_t(queue=None):
-    available_players = get_available_players()
+def update_player(player):
+    '''
+    Update a registered player given its "<name>_<id>" key, returns True if successful
+    '''
+    split = player.split("_")
+    id = split[-1]
+    name = "_".join(split[:-1])
+    try:
+        return register_player(id, name)
+    except Exception:
+        logger.exception("Error updating player %s", player)
+        return False
+
+def update_all_t(queue=None, max_workers=UPDATE_ALL_WORKERS, budget=REFRESH_BUDGET):
+    '''
+    Update registered players concurrently with a bounded pool of threads
+    (every request goes through the shared OpenDota client and its rate limiter)
+    Players are updated following get_refresh_plan(budget): stalest first, and only
+    as many as the budget of requests allows
+    An interrupted run is resumed: players it already updated are not updated again
+    Progress is reported through queue:
+    - int : overall progress %
+    - ("player", <player>, "done"|"failed") : each player as it finishes
+    - ("status", "finished") : at the end
+    '''
+    plan = get_refresh_plan(budget)
+    logger.info("update_all plan:\n%s", plan.format())
+    done_players = ingest_journal.start_run()
+    available_players = [player for player in plan if player not in done_players]
+    started = time.time()
     progress_aux_old = 0
+    failed_players = []
     available_players_length = len(available_players)
-    for idx, players in enumerate(available_players):
-        split = players.split("_")
-        id = split[-1]
-        name = "_".join(split[:-1])
-        register_player(id, name)
-        progress_aux = int((100 * idx) / available_players_length)
-        if progress_aux > progress_aux_old and progress_aux <= 100:
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(update_player, player): player for player in available_players}
+        for idx, future in enumerate(as_completed(futures), start=1):
+            player = futures[future]
+            status = "done" if future.result() else "failed"
+            if status == "done":
+                ingest_journal.player_done(player)
+            else:
+                failed_players.append(player)
+            logger.info("update_all: %s %s (%s/%s)", player, status, idx, available_players_length)
             if queue:
-                queue.put(progress_aux)
-            progress_aux_old = progress_aux
+                queue.put(("player", player, status))
+            progress_aux = int((100 * idx) / available_players_length)
+            if progress_aux > progress_aux_old and progress_aux <= 100:
+                if queue:
+                    queue.put(progress_aux)
+                progress_aux_old = progress_aux
+    logger.info("update_all: %s players updated in %.1fs", available_players_length,
+                time.time() - started)
+    if not failed_players:
+        ingest_journal.finish_run()
+    get_client().log_stats()
     if queue:
         queue.put(("status", "finished"))
@@ -1,11 +1,12 @@
 import argparse
 import logging
 import os
+import sys
 import time
-import tkinter as tk
-from tkinter import filedialog
+from concurrent.futures import ThreadPoolExecutor
 from dota_lib.dota_player import DotaPlayer
 from dota_lib.dota_matches import DotaMatch
+from dota_lib.dota_sqlite import DotaSQLite
 
 # Logging information
 TIME_TAG = time.strftime("%Y_%m_%d-%H_%M_%S")
@@ -19,8 +20,51 @@ logging.basicConfig(filename=logName,
 # Static paths
 CWD = os.getcwd()
 DOTA_DB = os.path.join(CWD, "dota_db")
-DOTA_DB_PLAYERS = os.path.join(DOTA_DB, "players")
 DOTA_DB_MATCHES = os.path.join(DOTA_DB, "matches")
+DOTA_DB_SQLITE = os.path.join(DOTA_DB, "dota_db.sqlite")
+
+# Number of players/matches ingested concurrently in batch mode
+BATCH_WORKERS = 4
+
+def read_batch(batch_file):
+    '''
+    Read a batch file ("-" for stdin): one ID per line, optionally followed by a name
+    (player batches only). Empty lines, comments (#) and repeated IDs are ignored
+    Returns a list of (id, name)
+    '''
+    content = sys.stdin if batch_file == "-" else open(batch_file)
+    with content:
+        items = {}
+        for line in content:
+            fields = line.split("#")[0].replace(",", " ").split(maxsplit=1)
+            if fields and fields[0] not in items:
+                items[fields[0]] = fields[1].strip() if len(fields) > 1 else ""
+    return list(items.items())
+
+def run_batch(items, ingest, max_workers=BATCH_WORKERS):
+    '''
+    Call ingest(id, name) for every item of a batch concurrently, printing the time taken by
+    each of them and by the whole batch. Returns the number of failed items
+    '''
+    def timed_ingest(item):
+        started = time.perf_counter()
+        try:
+            success = ingest(*item)
+        except Exception:
+            logging.exception("Error ingesting %s", item[0])
+            success = False
+        return item[0], success, time.perf_counter() - started
+
+    started = time.perf_counter()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for item_id, success, elapsed in executor.map(timed_ingest, items):
+            failed += not success
+            print(f"{item_id}: {'OK' if success else 'FAILED'} ({elapsed:.2f}s)")
+    elapsed = time.perf_counter() - started
+    print(f"{len(items)} items in {elapsed:.2f}s ({len(items)/elapsed if elapsed else 0:.2f}/s), "
+          f"{failed} failed")
+    return failed
 
 def main():
     parser = argparse.ArgumentParser()
@@ -28,30 +72,75 @@ def main():
     group.add_argument('-new', help="get info from a new user for a given account_id")
     group.add_argument('-load', help="load player data", action='store_true')
     group.add_argument('-new_match', help="get info from a new match for a given match_id")
+    group.add_argument('-import_sqlite', help="import the JSON dota_db tree into "+DOTA_DB_SQLITE,
+                       action='store_true')
+    group.add_argument('-team_matches', help="download all matches a team played together, "
+                       "given its players as comma-separated <name>_<id> (see dota_db/players)")
+    group.add_argument('-plan', help="show which players \"update all\" would refresh, in order",
+                       action='store_true')
+    group.add_argument('-batch_players', metavar="FILE", help="register/update every account_id "
+                       "(optionally followed by a name) listed in FILE, \"-\" for stdin")
+    group.add_argument('-batch_matches', metavar="FILE", help="get info from every match_id "
+                       "listed in FILE, \"-\" for stdin")
 
     parser.add_argument('-name', help="player's name")
+    parser.add_argument('-workers', type=int, default=BATCH_WORKERS,
+                        help="items ingested concurrently in batch mode")
+    parser.add_argument('-budget', type=int,
+                        help="max OpenDota requests for -plan (0 for no limit)")
 
     args = parser.parse_args()
     if args.name: player_name = args.name
     else: player_name = "Player_"+TIME_TAG
 
     if args.load:
+        # tkinter is only needed (and available) for the interactive file dialog
+        import tkinter as tk
+        from tkinter import filedialog
+        tk.Tk().withdraw()
         dota_player_files = filedialog.askopenfilenames(
-            filetypes=(("Dota Player JSON data", ".json"),),
+            filetypes=(("Dota Player JSON data", ".json .gz"),),
             title="Select the Dota Player's JSON Data you want to load")
         dota_player = DotaPlayer()
         dota_player.load_data(dota_player_files)
     elif args.new:
+        from dotanalysis_control import dta
         account_id = str(args.new).replace("None","")
-        dota_player = DotaPlayer(account_id, player_name)
-        if not dota_player.get_all(): print("Failed to get player info")
-        dota_player.save_data(DOTA_DB_PLAYERS, overwrite_data=True)
+        # Saved through dta, which also keeps the catalog and match index up to date
+        if not dta.register_player(account_id, player_name, incremental=False):
+            print("Failed to get player info")
     elif args.new_match:
         match_id = str(args.new_match).replace("None","")
         dota_match = DotaMatch(match_id)
         if not dota_match.get_match_info(): print("Failed to get match info")
         dota_match.save_data(DOTA_DB_MATCHES)
+    elif args.import_sqlite:
+        n_players, n_matches = DotaSQLite(DOTA_DB_SQLITE).import_json_tree(DOTA_DB)
+        print(f"Imported {n_players} players and {n_matches} matches into {DOTA_DB_SQLITE}")
+    elif args.team_matches:
+        from dotanalysis_control import dta
+        report = dta.download_team_matches(args.team_matches.split(","))
+        print(f"{report['requested']} team matches: {report['skipped']} already stored, "
+              f"{report['downloaded']} downloaded, {len(report['failed'])} failed")
+        print(f"{report['elapsed']:.1f}s, {report['matches_per_second']:.2f} matches/s, "
+              f"{report['bytes']/1024:.0f} KB received")
+    elif args.batch_players:
+        from dotanalysis_control import dta
+        failed = run_batch(read_batch(args.batch_players), dta.register_player, args.workers)
+        sys.exit(1 if failed else 0)
+    elif args.batch_matches:
+        from dota_lib.dota_downloader import DotaMatchDownloader
+        from dotanalysis_control import dta
+        # Same store as the app (DOTA_DB_BACKEND=sqlite keeps matches in DOTA_DB_SQLITE)
+        downloader = DotaMatchDownloader(dta.dota_db_store or DOTA_DB_MATCHES)
+        def ingest_match(match_id, _):
+            return downloader.is_stored(match_id) or downloader.download_match(match_id)
+        failed = run_batch(read_batch(args.batch_matches), ingest_match, args.workers)
+        sys.exit(1 if failed else 0)
+    elif args.plan:
+        from dotanalysis_control import dta
+        budget = dta.REFRESH_BUDGET if args.budget is None else (args.budget or None)
+        print(dta.get_refresh_plan(budget))
 
 if __name__ == "__main__":
-    tk.Tk().withdraw()
     main()
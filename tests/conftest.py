@@ -0,0 +1,10 @@
+'''
+Shared fixtures of the tests
+'''
+import pytest
+
+@pytest.fixture
+def players_path(tmp_path):
+    path = tmp_path / "players"
+    path.mkdir()
+    return str(path)
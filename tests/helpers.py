@@ -0,0 +1,129 @@
+'''
+OpenDota-like matches and DotaPlayer objects built in memory, shared by the tests
+'''
+import json
+import time
+import requests
+from dota_lib.dota_player import DotaPlayer
+
+def make_match(match_id, start_time, hero_id=1, player_slot=0, radiant_win=True,
+               game_mode=22, **fields):
+    '''
+    One entry of https://api.opendota.com/api/players/<account_id>/matches
+    '''
+    match = {
+        "match_id": match_id,
+        "player_slot": player_slot,
+        "radiant_win": radiant_win,
+        "duration": 2000,
+        "game_mode": game_mode,
+        "lobby_type": 7,
+        "hero_id": hero_id,
+        "start_time": start_time,
+        "version": 21,
+        "kills": 5,
+        "deaths": 3,
+        "assists": 10,
+        "skill": None,
+        "leaver_status": 0,
+        "party_size": 2,
+    }
+    match.update(fields)
+    return match
+
+def make_player(account_id, player_name, matches):
+    dota_player = DotaPlayer(account_id, player_name)
+    dota_player.player_info = {"profile": {"account_id": account_id, "personaname": player_name}}
+    dota_player.player_matches = matches
+    return dota_player
+
+class FakeResponse:
+    '''
+    Response-like object of FakeOpenDota
+    '''
+    def __init__(self, url, payload, status_code=200):
+        self.url = url
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode('utf-8')
+        self.text = self.content.decode('utf-8')
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start+chunk_size]
+
+class FakeOpenDota:
+    '''
+    OpenDotaClient stand-in answering players/<id>/matches (with date/limit/offset) from
+    a dict of account_id -> matches, and players/<id>, players/<id>/wardmap and
+    players/<id>/wordcloud with fixed payloads. Endpoints listed in failing answer 500.
+    Requests are recorded as (path, params)
+    '''
+    def __init__(self, matches=None, now=None):
+        self.matches = matches or {}
+        self.now = now or int(time.time())
+        self.failing = set()
+        self.requests = []
+
+    def get(self, path, params=None, stream=False, timeout=None):
+        params = params or {}
+        self.requests.append((path, dict(params)))
+        parts = path.rstrip("/").split("/")
+        if parts[-1] in ("matches", "wardmap", "wordcloud"):
+            endpoint, account_id = parts[-1], int(parts[-2])
+        else:
+            endpoint, account_id = "player_info", int(parts[-1])
+        if endpoint in self.failing:
+            return FakeResponse(path, {}, 500)
+        if endpoint == "player_info":
+            return FakeResponse(path, {"profile": {"account_id": account_id,
+                                                   "personaname": "player"+str(account_id)}})
+        if endpoint == "wardmap":
+            return FakeResponse(path, {"obs": {"70": {"80": account_id}}, "sen": {}})
+        if endpoint == "wordcloud":
+            return FakeResponse(path, {"my_word_counts": {"gg": account_id}})
+        matches = self.matches.get(account_id, [])
+        if "date" in params:
+            matches = [match for match in matches
+                       if match["start_time"] >= self.now - params["date"]*86400]
+        if "limit" in params:
+            offset = params.get("offset", 0)
+            matches = matches[offset:offset+params["limit"]]
+        return FakeResponse(path, matches)
+
+    def get_endpoints(self):
+        '''
+        Endpoints queried so far, in order
+        '''
+        endpoints = []
+        for path, _ in self.requests:
+            last = path.rstrip("/").split("/")[-1]
+            endpoints.append(last if not last.isdigit() else "player_info")
+        return endpoints
+
+    def iter_content(self, response, chunk_size):
+        return response.iter_content(chunk_size)
+
+def make_response(status_code=200, body=b"{}", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers.update(headers or {})
+    response.encoding = "utf-8"
+    return response
+
+class FakeSession:
+    '''
+    requests.Session stand-in answering with the given responses in order
+    (a response can be an exception to raise)
+    '''
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, params=None, stream=False, timeout=None, headers=None):
+        self.requests.append({"url": url, "params": params, "headers": dict(headers or {})})
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        response.url = url
+        return response
@@ -0,0 +1,110 @@
+import itertools
+import pytest
+from dota_lib import dota_cache
+from dota_lib.dota_cache import DotaResponseCache
+from dota_lib.dota_client import OPENDOTA_API, OpenDotaClient
+from tests.helpers import FakeSession, make_response
+
+class FakeTime:
+    '''
+    Clock advancing one second per call, so every access has its own time
+    '''
+    def __init__(self):
+        self.counter = itertools.count(1000)
+
+    def time(self):
+        return next(self.counter)
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(dota_cache, "time", FakeTime())
+    return str(tmp_path / "http_cache")
+
+def put(cache, url, body, endpoint="players/<id>", headers=None):
+    url, key = cache.get_key(url)
+    cache.put(key, url, endpoint, make_response(200, body, headers))
+    return key
+
+def test_put_and_get(cache_dir):
+    cache = DotaResponseCache(cache_dir)
+    key = put(cache, "https://api.opendota.com/api/players/1", b"{}", headers={"ETag": "W/1"})
+    entry = cache.get(key)
+    assert entry["body"] == b"{}" and entry["headers"] == {"ETag": "W/1"}
+    assert cache.get_response(entry).json() == {}
+    # The index is read back from disk by other instances
+    assert DotaResponseCache(cache_dir).get(key)["body"] == b"{}"
+    assert cache.get(cache.get_key("https://api.opendota.com/api/players/2")[1]) is None
+
+def test_ttl_per_endpoint(cache_dir):
+    cache = DotaResponseCache(cache_dir, ttl={"players/<id>": 10, "heroes": 100})
+    assert cache.get_ttl("players/<id>") == 10
+    assert cache.get_ttl("heroes") == 100
+    # Endpoints without a TTL are not cached
+    assert cache.get_ttl("players/<id>/matches") == 0
+    key = put(cache, "https://api.opendota.com/api/players/1/matches", b"[]",
+              endpoint="players/<id>/matches")
+    assert cache.get(key) is None
+
+    key = put(cache, "https://api.opendota.com/api/players/1", b"{}")
+    entry = cache.get(key)
+    assert cache.is_fresh(entry)
+    entry["stored_at"] -= 10
+    assert not cache.is_fresh(entry)
+
+def test_touch_makes_entry_fresh(cache_dir):
+    cache = DotaResponseCache(cache_dir, ttl={"players/<id>": 10})
+    key = put(cache, "https://api.opendota.com/api/players/1", b"{}")
+    cache.index[key]["stored_at"] -= 100
+    assert not cache.is_fresh(cache.get(key))
+    cache.touch(key)
+    assert cache.is_fresh(cache.get(key))
+    assert cache.is_fresh(DotaResponseCache(cache_dir, ttl={"players/<id>": 10}).get(key))
+
+def test_evict_least_recently_used(cache_dir):
+    cache = DotaResponseCache(cache_dir, max_size=25)
+    first = put(cache, "https://api.opendota.com/api/players/1", b"1"*10)
+    second = put(cache, "https://api.opendota.com/api/players/2", b"2"*10)
+    # Reading the first entry makes the second one the least recently used
+    assert cache.get(first)
+    third = put(cache, "https://api.opendota.com/api/players/3", b"3"*10)
+    assert cache.get(second) is None
+    assert cache.get(first) and cache.get(third)
+    assert cache.stats() == {"entries": 2, "size": 20, "max_size": 25}
+    assert sorted(DotaResponseCache(cache_dir).index) == sorted([first, third])
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+################ THROUGH OpenDotaClient
+def make_client(cache, *responses):
+    client = OpenDotaClient(cache=cache)
+    client.session = FakeSession(*responses)
+    return client
+
+def test_cache_revalidated_with_etag(tmp_path):
+    cache = DotaResponseCache(str(tmp_path / "http_cache"), ttl={"heroes": 60})
+    client = make_client(cache, make_response(200, b'[{"id": 1}]', headers={"ETag": 'W/"1"'}),
+                         make_response(304))
+    assert client.get("heroes").json() == [{"id": 1}]
+
+    # Fresh: answered from the cache, without any request
+    response = client.get("heroes")
+    assert response.from_cache and response.json() == [{"id": 1}]
+    assert len(client.session.requests) == 1
+
+    # Stale: revalidated, the server answers 304 and the cached body is used
+    key = cache.get_key(OPENDOTA_API+"heroes")[1]
+    cache.index[key]["stored_at"] -= 120
+    assert client.get("heroes").json() == [{"id": 1}]
+    assert client.session.requests[1]["headers"] == {"If-None-Match": 'W/"1"'}
+    assert cache.is_fresh(cache.get(key))
+    stats = client.stats()["heroes"]
+    assert (stats["requests"], stats["cache_hits"], stats["revalidated"]) == (2, 2, 1)
+
+def test_streamed_requests_skip_cache(tmp_path):
+    cache = DotaResponseCache(str(tmp_path / "http_cache"), ttl={"players": 60})
+    client = make_client(cache, make_response(200, b"[]"), make_response(200, b"[]"))
+    client.get("players/42/matches", stream=True)
+    client.get("players/42/matches", stream=True)
+    assert len(client.session.requests) == 2
+    assert cache.stats()["entries"] == 0
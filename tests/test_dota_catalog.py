@@ -0,0 +1,24 @@
+from dota_lib.dota_catalog import DotaCatalog
+from tests.helpers import make_match, make_player
+
+def get_player(account_id, name, n_matches):
+    return make_player(account_id, name, [make_match(100+idx, 1600000000-86400*idx)
+                                          for idx in range(n_matches)])
+
+def test_update_player_needs_a_catalog(players_path):
+    catalog = DotaCatalog(players_path)
+    # A catalog created from a single entry would hide every other player folder
+    assert not catalog.update_player("ana_1", get_player(1, "ana", 2))
+    assert not catalog.exists()
+
+    catalog.rebuild({"ana_1": get_player(1, "ana", 2), "zed_2": get_player(2, "zed", 0)})
+    assert catalog.update_player("zed_2", get_player(2, "zed", 3))
+    entries = catalog.load()
+    assert sorted(entries) == ["ana_1", "zed_2"]
+    assert entries["zed_2"]["matches"] == 3 and entries["zed_2"]["data_version"] == 2
+    assert entries["ana_1"]["matches"] == 2 and entries["ana_1"]["data_version"] == 1
+
+def test_save_data_without_catalog(players_path):
+    for account_id, name in ((1, "a"), (2, "b"), (3, "c")):
+        get_player(account_id, name, 2).save_data(players_path)
+    assert not DotaCatalog(players_path).exists()
@@ -0,0 +1,60 @@
+import requests
+import pytest
+from dota_lib import dota_client
+from dota_lib.dota_client import OPENDOTA_API, OpenDotaClient, TokenBucket
+from tests.helpers import FakeSession, make_response
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(dota_client.time, "sleep", sleeps.append)
+    return sleeps
+
+def make_client(*responses, **kwargs):
+    client = OpenDotaClient(backoff_base=0, **kwargs)
+    client.session = FakeSession(*responses)
+    return client
+
+@pytest.mark.parametrize("path, endpoint", [
+    ("heroes", "heroes"),
+    ("players/42/matches", "players/<id>/matches"),
+    (OPENDOTA_API+"matches/6500000000", "matches/<id>"),
+    (OPENDOTA_API+"players/42?significant=0", "players/<id>"),
+])
+def test_get_endpoint(path, endpoint):
+    assert OpenDotaClient.get_endpoint(OpenDotaClient.get_url(path)) == endpoint
+
+def test_retries_honor_retry_after(sleeps):
+    client = make_client(make_response(429, headers={"Retry-After": "7"}),
+                         make_response(503), make_response(200, b'{"ok": true}'))
+    response = client.get("players/42")
+    assert response.json() == {"ok": True}
+    assert client.session.requests[0]["url"] == OPENDOTA_API+"players/42"
+    assert sleeps == [7.0, 0.0]
+    stats = client.stats()["players/<id>"]
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (3, 2, 2)
+
+def test_gives_up_after_max_retries(sleeps):
+    client = make_client(*[make_response(500) for _ in range(3)], max_retries=2)
+    assert client.get("heroes").status_code == 500
+    assert len(client.session.requests) == 3 and len(sleeps) == 2
+
+    client = make_client(*[requests.ConnectionError("down") for _ in range(2)], max_retries=1)
+    assert client.get("heroes") is None
+    assert client.stats()["heroes"]["errors"] == 2
+
+def test_not_retried_on_client_error(sleeps):
+    client = make_client(make_response(404))
+    assert client.get("matches/1").status_code == 404
+    assert sleeps == []
+
+def test_backoff_is_capped():
+    client = OpenDotaClient(backoff_base=1.0, backoff_max=5.0)
+    assert all(0 <= client.get_backoff(attempt) <= 5.0 for attempt in range(10))
+    assert client.get_backoff(0, make_response(429, headers={"Retry-After": "60"})) == 5.0
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=20, capacity=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Empty bucket: the next token comes after 1/rate seconds
+    assert bucket.acquire() == pytest.approx(0.05, abs=0.02)
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime as dtm
+import numpy as np
+import pytest
+from dota_lib.dota_columns import MATCH_COLUMNS, PARTITIONS_FILE, MatchColumns, \
+    columns_from_json_stream, iter_json_array, local_datetimes, read_json_lines
+from tests.helpers import make_match
+
+################ DATES
+@pytest.fixture
+def local_timezone(monkeypatch):
+    def set_timezone(timezone):
+        monkeypatch.setenv("TZ", timezone)
+        time.tzset()
+    yield set_timezone
+    monkeypatch.undo()
+    time.tzset()
+
+# Moscow changed its standard offset in 2011 and 2014, Casablanca suspends DST for Ramadan
+@pytest.mark.parametrize("timezone", ["UTC", "America/New_York", "Europe/Moscow",
+                                      "Africa/Casablanca"])
+def test_local_datetimes_match_fromtimestamp(local_timezone, timezone):
+    local_timezone(timezone)
+    # 2010-01-01 to 2025-01-01, every ~7 hours
+    timestamps = np.arange(1262304000, 1735689600, 3607*7, dtype=np.int64)
+    expected = np.array([dtm.fromtimestamp(timestamp) for timestamp in timestamps.tolist()],
+                        dtype="datetime64[ns]")
+    datetimes = local_datetimes(timestamps)
+    assert datetimes.dtype == np.dtype("datetime64[ns]")
+    assert (datetimes == expected).all()
+
+def test_local_datetimes_empty():
+    assert len(local_datetimes(np.array([], dtype=np.int64))) == 0
+
+################ STREAMING
+MATCHES = [
+    {"match_id": 3, "start_time": 1600000000, "hero_id": 1, "name": "Löwe ☃", "items": [1, 2]},
+    {"match_id": 2, "start_time": 1599000000, "hero_id": 2, "nested": {"a": [{"b": "]"}]}},
+    {"match_id": 1, "start_time": 1598000000, "hero_id": 3, "note": "{\"not\": \"json\"},"},
+]
+
+def iter_chunks(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start+chunk_size]
+
+def test_iter_json_array_any_chunk_boundary():
+    # Pretty printed, so whitespace and multi-byte characters also fall on chunk boundaries
+    data = json.dumps(MATCHES, indent=2, ensure_ascii=False).encode("utf-8")
+    for chunk_size in range(1, len(data)+1):
+        assert list(iter_json_array(iter_chunks(data, chunk_size))) == MATCHES, chunk_size
+
+@pytest.mark.parametrize("data", [b"[]", b" [ ] ", b"[\n]\n"])
+def test_iter_json_array_empty(data):
+    assert list(iter_json_array(iter_chunks(data, 1))) == []
+
+@pytest.mark.parametrize("data", [b'{"match_id": 1}', b'[{"match_id": 1}, {"match_id"', b""])
+def test_iter_json_array_invalid(data):
+    with pytest.raises(ValueError):
+        list(iter_json_array(iter_chunks(data, 4)))
+
+def test_columns_from_json_stream_keeps_records():
+    matches = [make_match(1000-idx, 1600000000-3600*idx, hero_id=idx+1, party_size=idx)
+               for idx in range(10)]
+    data = json.dumps(matches).encode("utf-8")
+    with tempfile.TemporaryFile() as records:
+        columns = columns_from_json_stream(iter_chunks(data, 5), records)
+        assert list(read_json_lines(records)()) == matches
+    expected = MatchColumns.from_matches(matches)
+    for name in MATCH_COLUMNS:
+        assert columns[name].dtype == expected[name].dtype
+        assert columns[name].tolist() == expected[name].tolist()
+
+################ PARTITIONS
+def get_columns(months):
+    # Two matches per month (UTC), newest first
+    matches = []
+    for month in sorted(months, reverse=True):
+        start_time = int(np.datetime64(month+"-15", "s").astype(np.int64))
+        matches += [make_match(start_time+1, start_time+1), make_match(start_time, start_time)]
+    return MatchColumns.from_matches(matches)
+
+@pytest.fixture
+def saved_partitions(monkeypatch):
+    saved = []
+    save_partition = MatchColumns.save_partition
+    def spy(columns, partition_dir):
+        saved.append(os.path.basename(partition_dir))
+        save_partition(columns, partition_dir)
+    monkeypatch.setattr(MatchColumns, "save_partition", spy)
+    return saved
+
+def test_save_skips_unchanged_partitions(tmp_path, saved_partitions):
+    columns_dir = str(tmp_path / "match_columns")
+    get_columns(["2020-01", "2020-02", "2020-03"]).save(columns_dir)
+    assert sorted(saved_partitions) == ["2020-01", "2020-02", "2020-03"]
+    manifest = MatchColumns.load_manifest(columns_dir)
+    assert {month: entry["rows"] for month, entry in manifest.items()} == \
+        {"2020-01": 2, "2020-02": 2, "2020-03": 2}
+
+    # Same matches: nothing rewritten
+    saved_partitions.clear()
+    get_columns(["2020-01", "2020-02", "2020-03"]).save(columns_dir)
+    assert saved_partitions == []
+
+    # A new month and a match changed in March: only those partitions are written,
+    # and the partition that no longer exists is removed
+    saved_partitions.clear()
+    columns = get_columns(["2020-02", "2020-03", "2020-04"])
+    columns.kills[2] = 30
+    columns.save(columns_dir)
+    assert sorted(saved_partitions) == ["2020-03", "2020-04"]
+    assert sorted(entry for entry in os.listdir(columns_dir) if entry != PARTITIONS_FILE) == \
+        ["2020-02", "2020-03", "2020-04"]
+    loaded = MatchColumns.load(columns_dir)
+    for name in MATCH_COLUMNS:
+        assert loaded[name].tolist() == columns[name].tolist()
+
+def test_load_opens_only_overlapping_partitions(tmp_path, monkeypatch):
+    columns_dir = str(tmp_path / "match_columns")
+    columns = get_columns(["2020-01", "2020-02", "2020-03"])
+    columns.save(columns_dir)
+    opened = []
+    load_partition = MatchColumns.load_partition.__func__
+    def spy(cls, partition_dir, mmap=True):
+        opened.append(os.path.basename(partition_dir))
+        return load_partition(cls, partition_dir, mmap)
+    monkeypatch.setattr(MatchColumns, "load_partition", classmethod(spy))
+
+    start_time = int(columns.start_time[3])
+    loaded = MatchColumns.load(columns_dir, start_time=start_time, end_time=start_time+1)
+    assert opened == ["2020-02"]
+    assert loaded.match_id.tolist() == [start_time]
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from dota_lib.dota_heroes import DotaHeroes, get_heroes, normalize_hero_name
+
+HEROES = [
+    {"id": 1, "name": "npc_dota_hero_antimage", "localized_name": "Anti-Mage"},
+    {"id": 2, "name": "npc_dota_hero_axe", "localized_name": "Axe"},
+    {"id": 5, "name": "npc_dota_hero_crystal_maiden", "localized_name": "Crystal Maiden"},
+]
+
+@pytest.fixture
+def heroes():
+    return DotaHeroes(HEROES)
+
+def test_normalize_hero_name():
+    assert normalize_hero_name(" Anti-Mage ") == "anti_mage"
+    assert normalize_hero_name("Crystal Maiden") == "crystal_maiden"
+    assert normalize_hero_name(5) == "5"
+
+def test_names(heroes):
+    assert len(heroes) == 3
+    assert heroes.get_name(1) == "Anti-Mage" and heroes.get_name("5") == "Crystal Maiden"
+    # IDs not in heroes.json (gaps, new heroes) are shown as they are
+    assert heroes.get_name(3) == "3" and heroes.get_name(200) == "200"
+    names = heroes.get_names(np.array([5, 1, 3, 200, 2], dtype=np.int16))
+    assert names.tolist() == ["Crystal Maiden", "Anti-Mage", "3", "200", "Axe"]
+    assert heroes.get_names([]).tolist() == []
+
+@pytest.mark.parametrize("hero, hero_id", [
+    ("Anti-Mage", 1), ("anti mage", 1), ("antimage", 1), ("1", 1), (1, 1),
+    ("CRYSTAL_MAIDEN", 5), ("crystal maiden", 5), ("axe", 2),
+    # Not in the registry: IDs are returned as they are, names are unknown
+    ("200", 200), ("Unknown Hero", None),
+])
+def test_get_id(heroes, hero, hero_id):
+    assert heroes.get_id(hero) == hero_id
+
+def test_registry_from_heroes_json():
+    heroes = get_heroes()
+    assert get_heroes() is heroes
+    for hero_id in range(1, len(heroes.names)):
+        name = heroes.get_name(hero_id)
+        assert heroes.get_id(name) == hero_id
@@ -0,0 +1,105 @@
+import os
+import time
+import pytest
+from dota_lib.dota_columns import MatchColumns
+from dota_lib.dota_io import find_json, load_json
+from dota_lib.dota_journal import JOURNAL_FILE, DotaIngestJournal
+from dota_lib.dota_player import DotaPlayer
+from tests.helpers import make_match, make_player
+
+ACCOUNT_ID = 42
+
+@pytest.fixture
+def journal(tmp_path):
+    return DotaIngestJournal(str(tmp_path / "journal"), freshness=60)
+
+def get_player():
+    matches = [make_match(1000-idx, 1600000000-3600*idx, party_size=idx) for idx in range(5)]
+    player = make_player(ACCOUNT_ID, "zed", matches)
+    player.player_wardmap = {"obs": {"70": {"80": 2}}}
+    player.data_info = {"Last Full Sync": "2020-09-13", "Match Sync": {"latest": 1000}}
+    return player
+
+def test_checkpoints_restored(journal):
+    player = get_player()
+    for endpoint in ("player_info", "matches", "wardmap"):
+        journal.save(player, endpoint)
+
+    restored = DotaPlayer(ACCOUNT_ID)
+    for endpoint in ("player_info", "matches", "wardmap"):
+        assert journal.restore(restored, endpoint)
+    assert not journal.restore(restored, "wordcloud")
+    assert restored.player_name == "zed"
+    assert restored.player_info == player.player_info
+    assert restored.player_matches == player.player_matches
+    assert restored.player_wardmap == player.player_wardmap
+    assert restored.data_info == player.data_info
+
+def get_synced_player(new_matches):
+    # Player after an incremental sync that got new_matches ahead of get_player's matches
+    matches = [make_match(1000+new_matches-idx, 1600000000+3600*(new_matches-idx))
+               for idx in range(new_matches)]
+    matches += get_player().player_matches
+    player = make_player(ACCOUNT_ID, "zed", [])
+    player.data_info = {"Match Sync": {"Mode": "incremental", "New Matches": new_matches}}
+    # The sync leaves the matches as columns, along with their full records
+    player.match_columns = MatchColumns.from_matches(matches)
+    player.set_matches_source(lambda: iter(matches))
+    return player, matches
+
+def test_incremental_sync_checkpoints_new_matches(journal, monkeypatch):
+    player, matches = get_synced_player(2)
+    with monkeypatch.context() as patch:
+        patch.setattr(DotaPlayer, "player_matches", property(
+            lambda self: pytest.fail("the whole history must not be checkpointed")))
+        journal.save(player, "matches")
+    records = load_json(find_json(os.path.join(journal.get_player_dir(ACCOUNT_ID),
+                                               "matches_records.json")))
+    assert records == matches[:2]
+
+    restored = get_player()
+    assert journal.restore(restored, "matches")
+    assert restored.player_matches == matches
+    assert restored.match_columns.match_id.tolist() == [match["match_id"] for match in matches]
+    assert restored.data_info["Match Sync"]["New Matches"] == 2
+
+    # Not on top of other stored matches
+    other = make_player(ACCOUNT_ID, "zed", matches[1:])
+    assert not journal.restore(other, "matches")
+    assert other.player_matches == matches[1:]
+
+def test_incremental_sync_without_new_matches(journal):
+    journal.save(get_synced_player(0)[0], "matches")
+    assert os.listdir(journal.get_player_dir(ACCOUNT_ID)) == [JOURNAL_FILE]
+
+    restored = get_player()
+    assert journal.restore(restored, "matches")
+    assert restored.player_matches == get_player().player_matches
+    assert restored.data_info["Match Sync"]["New Matches"] == 0
+
+def test_stale_and_completed_checkpoints_not_restored(journal, monkeypatch):
+    journal.save(get_player(), "player_info")
+    now = time.time()
+    monkeypatch.setattr("dota_lib.dota_journal.time.time", lambda: now + 61)
+    assert not journal.restore(DotaPlayer(ACCOUNT_ID), "player_info")
+    monkeypatch.undo()
+
+    assert journal.restore(DotaPlayer(ACCOUNT_ID), "player_info")
+    journal.complete_player(ACCOUNT_ID)
+    assert not journal.restore(DotaPlayer(ACCOUNT_ID), "player_info")
+
+def test_update_all_run_resumed(journal):
+    assert journal.start_run() == set()
+    journal.player_done("ana_1")
+    journal.player_done("zed_2")
+    # Interrupted: the next run skips the players already updated
+    assert journal.start_run() == {"ana_1", "zed_2"}
+    journal.finish_run()
+    assert journal.start_run() == set()
+
+def test_stale_run_restarted(journal, monkeypatch):
+    journal.start_run()
+    journal.player_done("ana_1")
+    now = time.time()
+    monkeypatch.setattr("dota_lib.dota_journal.time.time", lambda: now + 61)
+    assert journal.start_run() == set()
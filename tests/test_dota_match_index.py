@@ -0,0 +1,76 @@
+import pytest
+from dota_lib.dota_match_index import DotaMatchIndex
+from dota_lib.dota_sqlite import DotaSQLite
+from tests.helpers import make_match, make_player
+
+def get_matches(match_ids, player_slot=0):
+    return [make_match(match_id, 1600000000+match_id, hero_id=match_id % 7 + 1,
+                       player_slot=player_slot) for match_id in sorted(match_ids, reverse=True)]
+
+PLAYERS = {
+    "ana_1": get_matches([10, 11, 12, 13]),
+    "zed_2": get_matches([11, 12, 20], player_slot=130),
+    "bob_3": get_matches([12, 13, 30], player_slot=3),
+}
+
+def participants(index, match_ids):
+    return sorted(index.get_match_participants(match_ids).itertuples(index=False, name=None))
+
+def expected_participants(players, match_ids):
+    return sorted((match["match_id"], player, match["player_slot"], match["hero_id"])
+                  for player, matches in players.items() for match in matches
+                  if match["match_id"] in match_ids)
+
+@pytest.fixture
+def match_index(players_path):
+    index = DotaMatchIndex(players_path)
+    index.rebuild({})
+    for player, matches in PLAYERS.items():
+        index.update_player(player, make_player(player.split("_")[1], player, matches))
+    return index
+
+def test_update_player_adds_players(match_index):
+    assert match_index.load()["players"].tolist() == list(PLAYERS)
+    assert participants(match_index, [12]) == expected_participants(PLAYERS, [12])
+    assert participants(match_index, [10, 13, 20, 99]) == \
+        expected_participants(PLAYERS, [10, 13, 20])
+    assert participants(match_index, []) == []
+
+def test_update_player_replaces_its_rows(match_index, players_path):
+    players = dict(PLAYERS, zed_2=get_matches([12, 13, 21], player_slot=131))
+    match_index.update_player("zed_2", make_player(2, "zed", players["zed_2"]))
+    # Same player position, old rows gone
+    assert match_index.load()["players"].tolist() == list(PLAYERS)
+    match_ids = [10, 11, 12, 13, 20, 21, 30]
+    assert participants(match_index, match_ids) == expected_participants(players, match_ids)
+    # Other instances (e.g. another thread's) see the new file
+    assert participants(DotaMatchIndex(players_path), match_ids) == \
+        expected_participants(players, match_ids)
+
+def test_rebuild_same_as_updates(match_index, players_path):
+    match_ids = [10, 11, 12, 13, 20, 30]
+    rebuilt = DotaMatchIndex(players_path)
+    rebuilt.rebuild({player: make_player(player.split("_")[1], player, matches)
+                     for player, matches in PLAYERS.items()})
+    assert participants(rebuilt, match_ids) == expected_participants(PLAYERS, match_ids)
+
+def test_empty_index(players_path):
+    index = DotaMatchIndex(players_path)
+    assert not index.exists()
+    assert participants(index, [10]) == []
+    # Without an index, a single player is not enough to create it (see rebuild)
+    assert not index.update_player("ana_1", make_player(1, "ana", PLAYERS["ana_1"]))
+    assert not index.exists()
+
+def test_unchanged_player_not_rewritten(match_index):
+    signature = match_index.get_signature()
+    assert not match_index.update_player("zed_2", make_player(2, "zed", PLAYERS["zed_2"]))
+    assert match_index.get_signature() == signature
+
+def test_sqlite_participants_same_as_index(match_index, tmp_path):
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    for player, matches in PLAYERS.items():
+        name, account_id = player.split("_")
+        store.save_player(make_player(int(account_id), name, matches))
+    match_ids = [10, 11, 12, 13, 20, 30]
+    assert participants(store, match_ids) == participants(match_index, match_ids)
@@ -0,0 +1,58 @@
+import os
+import pytest
+from dota_lib import dota_matches
+from dota_lib.dota_io import load_json
+from dota_lib.dota_matches import DotaMatch
+
+MATCHES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            "dota_db", "matches")
+MATCH_IDS = sorted(os.listdir(MATCHES_PATH))
+
+def load_sample(match_id):
+    return load_json(os.path.join(MATCHES_PATH, match_id, "match_info.json"))
+
+def load_match(match_dir):
+    dota_match = DotaMatch(os.path.basename(match_dir))
+    dota_match.load_data([os.path.join(match_dir, file) for file in os.listdir(match_dir)])
+    return dota_match
+
+@pytest.mark.parametrize("match_id", MATCH_IDS)
+def test_split_merge_round_trip(match_id):
+    match_info = load_sample(match_id)
+    core, heavy = DotaMatch.split(match_info)
+    assert "chat" not in core and "chat" in core["_heavy"]
+    assert all(not isinstance(value, (list, dict))
+               for player in core["players"] for value in player.values())
+    assert DotaMatch.merge(core, heavy) == match_info
+
+@pytest.mark.parametrize("match_id", MATCH_IDS)
+def test_saved_match_round_trip(match_id, tmp_path):
+    match_info = load_sample(match_id)
+    dota_match = DotaMatch(match_id)
+    dota_match.match_info = match_info
+    dota_match.save_data(str(tmp_path))
+    assert sorted(os.listdir(tmp_path / match_id)) == ["match_core.json", "match_heavy.json.gz"]
+    assert load_match(str(tmp_path / match_id)).match_info == match_info
+
+def test_load_data_reads_only_core(tmp_path, monkeypatch):
+    match_id = MATCH_IDS[0]
+    dota_match = DotaMatch(match_id)
+    dota_match.match_info = load_sample(match_id)
+    dota_match.save_data(str(tmp_path))
+
+    loaded_files = []
+    def recording_load_json(file_path):
+        loaded_files.append(os.path.basename(file_path))
+        return load_json(file_path)
+    monkeypatch.setattr(dota_matches, "load_json", recording_load_json)
+
+    loaded = load_match(str(tmp_path / match_id))
+    assert loaded_files == ["match_core.json"]
+    # Core fields don't need the heavy file
+    assert loaded.duration == dota_match.match_info["duration"]
+    assert loaded.players[0]["hero_id"] == dota_match.match_info["players"][0]["hero_id"]
+    assert loaded_files == ["match_core.json"]
+    # The heavy file is read once, on first access to a heavy field
+    assert loaded.chat == dota_match.match_info["chat"]
+    assert loaded.teamfights == dota_match.match_info["teamfights"]
+    assert loaded_files == ["match_core.json", "match_heavy.json.gz"]
@@ -0,0 +1,43 @@
+from datetime import datetime as dtm
+import pytest
+from dota_lib.dota_planner import FULL_REFRESH_COST, DotaRefreshPlanner
+
+NOW = dtm(2021, 3, 1)
+
+def entry(last_updated, last_full_sync="", matches=0, first_match="", last_match=""):
+    return {"last_updated": last_updated, "last_full_sync": last_full_sync, "matches": matches,
+            "first_match": first_match, "last_match": last_match}
+
+CATALOG = {
+    # Refreshed yesterday, but its weekly full sync is due
+    "stale_4": entry("2021-02-28", "2021-02-10", 50, "2021-02-01", "2021-02-28"),
+    # Not played for months: no new matches expected, a single page of matches
+    "idle_3": entry("2021-02-01", "2021-02-25", 10, "2020-01-01", "2020-06-01"),
+    # ~5 matches a day, 8 days since the last update
+    "busy_2": entry("2021-02-21", "2021-02-27", 300, "2021-01-01", "2021-02-28"),
+    "new_1": entry(""),
+}
+
+def test_plan_order_and_cost():
+    plan = DotaRefreshPlanner(budget=None).plan(CATALOG, now=NOW)
+    assert list(plan) == ["new_1", "busy_2", "idle_3", "stale_4"]
+    assert [entry["cost"] for entry in plan.players] == [FULL_REFRESH_COST, FULL_REFRESH_COST,
+                                                         1, FULL_REFRESH_COST]
+    assert [entry["staleness"] for entry in plan.players] == [None, 8, 28, 1]
+    assert plan.players[1]["activity"] == pytest.approx(300 / 58)
+    assert plan.cost == 13 and not plan.skipped
+
+def test_plan_within_budget():
+    plan = DotaRefreshPlanner(budget=9).plan(CATALOG, now=NOW)
+    assert list(plan) == ["new_1", "busy_2", "idle_3"]
+    assert [entry["player"] for entry in plan.skipped] == ["stale_4"]
+    assert plan.cost == 9
+    text = plan.format()
+    assert "never" in text and "Skipped (over budget): stale_4" in text
+
+    assert len(DotaRefreshPlanner(budget=0).plan(CATALOG, now=NOW)) == 0
+
+def test_many_new_matches_cost_several_pages():
+    catalog = {"pro_1": entry("2021-02-19", "2021-02-28", 1000, "2021-02-01", "2021-02-28")}
+    # 1000 matches in 27 days, 10 days stale: ~370 new matches, 4 pages + 3 other endpoints
+    assert DotaRefreshPlanner().plan(catalog, now=NOW).players[0]["cost"] == 7
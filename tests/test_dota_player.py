@@ -0,0 +1,125 @@
+import os
+import pytest
+from dota_lib import dota_client, dota_player
+from dota_lib.dota_io import find_json, load_json
+from dota_lib.dota_journal import DotaIngestJournal
+from dota_lib.dota_player import DotaPlayer
+from tests.helpers import FakeOpenDota, make_match
+
+ACCOUNT_ID = 42
+
+def get_matches(n_matches, now, first_id=1000):
+    # Newest match first, one hour apart, with fields that are not match columns
+    return [make_match(first_id+n_matches-idx, now-3600*(idx+1), hero_id=idx % 5 + 1,
+                       party_size=idx % 5 + 1, lobby_type=idx % 2, skill=idx % 3 or None)
+            for idx in range(n_matches)]
+
+def new_player():
+    player = DotaPlayer(ACCOUNT_ID, "zed")
+    player.player_info = {"profile": {"account_id": ACCOUNT_ID, "personaname": "zed"}}
+    return player
+
+def load_player(players_path):
+    player_dir = os.path.join(players_path, "zed_"+str(ACCOUNT_ID))
+    loaded = DotaPlayer()
+    loaded.load_data([os.path.join(player_dir, file) for file in os.listdir(player_dir)])
+    return loaded
+
+@pytest.fixture
+def fake_opendota(monkeypatch):
+    fake = FakeOpenDota()
+    monkeypatch.setattr(dota_client, "_client", fake)
+    # Tiny chunks, so JSON objects are split across chunks
+    monkeypatch.setattr(dota_player, "STREAM_CHUNK_SIZE", 7)
+    return fake
+
+def stored_matches(players_path):
+    return load_json(find_json(os.path.join(players_path, "zed_"+str(ACCOUNT_ID),
+                                            "player_matches.json")))
+
+def test_streamed_matches_keep_every_field(fake_opendota, players_path):
+    matches = get_matches(50, fake_opendota.now)
+    fake_opendota.matches[ACCOUNT_ID] = matches
+    player = new_player()
+    assert player.get_matches(stream=True)
+    assert player.matches_as_columns
+    assert list(player.iter_player_matches()) == matches
+    player.save_data(players_path)
+    assert stored_matches(players_path) == matches
+
+    loaded = load_player(players_path)
+    assert loaded.match_columns.match_id.tolist() == [match["match_id"] for match in matches]
+    assert loaded.player_matches == matches
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_incremental_stream_merges_full_records(fake_opendota, players_path, compress):
+    matches = get_matches(50, fake_opendota.now - 86400)
+    fake_opendota.matches[ACCOUNT_ID] = matches
+    player = new_player()
+    player.get_matches(stream=True)
+    player.save_data(players_path, compress=compress)
+
+    new_matches = get_matches(3, fake_opendota.now, first_id=5000)
+    fake_opendota.matches[ACCOUNT_ID] = new_matches + matches
+    loaded = load_player(players_path)
+    assert loaded.get_matches(stream=True, incremental=True)
+    assert loaded.data_info["Match Sync"]["New Matches"] == 3
+    loaded.save_data(players_path, compress=compress)
+    assert stored_matches(players_path) == new_matches + matches
+
+    # Nothing new: player_matches.json is kept as it is
+    reloaded = load_player(players_path)
+    assert reloaded.get_matches(stream=True, incremental=True)
+    reloaded.save_data(players_path, compress=compress)
+    assert stored_matches(players_path) == new_matches + matches
+    assert load_player(players_path).player_matches == new_matches + matches
+
+def test_journal_keeps_streamed_records(fake_opendota, players_path, tmp_path):
+    matches = get_matches(20, fake_opendota.now)
+    fake_opendota.matches[ACCOUNT_ID] = matches
+    journal = DotaIngestJournal(str(tmp_path / "journal"))
+    player = new_player()
+    player.get_matches(stream=True)
+    journal.save(player, "matches")
+
+    resumed = new_player()
+    assert journal.restore(resumed, "matches")
+    resumed.save_data(players_path)
+    journal.complete_player(ACCOUNT_ID)
+    assert stored_matches(players_path) == matches
+
+def test_get_all_failure_leaves_player_unchanged(fake_opendota, players_path):
+    matches = get_matches(20, fake_opendota.now - 86400)
+    fake_opendota.matches[ACCOUNT_ID] = matches
+    player = new_player()
+    assert player.get_all(stream_matches=True)
+    assert sorted(player.data_info["Endpoint Timings"]) == \
+        ["matches", "player_info", "wardmap", "wordcloud"]
+    assert all(elapsed >= 0 for elapsed in player.data_info["Endpoint Timings"].values())
+    player.save_data(players_path)
+
+    # New matches, but the wardmap can't be queried: nothing is kept
+    fake_opendota.matches[ACCOUNT_ID] = get_matches(3, fake_opendota.now, first_id=5000) + matches
+    fake_opendota.failing.add("wardmap")
+    loaded = load_player(players_path)
+    data_info = dict(loaded.data_info)
+    assert not loaded.get_all(stream_matches=True, incremental=True)
+    assert "wardmap" in fake_opendota.get_endpoints()
+    assert loaded.data_info == data_info
+    assert loaded.player_wardmap == player.player_wardmap
+    assert loaded.match_columns.match_id.tolist() == [match["match_id"] for match in matches]
+    assert loaded.player_matches == matches
+
+def test_get_all_without_new_matches_queries_matches_only(fake_opendota, players_path):
+    fake_opendota.matches[ACCOUNT_ID] = get_matches(20, fake_opendota.now)
+    player = new_player()
+    assert player.get_all()
+    player.save_data(players_path)
+
+    fake_opendota.requests.clear()
+    loaded = load_player(players_path)
+    assert loaded.get_all(incremental=True)
+    assert fake_opendota.get_endpoints() == ["matches"]
+    assert loaded.data_info["Skipped Endpoints"] == ["player_info", "wardmap", "wordcloud"]
+    assert list(loaded.data_info["Endpoint Timings"]) == ["matches"]
+    assert loaded.data_info["Match Sync"]["New Matches"] == 0
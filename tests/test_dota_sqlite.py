@@ -0,0 +1,227 @@
+import json
+import sqlite3
+from dota_lib.dota_player import DotaPlayer
+from dota_lib.dota_sqlite import SCHEMA_VERSION, DotaSQLite
+from tests.helpers import make_match, make_player
+
+ACCOUNT_ID = 42
+
+# Schema version 1, with a copy of every match per player
+SCHEMA_V1 = '''
+CREATE TABLE players (account_id INTEGER PRIMARY KEY, player_name TEXT NOT NULL,
+    player_info TEXT, player_wardmap TEXT, player_wordcloud TEXT,
+    version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE data_info (account_id INTEGER PRIMARY KEY, data_info TEXT NOT NULL);
+CREATE TABLE player_matches (account_id INTEGER NOT NULL, match_id INTEGER NOT NULL,
+    start_time INTEGER NOT NULL, hero_id INTEGER NOT NULL, player_slot INTEGER NOT NULL,
+    radiant_win INTEGER NOT NULL, game_mode INTEGER NOT NULL, kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL, assists INTEGER NOT NULL, duration INTEGER NOT NULL,
+    PRIMARY KEY (account_id, match_id));
+CREATE INDEX idx_player_matches_account_start ON player_matches (account_id, start_time);
+CREATE TABLE match_details (match_id INTEGER PRIMARY KEY, match_info TEXT NOT NULL);
+PRAGMA user_version = 1;
+'''
+
+# Schema version 2, before participation kept the full match records
+SCHEMA_V2 = '''
+CREATE TABLE players (account_id INTEGER PRIMARY KEY, player_name TEXT NOT NULL,
+    player_info TEXT, player_wardmap TEXT, player_wordcloud TEXT,
+    version INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE data_info (account_id INTEGER PRIMARY KEY, data_info TEXT NOT NULL);
+CREATE TABLE matches (match_id INTEGER PRIMARY KEY, start_time INTEGER NOT NULL,
+    game_mode INTEGER NOT NULL, radiant_win INTEGER NOT NULL, duration INTEGER NOT NULL);
+CREATE TABLE participation (match_id INTEGER NOT NULL, account_id INTEGER NOT NULL,
+    player_slot INTEGER NOT NULL, hero_id INTEGER NOT NULL, kills INTEGER NOT NULL,
+    deaths INTEGER NOT NULL, assists INTEGER NOT NULL,
+    PRIMARY KEY (account_id, match_id)) WITHOUT ROWID;
+CREATE VIEW player_matches AS
+    SELECT p.account_id, m.match_id, m.start_time, p.hero_id, p.player_slot, m.radiant_win,
+           m.game_mode, p.kills, p.deaths, p.assists, m.duration
+    FROM participation p JOIN matches m ON m.match_id = p.match_id;
+PRAGMA user_version = 2;
+'''
+
+# Schema version 4, with OpenDota's full match records in participation
+SCHEMA_V4 = SCHEMA_V2.replace(
+    "account_id INTEGER NOT NULL,\n    player_slot",
+    "account_id INTEGER NOT NULL,\n    start_time INTEGER NOT NULL, player_slot").replace(
+    "assists INTEGER NOT NULL,\n    PRIMARY", "assists INTEGER NOT NULL, payload TEXT,\n    PRIMARY"
+    ).replace("user_version = 2", "user_version = 4")
+
+def get_matches(n_matches, first_id=1000, start_time=1600000000):
+    # Newest match first, with fields that are not match columns
+    return [make_match(first_id+n_matches-idx, start_time-3600*idx, hero_id=idx % 5 + 1,
+                       party_size=idx % 5 + 1, item_0=idx, lane_role=idx % 4)
+            for idx in range(n_matches)]
+
+def load_player(store):
+    loaded = DotaPlayer(ACCOUNT_ID)
+    assert loaded.load_data(store)
+    return loaded
+
+def test_save_player_keeps_full_records(tmp_path):
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    matches = get_matches(20)
+    store.save_player(make_player(ACCOUNT_ID, "zed", matches))
+
+    loaded = load_player(store)
+    assert loaded.match_columns.match_id.tolist() == [match["match_id"] for match in matches]
+    assert list(loaded.iter_player_matches()) == matches
+    assert loaded.player_matches == matches
+
+def test_save_player_loaded_from_same_store(tmp_path):
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    matches = get_matches(20)
+    store.save_player(make_player(ACCOUNT_ID, "zed", matches))
+
+    # Records are streamed from the store while the player is saved again into it
+    store.save_player(load_player(store))
+    assert load_player(store).player_matches == matches
+    assert store.get_player_version(ACCOUNT_ID) == 2
+
+def test_match_fields_stored_once(tmp_path):
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    matches = get_matches(5)
+    # ana played the same matches, on the other side
+    ana_matches = [dict(match, player_slot=128, hero_id=7, party_size=1) for match in matches]
+    store.save_player(make_player(ACCOUNT_ID, "zed", matches))
+    store.save_player(make_player(ACCOUNT_ID+1, "ana", ana_matches))
+
+    conn = store.connection()
+    extras = conn.execute("SELECT extra FROM matches").fetchall()
+    assert [json.loads(extra[0]) for extra in extras] == [{"lobby_type": 7, "version": 21}]*5
+    payload = json.loads(conn.execute("SELECT payload FROM participation WHERE account_id = ? "
+                                      "AND match_id = ?", (ACCOUNT_ID, matches[0]["match_id"]))
+                         .fetchone()[0])
+    assert payload == {"skill": None, "leaver_status": 0, "party_size": 1, "item_0": 0,
+                       "lane_role": 0}
+    assert load_player(store).player_matches == matches
+    loaded = DotaPlayer(ACCOUNT_ID+1)
+    assert loaded.load_data(store)
+    assert loaded.player_matches == ana_matches
+
+def test_import_json_tree_keeps_full_records(tmp_path):
+    matches = get_matches(20)
+    players_path = tmp_path / "dota_db" / "players"
+    players_path.mkdir(parents=True)
+    make_player(ACCOUNT_ID, "zed", matches).save_data(str(players_path))
+
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    assert store.import_json_tree(str(tmp_path / "dota_db")) == (1, 0)
+    assert load_player(store).player_matches == matches
+
+def test_migrate_v2_keeps_match_columns(tmp_path):
+    db_path = str(tmp_path / "dota_db.sqlite")
+    matches = get_matches(3)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA_V2)
+    conn.execute("INSERT INTO players VALUES (?, 'zed', ?, '{}', '{}', 1)",
+                 (ACCOUNT_ID, json.dumps({"profile": {"account_id": ACCOUNT_ID}})))
+    for match in matches:
+        conn.execute("INSERT INTO matches VALUES (?, ?, ?, ?, ?)",
+                     (match["match_id"], match["start_time"], match["game_mode"],
+                      int(match["radiant_win"]), match["duration"]))
+        conn.execute("INSERT INTO participation VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (match["match_id"], ACCOUNT_ID, match["player_slot"], match["hero_id"],
+                      match["kills"], match["deaths"], match["assists"]))
+    conn.commit()
+    conn.close()
+
+    store = DotaSQLite(db_path)
+    assert store.connection().execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    loaded = load_player(store)
+    records = list(loaded.iter_player_matches())
+    assert [record["match_id"] for record in records] == [match["match_id"] for match in matches]
+    # Only the match columns survive a version 2 database
+    assert records[0]["radiant_win"] is True and "party_size" not in records[0]
+
+    # start_time is copied into participation for the time range queries
+    columns = store.get_player_match_columns(ACCOUNT_ID, start_time=matches[1]["start_time"])
+    assert columns.match_id.tolist() == [match["match_id"] for match in matches[:2]]
+    assert store.get_player_match_columns(ACCOUNT_ID, end_time=matches[1]["start_time"]) \
+        .match_id.tolist() == [matches[2]["match_id"]]
+
+    # Saving again (e.g. after an update) stores the full records
+    store.save_player(make_player(ACCOUNT_ID, "zed", matches))
+    assert load_player(store).player_matches == matches
+
+def test_migrate_v4_moves_match_fields(tmp_path):
+    db_path = str(tmp_path / "dota_db.sqlite")
+    matches = get_matches(3)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA_V4)
+    conn.execute("INSERT INTO players VALUES (?, 'zed', '{}', '{}', '{}', 1)", (ACCOUNT_ID,))
+    for match in matches:
+        conn.execute("INSERT INTO matches VALUES (?, ?, ?, ?, ?)",
+                     (match["match_id"], match["start_time"], match["game_mode"],
+                      int(match["radiant_win"]), match["duration"]))
+        conn.execute("INSERT INTO participation VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (match["match_id"], ACCOUNT_ID, match["start_time"], match["player_slot"],
+                      match["hero_id"], match["kills"], match["deaths"], match["assists"],
+                      json.dumps(match)))
+    conn.commit()
+    conn.close()
+
+    store = DotaSQLite(db_path)
+    conn = store.connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert json.loads(conn.execute("SELECT extra FROM matches").fetchone()[0]) == \
+        {"lobby_type": 7, "version": 21}
+    assert "lobby_type" not in conn.execute("SELECT payload FROM participation").fetchone()[0]
+    assert load_player(store).player_matches == matches
+
+def test_migrate_v1_deduplicates_matches(tmp_path):
+    db_path = str(tmp_path / "dota_db.sqlite")
+    matches = get_matches(6)
+    # Both players played matches[1:4] together, on the same side
+    players = {ACCOUNT_ID: matches, ACCOUNT_ID+1: [dict(match, hero_id=10+idx, player_slot=1)
+                                                   for idx, match in enumerate(matches[1:4])]}
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA_V1)
+    for account_id, player_matches in players.items():
+        conn.execute("INSERT INTO players VALUES (?, ?, '{}', '{}', '{}', 1)",
+                     (account_id, "player"+str(account_id)))
+        conn.executemany(
+            "INSERT INTO player_matches VALUES (:account_id, :match_id, :start_time, :hero_id, "
+            ":player_slot, :radiant_win, :game_mode, :kills, :deaths, :assists, :duration)",
+            [dict(match, account_id=account_id) for match in player_matches])
+    conn.commit()
+    conn.close()
+
+    store = DotaSQLite(db_path)
+    conn = store.connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'player_matches'") \
+        .fetchone()[0] == "view"
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'player_matches_v1'") \
+        .fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0] == len(matches)
+    assert conn.execute("SELECT COUNT(*) FROM participation").fetchone()[0] == 9
+
+    for account_id, player_matches in players.items():
+        columns = store.get_player_match_columns(account_id)
+        assert columns.match_id.tolist() == [match["match_id"] for match in player_matches]
+        assert columns.hero_id.tolist() == [match["hero_id"] for match in player_matches]
+    columns = store.get_player_match_columns(ACCOUNT_ID, start_time=matches[2]["start_time"])
+    assert columns.match_id.tolist() == [match["match_id"] for match in matches[:3]]
+    team = store.get_team_match_columns([ACCOUNT_ID+1, ACCOUNT_ID])
+    assert team.match_id.tolist() == [match["match_id"] for match in matches[1:4]]
+
+def test_player_matches_in_time_range(tmp_path):
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    matches = get_matches(20)
+    store.save_player(make_player(ACCOUNT_ID, "zed", matches))
+    store.save_player(make_player(ACCOUNT_ID+1, "ana", matches[5:]))
+
+    start_time, end_time = matches[9]["start_time"], matches[2]["start_time"]
+    columns = store.get_player_match_columns(ACCOUNT_ID, start_time=start_time, end_time=end_time)
+    assert columns.match_id.tolist() == [match["match_id"] for match in matches[3:10]]
+    columns = store.get_player_match_columns(ACCOUNT_ID+1, hero_id=1, start_time=start_time)
+    assert columns.match_id.tolist() == [match["match_id"] for match in matches[5:10]
+                                         if match["hero_id"] == 1]
+
+    plan = store.connection().execute(
+        "EXPLAIN QUERY PLAN SELECT match_id FROM participation "
+        "WHERE account_id = ? AND start_time >= ? AND start_time < ?",
+        (ACCOUNT_ID, start_time, end_time)).fetchall()
+    assert "idx_participation_account_start" in " ".join(row[-1] for row in plan)
@@ -0,0 +1,54 @@
+import pytest
+from dota_lib.dota_sqlite import DotaSQLite
+from dota_lib.dota_team import DotaTeam
+from tests.helpers import make_match, make_player
+
+# (match_id, game_mode, radiant_win, (hero_id, player_slot) of ana, of zed or None)
+MATCHES = [
+    (107, 22, False, (5, 1), (2, 3)),      # radiant, lost
+    (106, 22, True, (5, 0), None),         # ana alone
+    (105, 23, True, (1, 0), (2, 2)),       # Turbo, not All Pick
+    (104, 22, False, (4, 130), (3, 131)),  # dire, won
+    (103, 22, True, (4, 0), (2, 130)),     # opposite sides
+    (102, 1, True, (1, 128), (3, 129)),    # dire, lost (All Pick, game mode 1)
+    (101, 22, True, (1, 0), (2, 1)),       # radiant, won
+]
+
+def get_matches(player):
+    # Newest match first, one hour apart
+    return [make_match(match_id, 1600000000+3600*(match_id-100), hero_id=heroes[player][0],
+                       player_slot=heroes[player][1], radiant_win=radiant_win,
+                       game_mode=game_mode)
+            for match_id, game_mode, radiant_win, *heroes in MATCHES if heroes[player]]
+
+@pytest.fixture
+def players():
+    return [make_player(1, "ana", get_matches(0)), make_player(2, "zed", get_matches(1))]
+
+def test_team_matches(players):
+    team = DotaTeam(players)
+    assert [(match["match_id"], match["side"], match["win"]) for match in team.matches] == \
+        [(107, "radiant", 0), (104, "dire", 1), (102, "dire", 0), (101, "radiant", 1)]
+    assert team.winrate == 50
+    assert team.get_team_radiant_winrate_matches() == (50, 2)
+    assert team.get_team_dire_winrate_matches() == (50, 2)
+
+def test_team_matches_from_store(players, tmp_path):
+    store = DotaSQLite(str(tmp_path / "dota_db.sqlite"))
+    for player in players:
+        store.save_player(player)
+    assert DotaTeam(players, store=store).matches == DotaTeam(players).matches
+
+def test_hero_stats(players):
+    stats = DotaTeam(players).get_hero_stats()
+    # Ties are ordered by the most recent match: ana's hero 5 (107) before hero 4 (104),
+    # zed's hero 2 (107) before hero 3 (104)
+    assert stats[["player", "hero_id", "matches", "wins"]].values.tolist() == [
+        [0, 1, 2, 1], [0, 5, 1, 0], [0, 4, 1, 1],
+        [1, 2, 2, 1], [1, 3, 2, 1],
+    ]
+    assert stats["winrate"].tolist() == [50, 0, 100, 50, 50]
+    assert stats["hero"].tolist() == ["1", "5", "4", "2", "3"]
+
+    top = DotaTeam(players).get_hero_stats(top=1)
+    assert top[["player", "hero_id"]].values.tolist() == [[0, 1], [1, 2]]
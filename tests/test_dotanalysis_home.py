@@ -0,0 +1,34 @@
+import pytest
+from dota_dash_apps import dotanalysis_home
+
+@pytest.fixture
+def home(monkeypatch):
+    monkeypatch.setattr(dotanalysis_home, "update_status", {"done": [], "failed": []})
+    while dotanalysis_home.dash_queue.qsize():
+        dotanalysis_home.dash_queue.get(0)
+    return dotanalysis_home
+
+def test_update_status_shows_each_player(home):
+    home.dash_queue.put(("player", "ana_1", "done"))
+    home.dash_queue.put(50)
+    ok_fade, _, _, _, progress, progress_str, status_str, status_class = home.trigger_queue()
+    assert ok_fade is True and (progress, progress_str) == (50, "50 %")
+    assert status_str == "1 updated - ana_1 done"
+    assert "success" in status_class
+
+    home.dash_queue.put(("player", "zed_2", "failed"))
+    *_, status_str, status_class = home.trigger_queue()
+    assert status_str == "1 updated, 1 failed - zed_2 failed"
+    assert "danger" in status_class
+
+    home.dash_queue.put(100)
+    home.dash_queue.put(("status", "finished"))
+    *_, status_str, _ = home.trigger_queue()
+    assert status_str == "1 players updated, 1 failed: zed_2"
+
+def test_update_status_all_done(home):
+    home.dash_queue.put(("player", "ana_1", "done"))
+    home.dash_queue.put(("status", "finished"))
+    *_, status_str, status_class = home.trigger_queue()
+    assert status_str == "OK - 1 players updated"
+    assert "success" in status_class
@@ -0,0 +1,133 @@
+import pandas as pd
+import pytest
+from dota_lib import dota_client
+from dota_lib.dota_journal import DotaIngestJournal
+from dota_lib.dota_match_index import DotaMatchIndex
+from dota_lib.dota_team import DotaTeam
+from dotanalysis_control import dta
+from tests.helpers import FakeOpenDota, make_match, make_player
+
+@pytest.fixture
+def dota_db(tmp_path, monkeypatch):
+    '''
+    dta working on an empty dota_db players folder (JSON backend) and a FakeOpenDota
+    '''
+    players_path = tmp_path / "dota_db" / "players"
+    players_path.mkdir(parents=True)
+    monkeypatch.setattr(dta, "PLAYER_DIR_PATH", str(players_path))
+    monkeypatch.setattr(dta, "DOTA_DB_PLAYERS", str(players_path))
+    monkeypatch.setattr(dta, "dota_db_store", None)
+    monkeypatch.setattr(dta, "match_index", DotaMatchIndex(str(players_path)))
+    monkeypatch.setattr(dta, "dota_player_cache", dta.DotaPlayerCache())
+    monkeypatch.setattr(dta, "ingest_journal", DotaIngestJournal(str(tmp_path / "journal")))
+    fake = FakeOpenDota()
+    monkeypatch.setattr(dota_client, "_client", fake)
+    return fake
+
+@pytest.fixture
+def team_players(monkeypatch):
+    '''
+    dict of player -> DotaPlayer, that get_dota_team builds teams from (filled by the test)
+    '''
+    players = {}
+    monkeypatch.setattr(dta, "get_dota_team",
+                        lambda dota_team: DotaTeam([players[player] for player in dota_team]))
+    return players
+
+def test_team_results_without_shared_matches(team_players):
+    team_players.update({
+        "a_1": make_player(1, "a", [make_match(10, 1600000000, hero_id=1)]),
+        "b_2": make_player(2, "b", [make_match(20, 1600000100, hero_id=2)]),
+    })
+    results = dta.DotaTeamCache.compute(["a_1", "b_2"])
+    assert results["matches"] == []
+    assert sorted(results["most_played_heroes"]) == ["a_1", "b_2"]
+    for mph_df in results["most_played_heroes"].values():
+        assert mph_df.empty
+        assert list(mph_df.columns) == ["Hero", "Matches", "Winrate"]
+
+def test_team_results_most_played_heroes(team_players):
+    team_players.update({
+        "a_1": make_player(1, "a", [make_match(10, 1600000000, hero_id=1),
+                                    make_match(11, 1600000100, hero_id=1, radiant_win=False)]),
+        "b_2": make_player(2, "b", [make_match(10, 1600000000, hero_id=2, player_slot=1),
+                                    make_match(11, 1600000100, hero_id=3, player_slot=1,
+                                               radiant_win=False)]),
+    })
+    results = dta.DotaTeamCache.compute(["a_1", "b_2"])
+    assert len(results["matches"]) == 2
+    a_heroes = results["most_played_heroes"]["a_1"]
+    assert a_heroes["Hero"].tolist() == ["Anti-Mage"]
+    assert a_heroes["Matches"].tolist() == [2]
+    assert float(a_heroes["Winrate"].iloc[0]) == 50.0
+    assert isinstance(results["most_played_heroes"]["b_2"], pd.DataFrame)
+
+def test_players_data_without_shared_matches(team_players, monkeypatch):
+    from dota_dash_apps import dotanalysis_dash_components
+    team_players.update({
+        "a_1": make_player(1, "a", [make_match(10, 1600000000)]),
+        "b_2": make_player(2, "b", [make_match(20, 1600000100)]),
+    })
+    results = dta.DotaTeamCache.compute(["a_1", "b_2"])
+    monkeypatch.setattr(dotanalysis_dash_components, "get_team_results",
+                        lambda dota_team: results)
+    player_data = dotanalysis_dash_components.get_players_data(["a_1", "b_2"])
+    assert [len(data) for data in player_data] == [2, 2, 0, 0, 0]
+
+def test_match_index_built_from_every_player(dota_db):
+    # Players stored before the match index existed
+    for account_id, name in ((1, "a"), (2, "b")):
+        make_player(account_id, name, [make_match(10, dota_db.now-7200, hero_id=account_id),
+                                       make_match(10+account_id, dota_db.now-3600)]) \
+            .save_data(dta.DOTA_DB_PLAYERS)
+    dota_db.matches[3] = [make_match(10, dota_db.now-7200, hero_id=3, player_slot=1)]
+    assert dta.register_player(3, "c")
+    assert not dta.match_index.exists()
+    index = dta.get_match_index()
+    assert sorted(index.load()["players"].tolist()) == ["a_1", "b_2", "c_3"]
+    assert sorted(index.get_match_participants([10])["player"]) == ["a_1", "b_2", "c_3"]
+
+    # Once it exists, registering updates the player's rows only
+    dota_db.matches[3] = [make_match(11, dota_db.now-3600, hero_id=3)] + dota_db.matches[3]
+    assert dta.register_player(3, "c")
+    assert sorted(index.load()["players"].tolist()) == ["a_1", "b_2", "c_3"]
+    assert sorted(index.get_match_participants([11])["player"]) == ["a_1", "c_3"]
+
+    # Players saved without register_player (e.g. by hand) trigger a rebuild
+    make_player(4, "d", [make_match(11, dota_db.now-3600)]).save_data(dta.DOTA_DB_PLAYERS)
+    assert sorted(dta.get_match_index().get_match_participants([11])["player"]) == \
+        ["a_1", "c_3", "d_4"]
+
+def test_catalog_built_from_every_player(dota_db):
+    for account_id, name in ((1, "a"), (2, "b"), (3, "c")):
+        make_player(account_id, name, [make_match(10, dota_db.now-3600)]) \
+            .save_data(dta.DOTA_DB_PLAYERS)
+    assert sorted(dta.get_catalog()) == ["a_1", "b_2", "c_3"]
+    assert dta.get_available_players() == ["a_1", "b_2", "c_3"]
+
+def test_player_cache(dota_db):
+    for account_id, name in ((1, "a"), (2, "b"), (3, "c")):
+        make_player(account_id, name, [make_match(10, dota_db.now-3600)]) \
+            .save_data(dta.DOTA_DB_PLAYERS)
+    cache = dta.DotaPlayerCache(max_size=2)
+    a_player = cache.get("a_1")
+    assert cache.get("a_1") is a_player
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "max_size": 2}
+
+    # Saving the player changes its directory's signature: reloaded
+    make_player(1, "a", [make_match(11, dota_db.now), make_match(10, dota_db.now-3600)]) \
+        .save_data(dta.DOTA_DB_PLAYERS)
+    reloaded = cache.get("a_1")
+    assert reloaded is not a_player
+    assert reloaded.match_columns.match_id.tolist() == [11, 10]
+    assert cache.get("a_1") is reloaded
+    assert cache.stats()["misses"] == 2
+
+    # b_2 is the least recently used when c_3 is loaded
+    b_player = cache.get("b_2")
+    assert cache.get("a_1") is reloaded
+    cache.get("c_3")
+    assert cache.stats() == {"hits": 3, "misses": 4, "size": 2, "max_size": 2}
+    assert cache.get("a_1") is reloaded
+    assert cache.get("b_2") is not b_player
+    assert cache.stats() == {"hits": 4, "misses": 5, "size": 2, "max_size": 2}